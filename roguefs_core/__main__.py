@@ -0,0 +1,153 @@
+"""Command line tools for the roguefs index: `python -m roguefs_core <command> ...`."""
+from __future__ import annotations
+import argparse, sys
+from pathlib import Path
+from .index import IndexDB, SEARCH_MODES
+from .fuzzy import fuzzy_search
+from .config import import_sidecars, export_sidecars
+from .node import NodeKind
+from .indexer import index_tree, IndexStats, DEFAULT_WORKERS, DEFAULT_BATCH
+from .sniff import classify, CLASSIFY_WORKERS
+
+def _print_progress(stats: IndexStats):
+    print(f"\r[index] {stats.dirs:,} dirs  {stats.entries:,} entries  {stats.rate:,.0f}/s  {stats.errors} errors",
+          end="", file=sys.stderr, flush=True)
+
+def _cmd_index(args) -> int:
+    root = args.root.expanduser().resolve()
+    if not root.is_dir():
+        print("Root must be an existing directory.", file=sys.stderr); return 1
+    db = IndexDB(args.db)
+    try:
+        stats = index_tree(db, root, workers=args.workers, batch_size=args.batch, restart=args.restart, progress=_print_progress)
+    except KeyboardInterrupt:
+        print("\n[index] interrupted; rerun the same command to resume.", file=sys.stderr); return 130
+    finally:
+        db.close()
+    _print_progress(stats)
+    print(f"\n[index] done in {stats.elapsed:.1f}s", file=sys.stderr)
+    return 0
+
+def _cmd_search(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        if args.mode == "fuzzy":
+            rows = [row for row, _ in fuzzy_search(db, args.needle, limit=args.limit, budget=float("inf"))[0]]
+        else:
+            rows = db.search_paths(args.needle, limit=args.limit, mode=args.mode)
+        for row in rows:
+            print(f"{row['kind']:<9} {row['path']}")
+    finally:
+        db.close()
+    return 0
+
+def _cmd_rebuild_search(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        db.rebuild_search_index()
+    finally:
+        db.close()
+    return 0
+
+def _cmd_rebuild_stats(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        db.rebuild_dir_stats()
+    finally:
+        db.close()
+    return 0
+
+def _cmd_rebuild_spatial(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        db.rebuild_spatial_index()
+    finally:
+        db.close()
+    return 0
+
+def _cmd_rebuild_dir_order(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        db.rebuild_dir_order()
+    finally:
+        db.close()
+    return 0
+
+def _cmd_classify(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        root_id = None
+        if args.root is not None:
+            root = db.get_node_by_path(str(args.root.expanduser().resolve()))
+            if root is None:
+                print("Root is not in the index; run `index` on it first.", file=sys.stderr); return 1
+            root_id = root["id"]
+        progress = lambda n: print(f"\r[classify] {n:,} files", end="", file=sys.stderr, flush=True)
+        count = classify(db, root_id, workers=args.workers, progress=progress)
+    except KeyboardInterrupt:
+        print("\n[classify] interrupted; rerun to continue.", file=sys.stderr); return 130
+    finally:
+        db.close()
+    print(f"\r[classify] {count:,} files sniffed", file=sys.stderr)
+    return 0
+
+def _cmd_config_import(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        root = db.get_node_by_path(str(args.root.expanduser().resolve()))
+        if root is None:
+            print("Root is not in the index; run `index` on it first.", file=sys.stderr); return 1
+        dirs = [root] + list(db.descendants_of(root["id"], kinds=(NodeKind.DIRECTORY.value,)))
+        count = import_sidecars(db, (Path(r["path"]) for r in dirs))
+    finally:
+        db.close()
+    print(f"[config] imported {count} sidecar file(s)", file=sys.stderr)
+    return 0
+
+def _cmd_config_export(args) -> int:
+    db = IndexDB(args.db)
+    try:
+        count = export_sidecars(db, args.root.expanduser().resolve() if args.root else None)
+    finally:
+        db.close()
+    print(f"[config] wrote {count} sidecar file(s)", file=sys.stderr)
+    return 0
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="roguefs", description="roguefs index tools")
+    parser.add_argument("--db", default=None, help="Index database (default: $ROGUEFS_DB or ~/.roguefs/index.sqlite)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("index", help="Crawl a whole tree into the index")
+    p.add_argument("root", type=Path, help="Directory to index recursively")
+    p.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Scanner threads (default: {DEFAULT_WORKERS})")
+    p.add_argument("--batch", type=int, default=DEFAULT_BATCH, help=f"Rows per write transaction (default: {DEFAULT_BATCH})")
+    p.add_argument("--restart", action="store_true", help="Discard an interrupted crawl instead of resuming it")
+    p.set_defaults(func=_cmd_index)
+    p = sub.add_parser("search", help="Search indexed paths")
+    p.add_argument("needle")
+    p.add_argument("--mode", choices=("fuzzy",) + SEARCH_MODES, default="fuzzy")
+    p.add_argument("--limit", type=int, default=25)
+    p.set_defaults(func=_cmd_search)
+    p = sub.add_parser("rebuild-search", help="Rebuild the path search index from the nodes table")
+    p.set_defaults(func=_cmd_rebuild_search)
+    p = sub.add_parser("rebuild-stats", help="Recompute per-directory aggregates (counts, bytes, depth)")
+    p.set_defaults(func=_cmd_rebuild_stats)
+    p = sub.add_parser("rebuild-spatial", help="Rebuild the R*Tree of item positions from the transforms table")
+    p.set_defaults(func=_cmd_rebuild_spatial)
+    p = sub.add_parser("rebuild-dir-order", help="Recompute the depth-first listing of directories")
+    p.set_defaults(func=_cmd_rebuild_dir_order)
+    p = sub.add_parser("classify", help="Sniff the content type of indexed files that are new or changed")
+    p.add_argument("root", type=Path, nargs="?", help="Only classify files under this directory")
+    p.add_argument("--workers", type=int, default=CLASSIFY_WORKERS, help=f"Worker processes (default: {CLASSIFY_WORKERS})")
+    p.set_defaults(func=_cmd_classify)
+    p = sub.add_parser("config-import", help="Copy .rogueos sidecar files under an indexed tree into the index")
+    p.add_argument("root", type=Path)
+    p.set_defaults(func=_cmd_config_import)
+    p = sub.add_parser("config-export", help="Write room configs stored in the index back out as .rogueos files")
+    p.add_argument("root", type=Path, nargs="?", help="Only export this directory and its subtree")
+    p.set_defaults(func=_cmd_config_export)
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,7 +1,17 @@
+"""Per-directory room configuration.
+
+Configs live in a `.rogueos` sidecar file in each directory, or, with ROGUEOS_CONFIG_STORE=index,
+as rows in the IndexDB `configs` table (no files are written; an existing sidecar is still read
+until the room is saved to the index). Callers pass `db=` so the index store can be used.
+"""
 from __future__ import annotations
-import json
+import copy, json, os, threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple
+
+if TYPE_CHECKING:
+    from .index import IndexDB
 
 DEFAULT_CONFIG = {
     "type": "room",
@@ -12,35 +22,178 @@ DEFAULT_CONFIG = {
 }
 
 CONFIG_FILENAME = ".rogueos"
+OPTIONAL_KEYS = ("wings",)
+CONFIG_STORES = ("sidecar", "index")
+CONFIG_STORE = os.environ.get("ROGUEOS_CONFIG_STORE", "sidecar")
+CACHE_SIZE = int(os.environ.get("ROGUEOS_CONFIG_CACHE", "1024"))
+
+# Parsed configs keyed by source, valid while its stamp matches: (mtime_ns, size) for sidecar
+# files, the row's update time for the index.
+_cache: "OrderedDict[str, Tuple[tuple, Dict[str, Any], Optional[str]]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _default() -> Dict[str, Any]:
+    return copy.deepcopy(DEFAULT_CONFIG)
+
+def _serialize(cfg: Dict[str, Any]) -> str:
+    return json.dumps(cfg, indent=2, sort_keys=True)
+
+def _remember(key: str, stamp: tuple, cfg: Dict[str, Any], text: Optional[str]):
+    with _cache_lock:
+        _cache[key] = (stamp, cfg, text)
+        _cache.move_to_end(key)
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _cached(key: str, stamp: tuple):
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is None or hit[0] != stamp:
+            return None
+        _cache.move_to_end(key)
+        return hit
+
+def clear_config_cache():
+    with _cache_lock:
+        _cache.clear()
 
 def _ensure_cfg(cfg: Dict[str, Any]) -> Dict[str, Any]:
-    merged = dict(DEFAULT_CONFIG)
+    merged = _default()
     merged.update({k: v for k, v in cfg.items() if k in DEFAULT_CONFIG})
     merged["children"] = dict(cfg.get("children", {}))
     merged["containers"] = dict(cfg.get("containers", {}))
     merged["npcs"] = dict(cfg.get("npcs", {}))
+    # Optional sections are kept only when present, so existing files serialize unchanged.
+    for key in OPTIONAL_KEYS:
+        if isinstance(cfg.get(key), dict):
+            merged[key] = dict(cfg[key])
     if "presentation" not in merged or not isinstance(merged["presentation"], str):
         merged["presentation"] = "hall"
     return merged
 
-def load_config(dir_path: Path) -> Dict[str, Any]:
+def _parse(text: Optional[str]) -> Dict[str, Any]:
+    try:
+        data = json.loads(text)
+    except Exception:
+        return _default()
+    return _ensure_cfg(data) if isinstance(data, dict) else _default()
+
+def _uses_index(db: Optional["IndexDB"]) -> bool:
+    return db is not None and CONFIG_STORE == "index"
+
+def _index_key(db: "IndexDB", dir_path: Path) -> str:
+    return f"index:{db.path}:{dir_path}"
+
+def _read_sidecar(dir_path: Path):
+    """(cfg, text) from the sidecar file, or None if there is none."""
     cfg_path = dir_path / CONFIG_FILENAME
-    if not cfg_path.exists():
-        return dict(DEFAULT_CONFIG)
+    try:
+        st = os.stat(cfg_path)
+    except OSError:
+        return None
+    key = str(cfg_path); stamp = (st.st_mtime_ns, st.st_size)
+    hit = _cached(key, stamp)
+    if hit is not None:
+        return hit[1], hit[2]
     try:
         with cfg_path.open("r", encoding="utf-8") as f:
-            data = json.load(f)
-            if not isinstance(data, dict):
-                return dict(DEFAULT_CONFIG)
-            return _ensure_cfg(data)
+            text = f.read()
     except Exception:
-        return dict(DEFAULT_CONFIG)
+        text = None
+    cfg = _parse(text)
+    _remember(key, stamp, cfg, text)
+    return cfg, text
+
+def _read_index(db: "IndexDB", dir_path: Path):
+    row = db.get_config(str(dir_path))
+    if row is None:
+        return None
+    key = _index_key(db, dir_path); stamp = (row["updated"],)
+    hit = _cached(key, stamp)
+    if hit is not None:
+        return hit[1], hit[2]
+    cfg = _parse(row["data"])
+    _remember(key, stamp, cfg, row["data"])
+    return cfg, row["data"]
 
-def save_config(dir_path: Path, cfg: Dict[str, Any]) -> None:
+def _read(dir_path: Path, db: Optional["IndexDB"]):
+    found = _read_index(db, dir_path) if _uses_index(db) else None
+    return found or _read_sidecar(dir_path)
+
+def load_config(dir_path: Path, *, readonly: bool = False, db: Optional["IndexDB"] = None) -> Dict[str, Any]:
+    """Parsed config (one stat or one indexed lookup when cached).
+    readonly=True returns the shared cached dict: do not mutate it."""
+    found = _read(dir_path, db)
+    if found is None:
+        return _default()
+    return found[0] if readonly else copy.deepcopy(found[0])
+
+def config_fingerprint(dir_path: Path, db: Optional["IndexDB"] = None) -> str:
+    """Cheap change token for a directory's config (one stat or one indexed lookup, no parse)."""
+    if _uses_index(db):
+        row = db.get_config(str(dir_path))
+        if row is not None:
+            return f"index:{row['updated']}"
+    try:
+        st = os.stat(dir_path / CONFIG_FILENAME)
+    except OSError:
+        return "missing"
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+def _write_sidecar(dir_path: Path, text: str):
     cfg_path = dir_path / CONFIG_FILENAME
     cfg_path.parent.mkdir(parents=True, exist_ok=True)
-    with cfg_path.open("w", encoding="utf-8") as f:
-        json.dump(cfg, f, indent=2, sort_keys=True)
+    tmp = cfg_path.with_name(f"{CONFIG_FILENAME}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, cfg_path)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    st = os.stat(cfg_path)
+    _remember(str(cfg_path), (st.st_mtime_ns, st.st_size), _parse(text), text)
+
+def save_config(dir_path: Path, cfg: Dict[str, Any], *, db: Optional["IndexDB"] = None) -> bool:
+    """Store cfg if it differs from what is stored (sidecar files are replaced atomically).
+    Returns True if it wrote."""
+    text = _serialize(cfg)
+    found = _read(dir_path, db)
+    if found is not None and found[1] == text:
+        return False
+    if _uses_index(db):
+        return db.set_config(str(dir_path), text)
+    _write_sidecar(dir_path, text)
+    return True
+
+def import_sidecars(db: "IndexDB", dirs: Iterable[Path]) -> int:
+    """Copy the sidecar files of indexed directories into the index; returns how many were stored."""
+    count = 0
+    with db.batch():
+        for dir_path in dirs:
+            found = _read_sidecar(dir_path)
+            if found is None or found[1] is None:
+                continue
+            text = _serialize(found[0]); stored = _read_index(db, dir_path)
+            if (stored is None or stored[1] != text) and db.set_config(str(dir_path), text):
+                count += 1
+    return count
+
+def export_sidecars(db: "IndexDB", under: Optional[Path] = None) -> int:
+    """Write configs stored in the index out as sidecar files (unchanged files are left alone)."""
+    count = 0
+    for row in db.iter_configs(None if under is None else str(under)):
+        dir_path = Path(row["path"]); text = _serialize(_parse(row["data"]))
+        found = _read_sidecar(dir_path)
+        if found is None or found[1] != text:
+            _write_sidecar(dir_path, text)
+            count += 1
+    return count
 
 def ensure_child_metadata(cfg: Dict[str, Any], child_name: str, *, access: str = "door", state: str = "open") -> None:
     children = cfg.setdefault("children", {})
@@ -0,0 +1,286 @@
+"""fzf-style fuzzy path matching over an in-memory snapshot of the index.
+
+Paths are held as lowercase, NUL-separated segments of text (shallowest first) plus an array of
+line offsets, so the subsequence filter runs inside the regex engine; new paths are appended as
+another segment instead of copying the text. Every search works
+against a time budget: when it runs out, the best matches so far are returned and the
+next call with the same or an extended query resumes where the scan stopped.
+"""
+from __future__ import annotations
+import heapq, math, os, re, threading, time, weakref
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from .index import IndexDB
+from .node import NodeKind
+
+BUDGET_SECS = float(os.environ.get("ROGUEFS_FUZZY_BUDGET_MS", "8")) / 1000
+REBUILD_SECS = float(os.environ.get("ROGUEFS_FUZZY_REBUILD_SECS", "300"))
+
+# Scoring follows fzf's v1 algorithm.
+SCORE_MATCH = 16
+SCORE_GAP_START = -3
+SCORE_GAP_EXTENSION = -1
+BONUS_BOUNDARY = 8            # match right after '_', '-', '.' or ' '
+BONUS_SLASH = 10              # match at the start of a path segment
+BONUS_CONSECUTIVE = 4
+BONUS_FIRST_CHAR_MULTIPLIER = 2
+BONUS_BASENAME = 24           # whole match inside the last path segment
+BONUS_VISIT = 6               # per doubling of the visit count
+BONUS_RECENT = 16             # decays with RECENT_HALF_LIFE
+RECENT_HALF_LIFE = 7 * 86400.0
+_SEPARATORS = "_-. "
+_SEP = "\0"
+_CHUNK = 16                   # matches between deadline checks
+_SCAN_CHUNK = 1 << 18         # characters per regex call
+_KEEP_STATES = 16
+_SEGMENT_MIN = 1 << 16        # appends are merged into the last segment while it is shorter than this
+
+class FuzzyMatch(NamedTuple):
+    rowid: int
+    score: int
+    positions: Tuple[int, ...]
+
+class FuzzyResult(NamedTuple):
+    matches: List[FuzzyMatch]
+    complete: bool            # False if the budget ran out before every path was checked
+
+def _align(s: str, q: str) -> Optional[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """Two candidate alignments of q in s: shortest window ending at the leftmost possible end, and rightmost."""
+    i = -1
+    for c in q:
+        i = s.find(c, i + 1)
+        if i < 0:
+            return None
+    left = []; j = i + 1
+    for c in reversed(q):
+        j = s.rfind(c, 0, j); left.append(j)
+    right = []; j = len(s)
+    for c in reversed(q):
+        j = s.rfind(c, 0, j); right.append(j)
+    return tuple(reversed(left)), tuple(reversed(right))
+
+def _score_positions(s: str, positions: Tuple[int, ...], name_off: int) -> int:
+    score = 0; prev = -2
+    for k, p in enumerate(positions):
+        before = s[p - 1] if p else "/"
+        bonus = BONUS_SLASH if before == "/" else BONUS_BOUNDARY if before in _SEPARATORS else 0
+        if k == 0:
+            score += SCORE_MATCH + bonus * BONUS_FIRST_CHAR_MULTIPLIER
+        elif p == prev + 1:
+            score += SCORE_MATCH + max(bonus, BONUS_CONSECUTIVE)
+        else:
+            score += SCORE_MATCH + bonus + SCORE_GAP_START + SCORE_GAP_EXTENSION * (p - prev - 2)
+        prev = p
+    if positions[0] >= name_off:
+        score += BONUS_BASENAME
+    return score
+
+def score_path(path: str, query: str) -> Optional[Tuple[int, Tuple[int, ...]]]:
+    """(score, positions) of the best alignment of query in path, or None if it does not match."""
+    s = path.lower(); q = _normalize(query)
+    if not q:
+        return None
+    aligned = _align(s, q)
+    if aligned is None:
+        return None
+    name_off = s.rfind("/", 0, len(s) - 1) + 1
+    return max((_score_positions(s, pos, name_off), pos) for pos in aligned)
+
+def _normalize(query: str) -> str:
+    return "".join(query.lower().split()).replace(_SEP, "")
+
+class _State:
+    """Progress of one query: verified hits, candidates inherited from a shorter query, unscanned tail."""
+    __slots__ = ("query", "pattern", "hits", "lines", "pending", "pending_pos", "scan_pos")
+
+    def __init__(self, query: str, pending: array, pending_pos: int, scan_pos: int):
+        self.query = query
+        # Leftmost subsequence match: each gap stops at the first occurrence of the next character.
+        self.pattern = re.compile(re.escape(query[0]) + "".join(f"[^{re.escape(c)}{_SEP}]*{re.escape(c)}" for c in query[1:]))
+        self.hits: list = []                 # (score, -length, -line) heap entries
+        self.lines = array("I")              # matching lines, in index order
+        self.pending = pending; self.pending_pos = pending_pos; self.scan_pos = scan_pos
+
+class FuzzyIndex:
+    """Snapshot of node paths answering fuzzy queries incrementally within a time budget."""
+
+    def __init__(self, rows, boosts: Optional[dict] = None):
+        self._segs: List[str] = []; self._seg_base = array("Q")    # segment text, offset of its first character
+        self._rowids = array("q"); self._starts = array("Q", [0])
+        self._boosts = boosts or {}
+        self._states: "OrderedDict[str, _State]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_rowid = 0
+        self.churn: Optional[int] = None     # IndexDB.nodes_churn() when built
+        self.built = time.time()
+        self.seen: "weakref.WeakKeyDictionary[IndexDB, tuple]" = weakref.WeakKeyDictionary()  # connection -> nodes_version
+        self.extend(rows)
+
+    def extend(self, rows):
+        """Append (rowid, path) rows. In-flight queries stay valid: they scan the new tail next."""
+        paths = []; rowids = array("q"); starts = array("Q"); off = self._starts[-1]
+        for rowid, path in rows:
+            p = path.lower().replace(_SEP, "")
+            paths.append(p); rowids.append(rowid); starts.append(off + len(p) + 1)
+            off += len(p) + 1
+        if not paths:
+            return
+        text = _SEP.join(paths) + _SEP
+        with self._lock:
+            # Offsets are global, so scan positions of in-flight queries stay valid either way.
+            if self._segs and len(self._segs[-1]) < _SEGMENT_MIN:
+                self._segs[-1] += text
+            else:
+                self._segs.append(text); self._seg_base.append(self._starts[-1])
+            self._rowids.extend(rowids); self._starts.extend(starts)
+            self.max_rowid = max(self.max_rowid, max(rowids))
+
+    def __len__(self) -> int:
+        return len(self._rowids)
+
+    def _segment(self, off: int) -> Tuple[str, int]:
+        """(segment holding global offset off, offset of its first character)."""
+        k = bisect_right(self._seg_base, off) - 1
+        return self._segs[k], self._seg_base[k]
+
+    def _line(self, line: int) -> str:
+        seg, base = self._segment(self._starts[line])
+        return seg[self._starts[line] - base:self._starts[line + 1] - 1 - base]
+
+    @classmethod
+    def from_db(cls, db: IndexDB, kind: Optional[str] = None) -> "FuzzyIndex":
+        version = db.nodes_version()
+        churn = db.nodes_churn()
+        idx = cls(db.iter_paths(kind))
+        idx.seen[db] = version; idx.churn = churn
+        idx.set_visits(db)
+        return idx
+
+    def set_visits(self, db: IndexDB):
+        """Reload visit/recency boosts (cheap: the visits table only holds rooms actually entered).
+        Queries in flight keep their progress; only the scores of their hits change."""
+        now = time.time(); boosts = {}
+        for rowid, count, last in db.visit_counts():
+            bonus = BONUS_VISIT * math.log2(1 + (count or 0))
+            if last:
+                bonus += BONUS_RECENT * 0.5 ** (max(0.0, now - last) / RECENT_HALF_LIFE)
+            boosts[rowid] = int(bonus)
+        with self._lock:
+            old = self._boosts
+            if boosts == old:
+                return
+            self._boosts = boosts
+            changed = {r for r in old.keys() | boosts.keys() if old.get(r, 0) != boosts.get(r, 0)}
+            for st in self._states.values():
+                hits = st.hits
+                for i, (score, neg_len, neg_line) in enumerate(hits):
+                    rowid = self._rowids[-neg_line]
+                    if rowid in changed:
+                        hits[i] = (score - old.get(rowid, 0) + boosts.get(rowid, 0), neg_len, neg_line)
+
+    def _state_for(self, q: str) -> _State:
+        st = self._states.get(q)
+        if st is not None:
+            self._states.move_to_end(q)
+            return st
+        base = max((s for k, s in self._states.items() if q.startswith(k)), key=lambda s: len(s.query), default=None)
+        if base is None:
+            st = _State(q, array("I"), 0, 0)
+        else:
+            # Only lines that matched the shorter query can match this one; the unscanned tail is shared.
+            st = _State(q, base.lines + base.pending[base.pending_pos:], 0, base.scan_pos)
+        self._states[q] = st
+        if len(self._states) > _KEEP_STATES:
+            self._states.popitem(last=False)
+        return st
+
+    def _accept(self, st: _State, line: int):
+        s = self._line(line)
+        aligned = _align(s, st.query)
+        if aligned is None:
+            return
+        name_off = s.rfind("/", 0, len(s) - 1) + 1
+        score = max(_score_positions(s, pos, name_off) for pos in aligned) + self._boosts.get(self._rowids[line], 0)
+        st.lines.append(line)
+        st.hits.append((score, -len(s), -line))
+
+    def _advance(self, st: _State, deadline: float) -> bool:
+        starts = self._starts; search = st.pattern.search
+        pending = st.pending; n = 0
+        while st.pending_pos < len(pending):
+            line = pending[st.pending_pos]; st.pending_pos += 1
+            seg, base = self._segment(starts[line])
+            if search(seg, starts[line] - base, starts[line + 1] - 1 - base):
+                self._accept(st, line)
+            n += 1
+            if n % _CHUNK == 0 and time.perf_counter() > deadline:
+                return False
+        end = starts[-1]
+        while st.scan_pos < end:
+            seg, base = self._segment(st.scan_pos)
+            stop = seg.find(_SEP, min(len(seg) - 1, st.scan_pos - base + _SCAN_CHUNK)) + 1
+            while True:
+                m = search(seg, st.scan_pos - base, stop)
+                if m is None:
+                    st.scan_pos = base + stop
+                    break
+                line = bisect_right(starts, base + m.start()) - 1
+                st.scan_pos = starts[line + 1]
+                self._accept(st, line)
+                n += 1
+                if n % _CHUNK == 0 and time.perf_counter() > deadline:
+                    return st.scan_pos >= end
+            if time.perf_counter() > deadline:
+                break
+        return st.scan_pos >= end
+
+    def search(self, query: str, limit: int = 25, budget: float = BUDGET_SECS) -> FuzzyResult:
+        """Best `limit` matches found within `budget` seconds; repeat the call to keep refining."""
+        q = _normalize(query)
+        if not q:
+            return FuzzyResult([], True)
+        deadline = time.perf_counter() + budget
+        with self._lock:
+            st = self._state_for(q)
+            complete = self._advance(st, deadline)
+            best = [(score, -neg_line, self._line(-neg_line)) for score, _, neg_line in heapq.nlargest(limit, st.hits)]
+        matches = []
+        for score, line, s in best:
+            name_off = s.rfind("/", 0, len(s) - 1) + 1
+            _, pos = max((_score_positions(s, p, name_off), p) for p in _align(s, q))
+            matches.append(FuzzyMatch(self._rowids[line], score, pos))
+        return FuzzyResult(matches, complete)
+
+_INDEXES: Dict[Tuple[str, Optional[str]], FuzzyIndex] = {}
+_MEMORY_INDEXES: "weakref.WeakKeyDictionary[IndexDB, dict]" = weakref.WeakKeyDictionary()
+_INDEXES_LOCK = threading.Lock()
+
+def fuzzy_index(db: IndexDB, dirs_only: bool = False) -> FuzzyIndex:
+    """Snapshot shared by every connection to the same database file. New nodes are appended as
+    they appear; a rename or deletion (IndexDB.nodes_churn) triggers a full rebuild. Databases
+    without the counter are rebuilt at most every REBUILD_SECS instead (deleted rows are skipped meanwhile)."""
+    kind = NodeKind.DIRECTORY.value if dirs_only else None
+    with _INDEXES_LOCK:
+        per_db = _MEMORY_INDEXES.setdefault(db, {}) if db.path == ":memory:" else _INDEXES
+        key = (db.path, kind)
+        idx = per_db.get(key)
+        version = db.nodes_version()
+        if idx is None:
+            idx = per_db[key] = FuzzyIndex.from_db(db, kind)
+        elif idx.seen.get(db) != version:
+            churn = db.nodes_churn()
+            if churn != idx.churn or (churn is None and db in idx.seen and time.time() - idx.built >= REBUILD_SECS):
+                idx = per_db[key] = FuzzyIndex.from_db(db, kind)
+            else:
+                idx.extend(db.iter_paths(kind, after_rowid=idx.max_rowid))
+                idx.set_visits(db)          # no-op unless a boost actually changed
+            idx.seen[db] = version
+    return idx
+
+def fuzzy_search(db: IndexDB, query: str, limit: int = 25, dirs_only: bool = False, budget: float = BUDGET_SECS):
+    """Fuzzy-ranked node rows: returns ([(row, FuzzyMatch), ...], complete)."""
+    result = fuzzy_index(db, dirs_only).search(query, limit=limit, budget=budget)
+    rows = {r["rowid"]: r for r in db.get_nodes_by_rowid(m.rowid for m in result.matches)}
+    return [(rows[m.rowid], m) for m in result.matches if m.rowid in rows], result.complete
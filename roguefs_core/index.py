@@ -1,61 +1,724 @@
 
 from __future__ import annotations
-import os, sqlite3, time, sys
+import heapq, math, os, sqlite3, time, sys
+from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from itertools import repeat
+from typing import Iterable, Optional, Sequence, Tuple
+from urllib.parse import quote
 from .node import Transform, transform_to_tuple, transform_from_tuple, NodeKind
 
 DEFAULT_DB = os.path.expanduser("~/.roguefs/index.sqlite")
+CACHE_SIZE = int(os.environ.get("ROGUEFS_CACHE_SIZE", "65536"))
 SCHEMA = """
 PRAGMA journal_mode=WAL;
 PRAGMA synchronous=NORMAL;
-CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, path TEXT NOT NULL, kind TEXT NOT NULL, parent TEXT, seed TEXT, theme TEXT, last_seen REAL);
+CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, path TEXT NOT NULL, kind TEXT NOT NULL, parent TEXT, seed TEXT, theme TEXT, last_seen REAL, size INTEGER, mtime_ns INTEGER);
 CREATE INDEX IF NOT EXISTS idx_nodes_parent ON nodes(parent);
 CREATE UNIQUE INDEX IF NOT EXISTS idx_nodes_path ON nodes(path);
 CREATE TABLE IF NOT EXISTS transforms (id TEXT PRIMARY KEY, x REAL,y REAL,z REAL, rx REAL,ry REAL,rz REAL,rw REAL, sx REAL,sy REAL,sz REAL);
 CREATE TABLE IF NOT EXISTS spaces (id TEXT PRIMARY KEY, ox REAL,oy REAL,oz REAL, sx REAL,sy REAL,sz REAL);
 CREATE TABLE IF NOT EXISTS pins (id TEXT PRIMARY KEY, pinned INTEGER DEFAULT 1);
 CREATE TABLE IF NOT EXISTS visits (id TEXT PRIMARY KEY, count INTEGER DEFAULT 0, last REAL);
+CREATE TABLE IF NOT EXISTS rooms (id TEXT PRIMARY KEY, mtime_ns INTEGER, ctime_ns INTEGER, config_fp TEXT, generated REAL);
+CREATE TABLE IF NOT EXISTS dir_stats (id TEXT PRIMARY KEY, child_count INTEGER NOT NULL DEFAULT 0, file_count INTEGER NOT NULL DEFAULT 0, total_bytes INTEGER NOT NULL DEFAULT 0, max_depth INTEGER NOT NULL DEFAULT 0);
+CREATE TABLE IF NOT EXISTS configs (id TEXT PRIMARY KEY, data TEXT NOT NULL, updated INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS crawl (root TEXT NOT NULL, path TEXT NOT NULL, id TEXT, parent TEXT, done INTEGER DEFAULT 0, PRIMARY KEY(root, path));
+CREATE TABLE IF NOT EXISTS churn (id INTEGER PRIMARY KEY CHECK (id = 0), count INTEGER NOT NULL);
+INSERT OR IGNORE INTO churn VALUES (0, 0);
+CREATE TRIGGER IF NOT EXISTS nodes_churn_ad AFTER DELETE ON nodes BEGIN UPDATE churn SET count = count + 1; END;
+CREATE TRIGGER IF NOT EXISTS nodes_churn_au AFTER UPDATE OF path ON nodes WHEN old.path <> new.path BEGIN UPDATE churn SET count = count + 1; END;
 """
+# Columns added after the first release; old databases get them via ALTER TABLE on open.
+MIGRATIONS = [
+    ("nodes", "size", "INTEGER"),
+    ("nodes", "mtime_ns", "INTEGER"),
+    ("nodes", "wing", "TEXT"),
+    ("nodes", "ctype", "TEXT"),
+    ("nodes", "ctype_mtime", "INTEGER"),
+    ("nodes", "ctype_ino", "INTEGER"),
+]
+# Indexes on migrated columns, created once the columns exist.
+MIGRATION_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_nodes_wing ON nodes(wing) WHERE wing IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_nodes_ctype ON nodes(ctype, path) WHERE ctype IS NOT NULL;
+"""
+UPSERT_NODE = (
+    "INSERT INTO nodes(id,path,kind,parent,seed,theme,last_seen,size,mtime_ns) VALUES(?,?,?,?,?,?,?,?,?) "
+    "ON CONFLICT(id) DO UPDATE SET path=excluded.path, kind=excluded.kind, parent=excluded.parent, seed=excluded.seed, theme=excluded.theme, last_seen=excluded.last_seen, "
+    "size=COALESCE(excluded.size, nodes.size), mtime_ns=COALESCE(excluded.mtime_ns, nodes.mtime_ns)"
+)
+# Basename of a '/'-separated path column, in SQL (strip everything up to the last '/').
+_BASENAME_SQL = "substr({0}, length(rtrim({0}, replace({0}, '/', ''))) + 1)"
+# Contentless trigram indexes keyed by nodes.rowid and kept in sync by triggers: basenames of
+# every node, and full paths of directories only (a file's path is its directory's path plus
+# its name, and indexing dirs alone keeps bulk inserts cheap). Rebuild them after a VACUUM.
+_NAME_OLD = _BASENAME_SQL.format("old.path")
+_NAME_NEW = _BASENAME_SQL.format("new.path")
+SEARCH_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS names_fts USING fts5(name, content='', tokenize='trigram');
+CREATE VIRTUAL TABLE IF NOT EXISTS dirpaths_fts USING fts5(path, content='', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS nodes_search_ai AFTER INSERT ON nodes BEGIN
+  INSERT INTO names_fts(rowid, name) VALUES (new.rowid, {_NAME_NEW});
+  INSERT INTO dirpaths_fts(rowid, path) SELECT new.rowid, new.path WHERE new.kind = 'Directory';
+END;
+CREATE TRIGGER IF NOT EXISTS nodes_search_ad AFTER DELETE ON nodes BEGIN
+  INSERT INTO names_fts(names_fts, rowid, name) VALUES ('delete', old.rowid, {_NAME_OLD});
+  INSERT INTO dirpaths_fts(dirpaths_fts, rowid, path) SELECT 'delete', old.rowid, old.path WHERE old.kind = 'Directory';
+END;
+CREATE TRIGGER IF NOT EXISTS nodes_search_au AFTER UPDATE OF path, kind ON nodes WHEN old.path <> new.path OR old.kind <> new.kind BEGIN
+  INSERT INTO names_fts(names_fts, rowid, name) VALUES ('delete', old.rowid, {_NAME_OLD});
+  INSERT INTO dirpaths_fts(dirpaths_fts, rowid, path) SELECT 'delete', old.rowid, old.path WHERE old.kind = 'Directory';
+  INSERT INTO names_fts(rowid, name) VALUES (new.rowid, {_NAME_NEW});
+  INSERT INTO dirpaths_fts(rowid, path) SELECT new.rowid, new.path WHERE new.kind = 'Directory';
+END;
+"""
+SEARCH_MODES = ("substring", "basename", "prefix")
+# R*Tree over item positions, keyed by nodes.rowid. The first dimension is the rowid of the room
+# showing the item (its wing, else its parent) so one tree serves every room. rtree_i32 keeps exact
+# integer room keys; positions are stored in 1/SPATIAL_SCALE world units and re-checked against
+# transforms on query. Triggers keep it in sync with transforms and with items moving between rooms.
+SPATIAL_SCALE = 1024
+_SPATIAL_X = f"CAST(round(t.x * {SPATIAL_SCALE}) AS INTEGER)"
+_SPATIAL_Y = f"CAST(round(t.y * {SPATIAL_SCALE}) AS INTEGER)"
+_SPATIAL_ROW = (f"SELECT n.rowid, room.rowid, room.rowid, {_SPATIAL_X}, {_SPATIAL_X}, {_SPATIAL_Y}, {_SPATIAL_Y} "
+                "FROM transforms t JOIN nodes n ON n.id = t.id JOIN nodes room ON room.id = COALESCE(n.wing, n.parent)")
+SPATIAL_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS transforms_rtree USING rtree_i32(id, room_lo, room_hi, x_lo, x_hi, y_lo, y_hi);
+CREATE TRIGGER IF NOT EXISTS transforms_spatial_ai AFTER INSERT ON transforms BEGIN
+  DELETE FROM transforms_rtree WHERE id = (SELECT rowid FROM nodes WHERE id = new.id);
+  INSERT INTO transforms_rtree {_SPATIAL_ROW} WHERE t.id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS transforms_spatial_au AFTER UPDATE OF x, y ON transforms
+WHEN old.x IS NOT new.x OR old.y IS NOT new.y BEGIN
+  DELETE FROM transforms_rtree WHERE id = (SELECT rowid FROM nodes WHERE id = new.id);
+  INSERT INTO transforms_rtree {_SPATIAL_ROW} WHERE t.id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS transforms_spatial_ad AFTER DELETE ON transforms BEGIN
+  DELETE FROM transforms_rtree WHERE id = (SELECT rowid FROM nodes WHERE id = old.id);
+END;
+CREATE TRIGGER IF NOT EXISTS nodes_spatial_au AFTER UPDATE OF parent, wing ON nodes
+WHEN old.parent IS NOT new.parent OR old.wing IS NOT new.wing BEGIN
+  DELETE FROM transforms_rtree WHERE id = new.rowid;
+  INSERT INTO transforms_rtree {_SPATIAL_ROW} WHERE t.id = new.id;
+END;
+CREATE TRIGGER IF NOT EXISTS nodes_spatial_ad AFTER DELETE ON nodes BEGIN
+  DELETE FROM transforms_rtree WHERE id = old.rowid;
+END;
+"""
+# Directories flattened in depth-first pre-order. Pre-order is path order with '/' sorting below every
+# other character, hence the _DIR_KEY expression index. dir_blocks cuts that order into runs of about
+# DIR_BLOCK directories (a run starts at `key`) and counts each one; triggers keep the counts exact in
+# the writing transaction, so a directory's position is the sum of the counts before its run plus a
+# short index scan inside it, and any window of the tree is one range query on the key index.
+_DIR_KEY = "replace({0}, '/', char(1))"
+_DIR_DEPTH = "length(rtrim({0}, '/')) - length(replace(rtrim({0}, '/'), '/', ''))"
+_DIR_BLOCK_OF = "(SELECT max(key) FROM dir_blocks WHERE key <= {0})"
+DIR_BLOCK = 512
+DIR_ORDER_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS dir_blocks (key TEXT PRIMARY KEY, count INTEGER NOT NULL) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_nodes_dir_key ON nodes({_DIR_KEY.format('path')}) WHERE kind = 'Directory';
+CREATE TRIGGER IF NOT EXISTS nodes_dir_blocks_ai AFTER INSERT ON nodes WHEN new.kind = 'Directory' BEGIN
+  UPDATE dir_blocks SET count = count + 1 WHERE key = {_DIR_BLOCK_OF.format(_DIR_KEY.format('new.path'))};
+END;
+CREATE TRIGGER IF NOT EXISTS nodes_dir_blocks_ad AFTER DELETE ON nodes WHEN old.kind = 'Directory' BEGIN
+  UPDATE dir_blocks SET count = count - 1 WHERE key = {_DIR_BLOCK_OF.format(_DIR_KEY.format('old.path'))};
+END;
+CREATE TRIGGER IF NOT EXISTS nodes_dir_blocks_au AFTER UPDATE OF path, kind ON nodes
+WHEN (old.kind = 'Directory' OR new.kind = 'Directory') AND (old.path <> new.path OR old.kind <> new.kind) BEGIN
+  UPDATE dir_blocks SET count = count - 1 WHERE old.kind = 'Directory' AND key = {_DIR_BLOCK_OF.format(_DIR_KEY.format('old.path'))};
+  UPDATE dir_blocks SET count = count + 1 WHERE new.kind = 'Directory' AND key = {_DIR_BLOCK_OF.format(_DIR_KEY.format('new.path'))};
+END;
+"""
+ADD_DIR_STATS = (
+    "INSERT INTO dir_stats(id,child_count,file_count,total_bytes,max_depth) VALUES(?,?,?,?,?) "
+    "ON CONFLICT(id) DO UPDATE SET child_count=child_count+excluded.child_count, file_count=file_count+excluded.file_count, "
+    "total_bytes=total_bytes+excluded.total_bytes, max_depth=MAX(max_depth, excluded.max_depth)"
+)
+SCANNED_KINDS = (NodeKind.DIRECTORY.value, NodeKind.FILE.value, NodeKind.SYMLINK.value, NodeKind.MOUNT.value)
 
 def _ensure_parent(path: str):
     parent = os.path.dirname(path)
     if parent and not os.path.exists(parent):
         os.makedirs(parent, exist_ok=True)
 
+_MISS = object()
+
+class _LRU:
+    """Size-bounded LRU map with hit/miss counters; get() returns _MISS when absent."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize; self.hits = 0; self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return _MISS
+        self._data.move_to_end(key); self.hits += 1
+        return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = value; self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
+
+def _fts_phrase(needle: str) -> str:
+    return '"' + needle.replace('"', '""') + '"'
+
+def _like_pattern(needle: str) -> str:
+    """LIKE pattern matching needle anywhere, with '%', '_' and '\\' escaped by '\\'."""
+    return "%" + needle.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def _search_rank(row, needle: str):
+    path = row["path"]; name = os.path.basename(path).lower()
+    if name == needle: tier = 0
+    elif name.startswith(needle): tier = 1
+    elif needle in name: tier = 2
+    else: tier = 3
+    return (tier, path.count("/"), len(path), path)
+
+def _depth(path: str) -> int:
+    return path.rstrip("/").count("/")
+
+def _subtree_range(path: str) -> Tuple[str, str]:
+    """[lo, hi) bounds on nodes.path covering everything strictly below path ('0' sorts right after '/')."""
+    base = path.rstrip("/")
+    return base + "/", base + "0"
+
+def _ancestor_paths(path: str) -> list:
+    """Every proper prefix of path that ends a segment: '/a/b/c' -> ['/', '/a', '/a/b']."""
+    parts = path.rstrip("/").split("/")
+    out = ["/"] if path.startswith("/") and len(parts) > 1 else []
+    for i in range(2, len(parts)):
+        out.append("/".join(parts[:i]))
+    return out
+
+def _contribution(kind: str, size, files, total, max_depth) -> Tuple[int, int, int]:
+    """(files, bytes, depth) a node adds to its parent directory's aggregates."""
+    if kind == NodeKind.FILE.value:
+        return 1, size or 0, 1
+    if kind == NodeKind.DIRECTORY.value:
+        return files or 0, total or 0, 1 + (max_depth or 0)
+    return 0, 0, 1
+
+def _node_params(rows, now: float):
+    for id, path, kind, parent, seed, theme, size, mtime_ns in rows:
+        yield (id, str(path), kind.value, parent, seed, theme, now, size, mtime_ns)
+
+def _add_delta(deltas: dict, dir_id: str, children: int, files: int, total: int, depth: int, recheck: bool):
+    d = deltas.get(dir_id)
+    if d is None:
+        deltas[dir_id] = [children, files, total, depth, recheck]
+    else:
+        d[0] += children; d[1] += files; d[2] += total; d[3] = max(d[3], depth); d[4] = d[4] or recheck
+
 class IndexDB:
-    def __init__(self, path: Optional[str] = None, *, check_same_thread: bool = True):
+    def __init__(self, path: Optional[str] = None, *, check_same_thread: bool = True, cache_size: int = CACHE_SIZE,
+                 readonly: bool = False):
+        """Open (creating/migrating) the index. readonly=True opens an existing database as a WAL
+        reader: no schema work, writes fail, and sync() must be called to see other connections' commits."""
         wanted = path or os.environ.get("ROGUEFS_DB", DEFAULT_DB)
-        try:
-            _ensure_parent(wanted)
-            self._conn = sqlite3.connect(wanted, check_same_thread=check_same_thread)
-        except Exception as e:
-            fallback_dir = os.path.abspath("./.roguefs")
-            os.makedirs(fallback_dir, exist_ok=True)
-            fallback = os.path.join(fallback_dir, "index.sqlite")
-            print(f"[IndexDB] Could not open DB at '{wanted}' ({e}). Falling back to '{fallback}'.", file=sys.stderr)
-            self._conn = sqlite3.connect(fallback, check_same_thread=check_same_thread)
+        self.path = wanted
+        if readonly:
+            # '?' or '#' in a raw path would end the URI's path part early.
+            uri = f"file:{quote(os.path.abspath(wanted))}?mode=ro"
+            self._conn = sqlite3.connect(uri, uri=True, check_same_thread=check_same_thread)
+        else:
+            try:
+                _ensure_parent(wanted)
+                self._conn = sqlite3.connect(wanted, check_same_thread=check_same_thread)
+            except Exception as e:
+                fallback_dir = os.path.abspath("./.roguefs")
+                os.makedirs(fallback_dir, exist_ok=True)
+                fallback = os.path.join(fallback_dir, "index.sqlite")
+                print(f"[IndexDB] Could not open DB at '{wanted}' ({e}). Falling back to '{fallback}'.", file=sys.stderr)
+                self._conn = sqlite3.connect(fallback, check_same_thread=check_same_thread)
+                self.path = fallback
         self._conn.row_factory = sqlite3.Row
+        self.readonly = readonly
+        self._batch_depth = 0
+        # Bumped on every node / visit write so in-memory snapshots (fuzzy.py) can tell they are stale.
+        self.generation = 0; self.visits_generation = 0
+        self.layout_generation = 0  # likewise for transforms and spaces (rogueos_tui.geom)
+        # Write-through caches for hot lookups; every write method below keeps them in sync.
+        self._nodes = _LRU(cache_size); self._transforms = _LRU(cache_size)
+        self._spaces = _LRU(cache_size // 16); self._pins = _LRU(cache_size)
+        self._children = _LRU(max(1, cache_size // 256) if cache_size > 0 else 0)
+        self._stats = _LRU(cache_size // 16)
+        if readonly:
+            self._fts = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='names_fts'").fetchone() is not None
+            self._rtree = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='transforms_rtree'").fetchone() is not None
+            self._dir_order = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='dir_blocks'").fetchone() is not None
+            self._churn = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='churn'").fetchone() is not None
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return
+        had_stats = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='dir_stats'").fetchone() is not None
         with self._conn:
             self._conn.executescript(SCHEMA)
+            self._migrate()
+            self._conn.executescript(DIR_ORDER_SCHEMA)
+        self._fts = self._init_search_index()
+        self._rtree = self._init_spatial_index()
+        self._dir_order = True
+        self._churn = True
+        if self._conn.execute("SELECT 1 FROM dir_blocks LIMIT 1").fetchone() is None:
+            self.rebuild_dir_order()
+        if not had_stats and self._conn.execute("SELECT 1 FROM nodes LIMIT 1").fetchone():
+            self.rebuild_dir_stats()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def sync(self) -> bool:
+        """Drop cached rows if another connection committed since the last call; True if it had."""
+        version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        if version == self._data_version:
+            return False
+        self._data_version = version
+        self.clear_cache()
+        self.generation += 1
+        return True
+
+    def _init_search_index(self) -> bool:
+        existed = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='names_fts'").fetchone() is not None
+        try:
+            with self._conn:
+                self._conn.executescript(SEARCH_SCHEMA)
+        except sqlite3.OperationalError as e:
+            # SQLite built without FTS5 (or the trigram tokenizer): search falls back to LIKE scans.
+            print(f"[IndexDB] Path search index unavailable ({e}); using LIKE search.", file=sys.stderr)
+            return False
+        if not existed and self._conn.execute("SELECT 1 FROM nodes LIMIT 1").fetchone():
+            self._fts = True
+            self.rebuild_search_index()
+        return True
+
+    def rebuild_search_index(self):
+        """Repopulate the trigram path index from nodes (repair after a crash, VACUUM or manual edits)."""
+        if not self._fts:
+            return
+        with self.batch():
+            for table in ("names_fts", "dirpaths_fts"):
+                self._conn.execute(f"INSERT INTO {table}({table}) VALUES('delete-all')")
+            self._conn.execute(f"INSERT INTO names_fts(rowid, name) SELECT rowid, {_BASENAME_SQL.format('path')} FROM nodes")
+            self._conn.execute("INSERT INTO dirpaths_fts(rowid, path) SELECT rowid, path FROM nodes WHERE kind = ?", (NodeKind.DIRECTORY.value,))
+            for table in ("names_fts", "dirpaths_fts"):
+                self._conn.execute(f"INSERT INTO {table}({table}) VALUES('optimize')")
+
+    def _init_spatial_index(self) -> bool:
+        existed = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name='transforms_rtree'").fetchone() is not None
+        try:
+            with self._conn:
+                self._conn.executescript(SPATIAL_SCHEMA)
+        except sqlite3.OperationalError as e:
+            # SQLite built without the R*Tree module: viewport queries fall back to scanning the room.
+            print(f"[IndexDB] Spatial index unavailable ({e}); scanning rooms instead.", file=sys.stderr)
+            return False
+        if not existed and self._conn.execute("SELECT 1 FROM transforms LIMIT 1").fetchone():
+            self._rtree = True
+            self.rebuild_spatial_index()
+        return True
+
+    def rebuild_spatial_index(self):
+        """Repopulate the position R*Tree from transforms and nodes."""
+        if not self._rtree:
+            return
+        with self.batch():
+            self._conn.execute("DELETE FROM transforms_rtree")
+            self._conn.execute(f"INSERT INTO transforms_rtree {_SPATIAL_ROW}")
+
+    def _migrate(self):
+        for table, column, decl in MIGRATIONS:
+            cols = {r["name"] for r in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in cols:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+        self._conn.executescript(MIGRATION_INDEXES)
+
+    @contextmanager
+    def batch(self):
+        """Run every write inside the block as one transaction; nested blocks join the outer one."""
+        if self._batch_depth:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+            return
+        self._batch_depth = 1
+        generation = self.generation
+        try:
+            with self._conn:
+                yield self
+                if self.generation != generation and self._dir_order and not self.readonly:
+                    self._split_dir_blocks()
+        except BaseException:
+            self.clear_cache()  # the rollback may have undone writes already reflected in the caches
+            raise
+        finally:
+            self._batch_depth = 0
+
+    def clear_cache(self):
+        for cache in (self._nodes, self._transforms, self._spaces, self._pins, self._children, self._stats):
+            cache.clear()
+        self.layout_generation += 1
+
+    def cache_stats(self):
+        return {"nodes": self._nodes.stats(), "transforms": self._transforms.stats(), "spaces": self._spaces.stats(),
+                "pins": self._pins.stats(), "children": self._children.stats(), "dir_stats": self._stats.stats()}
+
+    def _forget_nodes(self, ids: Iterable[str]):
+        for nid in ids:
+            self._nodes.pop(nid)
+        self._children.clear()
+        self.generation += 1
+
+    def nodes_version(self):
+        """Changes whenever nodes or visits are written, by this connection or (via data_version) another one."""
+        return (self.generation, self.visits_generation, self._conn.execute("PRAGMA data_version").fetchone()[0])
+
+    def nodes_churn(self) -> Optional[int]:
+        """Count of node deletions and path changes, by any connection (triggers keep it); None on an
+        old database opened read-only before the counter existed."""
+        if not self._churn:
+            return None
+        return self._conn.execute("SELECT count FROM churn WHERE id = 0").fetchone()[0]
 
-    def upsert_node(self, id: str, path: Path, kind: NodeKind, parent: Optional[str], seed: Optional[str], theme: Optional[str] = None):
+    def upsert_node(self, id: str, path: Path, kind: NodeKind, parent: Optional[str], seed: Optional[str], theme: Optional[str] = None,
+                    size: Optional[int] = None, mtime_ns: Optional[int] = None):
+        self.upsert_nodes([(id, path, kind, parent, seed, theme, size, mtime_ns)])
+
+    def upsert_nodes(self, rows):
+        """Bulk variant of upsert_node; rows are (id, path, kind, parent, seed, theme, size, mtime_ns) tuples."""
         now = time.time()
-        with self._conn:
+        rows = list(rows)
+        with self.batch():
+            self._evict_path_conflicts(rows)
+            old = self._stat_sources(r[0] for r in rows)
+            moves = [(prev[6], str(r[1])) for r in rows
+                     if (prev := old.get(r[0])) is not None and prev[1] == NodeKind.DIRECTORY.value and prev[6] != str(r[1])]
+            done: list = []
+            for src, dst in sorted(moves, key=lambda m: _depth(m[0])):
+                for a, b in done:  # a parent moved earlier in this batch already carried this one along
+                    lo, hi = _subtree_range(a)
+                    if lo <= src < hi:
+                        src = b.rstrip("/") + src[len(a.rstrip("/")):]
+                if src != dst:
+                    self._move_subtree(src, dst)
+                    done.append((src, dst))
+            self._conn.executemany(UPSERT_NODE, _node_params(rows, now))
+            self._forget_nodes(r[0] for r in rows)
+            deltas: dict = {}
+            for id, path, kind, parent, _, _, size, _ in rows:
+                prev = old.get(id)
+                kind = kind.value
+                if prev is None:
+                    new = _contribution(kind, size, None, None, None)
+                else:
+                    prev_parent, prev_kind, prev_size, files, total, max_depth, _ = prev
+                    size = prev_size if size is None else size
+                    new = _contribution(kind, size, files, total, max_depth) if kind == prev_kind else _contribution(kind, size, None, None, None)
+                    before = _contribution(prev_kind, prev_size, files, total, max_depth)
+                    if prev_parent == parent and prev_kind == kind:
+                        if new[1] != before[1]:
+                            _add_delta(deltas, parent, 0, 0, new[1] - before[1], 0, False)
+                        old[id] = (parent, kind, size, files, total, max_depth, str(path))
+                        continue
+                    if prev_parent:
+                        _add_delta(deltas, prev_parent, -1, -before[0], -before[1], 0, True)
+                old[id] = (parent, kind, size, *((None, None, None) if prev is None or kind != prev[1] else prev[3:6]), str(path))
+                if parent:
+                    _add_delta(deltas, parent, 1, new[0], new[1], new[2], False)
+            self._propagate_stats(deltas)
+
+    def _evict_path_conflicts(self, rows):
+        """Paths are unique, but ids follow inodes: a path now held by a different inode (file replaced,
+        directory recreated) means the old row and its subtree are stale."""
+        wanted = {str(r[1]): r[0] for r in rows}
+        paths = list(wanted)
+        stale = []
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            stale += [r["id"] for r in self._conn.execute(f"SELECT id, path FROM nodes WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+                      if wanted[r["path"]] != r["id"]]
+        self.delete_nodes(stale)
+
+    def _move_subtree(self, old_path: str, new_path: str):
+        """Rewrite the stored paths below a renamed or moved directory."""
+        lo, hi = _subtree_range(old_path)
+        new_base = new_path.rstrip("/")
+        self.delete_nodes(r["id"] for r in self._conn.execute(
+            "SELECT id FROM nodes WHERE path >= ? AND path < ?", _subtree_range(new_path)).fetchall())
+        self._conn.execute("UPDATE nodes SET path = ? || substr(path, ?) WHERE path >= ? AND path < ?",
+                           (new_base, len(old_path.rstrip("/")) + 1, lo, hi))
+        self._nodes.clear()
+        self._forget_nodes(())
+
+    def _stat_sources(self, ids: Iterable[str]) -> dict:
+        """id -> (parent, kind, size, file_count, total_bytes, max_depth, path) for the given existing nodes."""
+        out = {}
+        ids = list(dict.fromkeys(ids))
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            for r in self._conn.execute(
+                    "SELECT n.id, n.parent, n.kind, n.size, s.file_count, s.total_bytes, s.max_depth, n.path FROM nodes n "
+                    f"LEFT JOIN dir_stats s ON s.id = n.id WHERE n.id IN ({','.join('?' * len(chunk))})", chunk):
+                out[r[0]] = tuple(r)[1:]
+        return out
+
+    def _propagate_stats(self, deltas: dict):
+        """Apply {dir_id: [children, files, bytes, depth, recheck]} to dir_stats and roll files, bytes and
+        depth up through every ancestor. Ancestors are visited deepest first, each exactly once."""
+        if not deltas:
+            return
+        heap = []; parents = {}
+        for did in deltas:
+            row = self.get_node(did)
+            if row is not None:
+                parents[did] = row["parent"]
+                heap.append((-_depth(row["path"]), did))
+        heapq.heapify(heap)
+        params = []; recheck = []
+        while heap:
+            neg_depth, did = heapq.heappop(heap)
+            children, files, total, depth, check = deltas[did]
+            params.append((did, children, files, total, depth))
+            if check:
+                recheck.append(did)
+            pid = parents.get(did)
+            if not pid or not (files or total or depth or check):
+                continue
+            if pid not in deltas:
+                prow = self.get_node(pid)
+                if prow is None or -_depth(prow["path"]) <= neg_depth:
+                    continue
+                parents[pid] = prow["parent"]
+                deltas[pid] = [0, 0, 0, 0, False]
+                heapq.heappush(heap, (-_depth(prow["path"]), pid))
+            _add_delta(deltas, pid, 0, files, total, depth + 1 if depth else 0, check)
+        self._conn.executemany(ADD_DIR_STATS, params)
+        # Removals can only lower max_depth, which no delta can express: recompute it from the
+        # children, deepest directory first so each sees its children's final values.
+        for did in recheck:
             self._conn.execute(
-                "INSERT INTO nodes(id,path,kind,parent,seed,theme,last_seen) VALUES(?,?,?,?,?,?,?) "
-                "ON CONFLICT(id) DO UPDATE SET path=excluded.path, kind=excluded.kind, parent=excluded.parent, seed=excluded.seed, theme=excluded.theme, last_seen=?",
-                (id, str(path), kind.value, parent, seed, theme, now, now)
-            )
+                "UPDATE dir_stats SET max_depth = COALESCE((SELECT MAX(CASE WHEN n.kind = ? THEN 1 + COALESCE(s.max_depth, 0) ELSE 1 END) "
+                "FROM nodes n LEFT JOIN dir_stats s ON s.id = n.id WHERE n.parent = ?), 0) WHERE id = ?",
+                (NodeKind.DIRECTORY.value, did, did))
+        for did, *_ in params:
+            self._stats.pop(did)
+
+    def get_dir_stats(self, id: str):
+        """Aggregates for a directory: child_count, file_count and total_bytes (recursive), max_depth."""
+        rec = self._stats.get(id)
+        if rec is _MISS:
+            rec = self._conn.execute("SELECT * FROM dir_stats WHERE id=?", (id,)).fetchone()
+            self._stats.put(id, rec)
+        return rec
+
+    def get_dir_stats_many(self, ids: Iterable[str]) -> dict:
+        ids = list(ids)
+        if not ids:
+            return {}
+        rows = self._conn.execute(f"SELECT * FROM dir_stats WHERE id IN ({','.join('?' * len(ids))})", ids).fetchall()
+        return {r["id"]: r for r in rows}
+
+    def rebuild_dir_stats(self):
+        """Recompute every directory's aggregates from scratch (first open of an older index, or repair)."""
+        rows = self._conn.execute("SELECT id, parent, kind, size, path FROM nodes").fetchall()
+        rows.sort(key=lambda r: _depth(r[4]), reverse=True)
+        stats: dict = {}
+        for id, parent, kind, size, _ in rows:
+            if not parent:
+                continue
+            own = stats.get(id)
+            files, total, depth = _contribution(kind, size, *(own[1:] if own else (None, None, None)))
+            acc = stats.get(parent)
+            if acc is None:
+                acc = stats[parent] = [0, 0, 0, 0]
+            acc[0] += 1; acc[1] += files; acc[2] += total; acc[3] = max(acc[3], depth)
+        with self.batch():
+            self._conn.execute("DELETE FROM dir_stats")
+            self._conn.executemany("INSERT INTO dir_stats(id,child_count,file_count,total_bytes,max_depth) VALUES(?,?,?,?,?)",
+                                   ((id, *acc) for id, acc in stats.items()))
+        self._stats.clear()
 
     def get_node(self, id: str):
-        return self._conn.execute("SELECT * FROM nodes WHERE id=?", (id,)).fetchone()
+        row = self._nodes.get(id)
+        if row is _MISS:
+            row = self._conn.execute("SELECT * FROM nodes WHERE id=?", (id,)).fetchone()
+            self._nodes.put(id, row)
+        return row
+
+    def get_nodes_by_rowid(self, rowids: Iterable[int]):
+        """Rows for the given nodes.rowid values, in the same order (missing ones skipped)."""
+        rowids = list(rowids)
+        if not rowids:
+            return []
+        found = {r["rowid"]: r for r in self._conn.execute(
+            f"SELECT rowid, * FROM nodes WHERE rowid IN ({','.join('?' * len(rowids))})", rowids)}
+        return [found[r] for r in rowids if r in found]
+
+    def iter_paths(self, kind: Optional[str] = None, after_rowid: int = 0):
+        """(rowid, path) for nodes with rowid > after_rowid, shallowest and shortest paths first."""
+        where, params = "WHERE rowid > ?", [after_rowid]
+        if kind is not None:
+            where += " AND kind = ?"; params.append(kind)
+        return self._conn.execute(
+            f"SELECT rowid, path FROM nodes {where} "
+            "ORDER BY length(path) - length(replace(path, '/', '')), length(path)", params)
 
     def get_node_by_path(self, path: Path):
         return self._conn.execute("SELECT * FROM nodes WHERE path=?", (str(path),)).fetchone()
 
     def children_of(self, parent_id: str):
-        return self._conn.execute("SELECT * FROM nodes WHERE parent=? ORDER BY path", (parent_id,)).fetchall()
+        rows = self._children.get(parent_id)
+        if rows is _MISS:
+            rows = self._conn.execute("SELECT * FROM nodes WHERE parent=? ORDER BY path", (parent_id,)).fetchall()
+            self._children.put(parent_id, rows)
+            for r in rows:
+                self._nodes.put(r["id"], r)
+        return rows
+
+    def child_dirs(self, parent_id: str):
+        """Subdirectories of a directory, by path (a directory listing without the files)."""
+        return self._conn.execute("SELECT * FROM nodes WHERE parent=? AND kind=? ORDER BY path",
+                                  (parent_id, NodeKind.DIRECTORY.value)).fetchall()
+
+    def room_children(self, room_id: str):
+        """What a room shows: a wing's members, or a directory's children that are not in a wing."""
+        row = self.get_node(room_id)
+        if row is None:
+            return []
+        if row["kind"] == NodeKind.WING.value:
+            return self._conn.execute("SELECT * FROM nodes WHERE wing=? ORDER BY path", (room_id,)).fetchall()
+        return [r for r in self.children_of(room_id) if r["wing"] is None]
+
+    def room_projection(self, room_id: str):
+        """(id, kind, x, y, sx, sy) for every room child that has a transform, in room_children order;
+        sx/sy are the room's space size (NULL if it has none). One query instead of one per child."""
+        row = self.get_node(room_id)
+        if row is None:
+            return []
+        where = "n.wing=?" if row["kind"] == NodeKind.WING.value else "n.parent=? AND n.wing IS NULL"
+        return self._conn.execute(
+            "SELECT n.id, n.kind, t.x, t.y, s.sx, s.sy FROM nodes n JOIN transforms t ON t.id = n.id "
+            f"LEFT JOIN spaces s ON s.id = ? WHERE {where} ORDER BY n.path", (room_id, room_id)).fetchall()
+
+    def _room_key(self, room_id: str) -> Optional[int]:
+        r = self._conn.execute("SELECT rowid FROM nodes WHERE id=?", (room_id,)).fetchone()
+        return r[0] if r else None
+
+    def items_in_rect(self, room_id: str, bbox: Tuple[float, float, float, float]):
+        """(id, kind, x, y) of the room's items positioned inside bbox = (x0, y0, x1, y1), in path order."""
+        x0, y0, x1, y1 = bbox
+        if not self._rtree:
+            row = self.get_node(room_id)
+            if row is None:
+                return []
+            where = "n.wing=?" if row["kind"] == NodeKind.WING.value else "n.parent=? AND n.wing IS NULL"
+            return self._conn.execute(
+                f"SELECT n.id, n.kind, t.x, t.y FROM nodes n JOIN transforms t ON t.id = n.id WHERE {where} "
+                "AND t.x BETWEEN ? AND ? AND t.y BETWEEN ? AND ? ORDER BY n.path", (room_id, x0, x1, y0, y1)).fetchall()
+        key = self._room_key(room_id)
+        if key is None:
+            return []
+        return self._conn.execute(
+            "SELECT n.id, n.kind, t.x, t.y FROM transforms_rtree r CROSS JOIN nodes n ON n.rowid = r.id "
+            "CROSS JOIN transforms t ON t.id = n.id WHERE r.room_lo = ? AND r.x_hi >= ? AND r.x_lo <= ? "
+            "AND r.y_hi >= ? AND r.y_lo <= ? AND t.x BETWEEN ? AND ? AND t.y BETWEEN ? AND ? ORDER BY n.path",
+            (key, math.floor(x0 * SPATIAL_SCALE), math.ceil(x1 * SPATIAL_SCALE), math.floor(y0 * SPATIAL_SCALE),
+             math.ceil(y1 * SPATIAL_SCALE), x0, x1, y0, y1)).fetchall()
+
+    def room_item_count(self, room_id: str) -> int:
+        """Number of the room's items that have a position."""
+        if not self._rtree:
+            return len(self.room_projection(room_id))
+        key = self._room_key(room_id)
+        if key is None:
+            return 0
+        return self._conn.execute("SELECT count(*) FROM transforms_rtree WHERE room_lo = ?", (key,)).fetchone()[0]
+
+    def nearest(self, room_id: str, x: float, y: float, k: int):
+        """The k room items closest to (x, y), nearest first, as (id, kind, x, y) rows. Searches a
+        square that grows until it holds k items, then widens it once to the k-th distance."""
+        total = self.room_item_count(room_id)
+        k = min(k, total)
+        if k <= 0:
+            return []
+        space = self.get_space(room_id)
+        area = space["sx"] * space["sy"] if space is not None else 1.0
+        r = max(1e-3, math.sqrt(area * k / (math.pi * total)))
+        rows = self.items_in_rect(room_id, (x - r, y - r, x + r, y + r))
+        while len(rows) < k and r < 1e9:
+            r *= 2
+            rows = self.items_in_rect(room_id, (x - r, y - r, x + r, y + r))
+        k = min(k, len(rows))
+        if k == 0:
+            return []
+        rows.sort(key=lambda row: (row["x"] - x) ** 2 + (row["y"] - y) ** 2)
+        kth = math.hypot(rows[k - 1]["x"] - x, rows[k - 1]["y"] - y)
+        if kth > r:
+            # Items in the corners of the square are not necessarily closer than those just outside it.
+            rows = self.items_in_rect(room_id, (x - kth, y - kth, x + kth, y + kth))
+            rows.sort(key=lambda row: (row["x"] - x) ** 2 + (row["y"] - y) ** 2)
+        return rows[:k]
+
+    def set_wings(self, assignments: Iterable[Tuple[str, Optional[str]]]):
+        """Bulk-assign (node id, wing id or None) and drop the transforms of nodes that changed wing."""
+        assignments = list(assignments)
+        if not assignments:
+            return
+        with self.batch():
+            self._conn.executemany("UPDATE nodes SET wing=? WHERE id=?", [(w, nid) for nid, w in assignments])
+            self.delete_transforms([nid for nid, _ in assignments])
+        self._forget_nodes(nid for nid, _ in assignments)
+
+    # Content types (roguefs_core.sniff): ctype_mtime / ctype_ino are the mtime and inode the type was sniffed at.
+    def stale_ctypes(self, id: Optional[str] = None, after: str = "", limit: int = -1):
+        """Files below id (or anywhere) whose content type is unknown or older than their mtime,
+        ordered by path and starting after path `after`."""
+        sql, params = "SELECT id, path, mtime_ns FROM nodes WHERE path > ?", [after]
+        if id is not None:
+            row = self.get_node(id)
+            if row is None:
+                return []
+            lo, hi = _subtree_range(row["path"])
+            sql += " AND path >= ? AND path < ?"; params += [lo, hi]
+        return self._conn.execute(sql + " AND kind = ? AND (ctype IS NULL OR ctype_mtime IS NOT mtime_ns) ORDER BY path LIMIT ?",
+                                  (*params, NodeKind.FILE.value, limit)).fetchall()
+
+    def set_ctypes(self, rows: Iterable[Tuple[str, str, Optional[int], Optional[int]]]):
+        """Store (id, ctype, mtime_ns, inode) results; the sniffed mtime also refreshes nodes.mtime_ns."""
+        rows = list(rows)
+        with self.batch():
+            self._conn.executemany("UPDATE nodes SET ctype = ?, ctype_mtime = ?, ctype_ino = ?, mtime_ns = COALESCE(?, mtime_ns) WHERE id = ?",
+                                   [(ctype, mtime, ino, mtime, nid) for nid, ctype, mtime, ino in rows])
+        self._forget_nodes(nid for nid, *_ in rows)
+
+    def files_of_ctype(self, id: str, ctypes: Iterable[str], recursive: bool = True, limit: int = -1):
+        """Files of the given content types in a directory (and, if recursive, its whole subtree), by path."""
+        row = self.get_node(id)
+        ctypes = tuple(ctypes)
+        if row is None or not ctypes:
+            return []
+        marks = ",".join("?" * len(ctypes))
+        if recursive:
+            return self._conn.execute(f"SELECT * FROM nodes WHERE ctype IN ({marks}) AND path >= ? AND path < ? ORDER BY path LIMIT ?",
+                                      (*ctypes, *_subtree_range(row["path"]), limit)).fetchall()
+        return self._conn.execute(f"SELECT * FROM nodes WHERE ctype IN ({marks}) AND parent = ? ORDER BY path LIMIT ?",
+                                  (*ctypes, id, limit)).fetchall()
 
     def parent_of(self, id: str):
         row = self.get_node(id); 
@@ -63,63 +726,367 @@ class IndexDB:
         pid = row["parent"]; 
         return None if not pid else self.get_node(pid)
 
+    # nodes.path doubles as a materialized ancestry key: a node's ancestors are the prefixes
+    # of its path, and its subtree is one range scan of idx_nodes_path.
+    def ancestors_of(self, id: str, include_self: bool = False):
+        """Ancestor rows root first, in one query. Follows parent links, so it stops where the tree was rooted."""
+        row = self.get_node(id)
+        if row is None:
+            return []
+        prefixes = _ancestor_paths(row["path"])
+        found = {} if not prefixes else {r["id"]: r for r in self._conn.execute(
+            f"SELECT * FROM nodes WHERE path IN ({','.join('?' * len(prefixes))})", prefixes)}
+        chain = [row] if include_self else []
+        pid = row["parent"]
+        while pid and pid in found:
+            chain.append(found.pop(pid))
+            pid = chain[-1]["parent"]
+        chain.reverse()
+        return chain
+
+    def is_under(self, id: str, ancestor_id: str) -> bool:
+        """True if id lies strictly below ancestor_id."""
+        row = self.get_node(id); anc = self.get_node(ancestor_id)
+        if row is None or anc is None or row["id"] == anc["id"]:
+            return False
+        lo, hi = _subtree_range(anc["path"])
+        return lo <= row["path"] < hi
+
+    def descendants_of(self, id: str, kinds: Optional[Iterable[str]] = None, limit: int = -1):
+        """Every node below id (any depth), ordered by path, as one indexed range query."""
+        row = self.get_node(id)
+        if row is None:
+            return []
+        lo, hi = _subtree_range(row["path"])
+        sql, params = "SELECT * FROM nodes WHERE path >= ? AND path < ?", [lo, hi]
+        if kinds is not None:
+            kinds = tuple(kinds)
+            sql += f" AND kind IN ({','.join('?' * len(kinds))})"; params += kinds
+        return self._conn.execute(sql + " ORDER BY path LIMIT ?", (*params, limit)).fetchall()
+
+    def unexplored_dirs(self, id: str, limit: int = -1):
+        """Directories below id whose room was never generated, shallowest first."""
+        row = self.get_node(id)
+        if row is None:
+            return []
+        lo, hi = _subtree_range(row["path"])
+        return self._conn.execute(
+            "SELECT n.* FROM nodes n LEFT JOIN rooms r ON r.id = n.id WHERE n.path >= ? AND n.path < ? AND n.kind = ? AND r.id IS NULL "
+            "ORDER BY length(n.path) - length(replace(n.path, '/', '')), n.path LIMIT ?",
+            (lo, hi, NodeKind.DIRECTORY.value, limit)).fetchall()
+
+    def _split_dir_blocks(self):
+        """Cut runs that grew past 2 * DIR_BLOCK into runs of DIR_BLOCK, and drop emptied ones."""
+        key = _DIR_KEY.format("path")
+        self._conn.execute("DELETE FROM dir_blocks WHERE count = 0 AND key <> ''")
+        for lo, count in self._conn.execute("SELECT key, count FROM dir_blocks WHERE count > ?", (2 * DIR_BLOCK,)).fetchall():
+            hi = self._conn.execute("SELECT min(key) FROM dir_blocks WHERE key > ?", (lo,)).fetchone()[0]
+            keys = [r[0] for r in self._conn.execute(
+                f"SELECT {key} FROM nodes WHERE kind = 'Directory' AND {key} >= ? AND (? IS NULL OR {key} < ?) ORDER BY {key}",
+                (lo, hi, hi))]
+            runs = [(keys[i] if i else lo, len(keys[i:i + DIR_BLOCK])) for i in range(0, len(keys), DIR_BLOCK)]
+            self._conn.executemany("INSERT OR REPLACE INTO dir_blocks(key, count) VALUES(?, ?)", runs)
+
+    def rebuild_dir_order(self):
+        """Recount the runs of the pre-ordered directory listing from scratch."""
+        if not self._dir_order or self.readonly:
+            return
+        with self.batch():
+            self._conn.execute("DELETE FROM dir_blocks")
+            self._conn.execute("INSERT INTO dir_blocks(key, count) SELECT '', count(*) FROM nodes WHERE kind = 'Directory'")
+            self._split_dir_blocks()
+
+    def _dir_position(self, k: str) -> int:
+        """Position the first directory whose key is >= k has (or would get) in the listing."""
+        key = _DIR_KEY.format("path")
+        if not self._dir_order:
+            return self._conn.execute(f"SELECT count(*) FROM nodes WHERE kind = 'Directory' AND {key} < ?", (k,)).fetchone()[0]
+        lo = self._conn.execute("SELECT " + _DIR_BLOCK_OF.format("?"), (k,)).fetchone()[0] or ""
+        return self._conn.execute(
+            f"SELECT (SELECT COALESCE(sum(count), 0) FROM dir_blocks WHERE key < :lo) + "
+            f"(SELECT count(*) FROM nodes WHERE kind = 'Directory' AND {key} >= :lo AND {key} < :k)", {"lo": lo, "k": k}).fetchone()[0]
+
+    def dir_tree_span(self, id: str) -> Tuple[int, int]:
+        """[first, end) positions of a directory and its subdirectories (any depth) in dir_tree_slice order."""
+        row = self.get_node(id)
+        if row is None:
+            return 0, 0
+        path = row["path"]
+        return self._dir_position(path.replace("/", "\x01")), self._dir_position(path.rstrip("/").replace("/", "\x01") + "\x02")
+
+    def dir_tree_slice(self, start: int, limit: int):
+        """`limit` directories from position `start` of the depth-first (pre-order) listing of every indexed
+        directory; rows carry a `depth` column (path segments). One range query at any offset."""
+        key = _DIR_KEY.format("path")
+        lo, skip = "", start
+        if self._dir_order:
+            # The run holding `start`, and how far into it `start` lies (at most about 2 * DIR_BLOCK).
+            run = self._conn.execute(
+                "SELECT key, ? - pos FROM (SELECT key, count, sum(count) OVER (ORDER BY key) - count AS pos FROM dir_blocks) "
+                "WHERE pos <= ? ORDER BY key DESC LIMIT 1", (start, start)).fetchone()
+            if run is not None:
+                lo, skip = run
+        return self._conn.execute(f"SELECT {_DIR_DEPTH.format('path')} AS depth, * FROM nodes WHERE kind = 'Directory' AND {key} >= ? "
+                                  f"ORDER BY {key} LIMIT ? OFFSET ?", (lo, limit, skip)).fetchall()
+
     def set_transform(self, id: str, t: Transform):
-        with self._conn:
+        with self.batch():
             self._conn.execute(
                 "INSERT INTO transforms(id,x,y,z,rx,ry,rz,rw,sx,sy,sz) VALUES(?,?,?,?,?,?,?,?,?,?,?) "
                 "ON CONFLICT(id) DO UPDATE SET x=excluded.x,y=excluded.y,z=excluded.z,rx=excluded.rx,ry=excluded.ry,rz=excluded.rz,rw=excluded.rw,sx=excluded.sx,sy=excluded.sy,sz=excluded.sz",
                 (id, *transform_to_tuple(t))
             )
+        self._transforms.put(id, t)
+        self.layout_generation += 1
+
+    def set_transforms(self, items: Iterable[Tuple[str, Transform]]):
+        items = list(items)
+        with self.batch():
+            self._conn.executemany(
+                "INSERT INTO transforms(id,x,y,z,rx,ry,rz,rw,sx,sy,sz) VALUES(?,?,?,?,?,?,?,?,?,?,?) "
+                "ON CONFLICT(id) DO UPDATE SET x=excluded.x,y=excluded.y,z=excluded.z,rx=excluded.rx,ry=excluded.ry,rz=excluded.rz,rw=excluded.rw,sx=excluded.sx,sy=excluded.sy,sz=excluded.sz",
+                ((id, *transform_to_tuple(t)) for id, t in items)
+            )
+        for id, t in items:
+            self._transforms.put(id, t)
+        self.layout_generation += 1
+
+    def set_positions(self, ids: Sequence[str], xs: Sequence[float], ys: Sequence[float], z: float = 0.0):
+        """Bulk-place nodes (identity rotation and scale); xs/ys may be lists or NumPy arrays."""
+        if hasattr(xs, "tolist"):
+            xs = xs.tolist(); ys = ys.tolist()
+        with self.batch():
+            self._conn.executemany(
+                "INSERT INTO transforms(id,x,y,z,rx,ry,rz,rw,sx,sy,sz) VALUES(?,?,?,?,0,0,0,1,1,1,1) "
+                "ON CONFLICT(id) DO UPDATE SET x=excluded.x,y=excluded.y,z=excluded.z,rx=0,ry=0,rz=0,rw=1,sx=1,sy=1,sz=1",
+                zip(ids, xs, ys, repeat(float(z))))
+        if len(ids) >= self._transforms.maxsize:
+            self._transforms.clear()
+        else:
+            for id in ids:
+                self._transforms.pop(id)
+        self.layout_generation += 1
+
+    def positions_of(self, ids: Iterable[str]) -> dict:
+        """{id: (x, y)} for the given nodes that have a transform."""
+        ids = list(ids); out = {}
+        for i in range(0, len(ids), 900):
+            chunk = ids[i:i + 900]
+            out.update((r[0], (r[1], r[2])) for r in self._conn.execute(
+                f"SELECT id, x, y FROM transforms WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+        return out
+
+    def delete_transforms(self, ids: Iterable[str]):
+        ids = list(ids)
+        with self.batch():
+            self._conn.executemany("DELETE FROM transforms WHERE id=?", [(nid,) for nid in ids])
+        for nid in ids:
+            self._transforms.pop(nid)
+        self.layout_generation += 1
 
     def get_transform(self, id: str):
-        r = self._conn.execute("SELECT * FROM transforms WHERE id=?", (id,)).fetchone()
-        return None if not r else transform_from_tuple((r["x"],r["y"],r["z"],r["rx"],r["ry"],r["rz"],r["rw"],r["sx"],r["sy"],r["sz"]))
+        t = self._transforms.get(id)
+        if t is _MISS:
+            r = self._conn.execute("SELECT * FROM transforms WHERE id=?", (id,)).fetchone()
+            t = None if not r else transform_from_tuple((r["x"],r["y"],r["z"],r["rx"],r["ry"],r["rz"],r["rw"],r["sx"],r["sy"],r["sz"]))
+            self._transforms.put(id, t)
+        return t
 
     def set_space(self, id: str, origin=(0.0,0.0,0.0), size=(40.0,20.0,8.0)):
-        with self._conn:
+        with self.batch():
             self._conn.execute(
                 "INSERT INTO spaces(id,ox,oy,oz,sx,sy,sz) VALUES(?,?,?,?,?,?,?) "
                 "ON CONFLICT(id) DO UPDATE SET ox=excluded.ox,oy=excluded.oy,oz=excluded.oz,sx=excluded.sx,sy=excluded.sy,sz=excluded.sz",
                 (id, origin[0],origin[1],origin[2], size[0],size[1],size[2])
             )
+        self._spaces.pop(id)
+        self.layout_generation += 1
 
     def get_space(self, id: str):
-        return self._conn.execute("SELECT * FROM spaces WHERE id=?", (id,)).fetchone()
+        rec = self._spaces.get(id)
+        if rec is _MISS:
+            rec = self._conn.execute("SELECT * FROM spaces WHERE id=?", (id,)).fetchone()
+            self._spaces.put(id, rec)
+        return rec
 
     def is_pinned(self, id: str) -> bool:
-        r = self._conn.execute("SELECT * FROM pins WHERE id=?", (id,)).fetchone()
-        return bool(r and r["pinned"])
+        pinned = self._pins.get(id)
+        if pinned is _MISS:
+            r = self._conn.execute("SELECT * FROM pins WHERE id=?", (id,)).fetchone()
+            pinned = bool(r and r["pinned"])
+            self._pins.put(id, pinned)
+        return pinned
 
     def toggle_pin(self, id: str) -> bool:
-        with self._conn:
+        with self.batch():
             r = self._conn.execute("SELECT * FROM pins WHERE id=?", (id,)).fetchone()
             if r:
                 self._conn.execute("DELETE FROM pins WHERE id=?", (id,))
-                return False
             else:
                 self._conn.execute("INSERT INTO pins(id,pinned) VALUES(?,1)", (id,))
-                return True
+        self._pins.put(id, not r)
+        return not r
 
     def visit(self, id: str):
         now = time.time()
-        with self._conn:
+        with self.batch():
             r = self._conn.execute("SELECT * FROM visits WHERE id=?", (id,)).fetchone()
             if r:
                 self._conn.execute("UPDATE visits SET count=count+1,last=? WHERE id=?", (now,id))
             else:
                 self._conn.execute("INSERT INTO visits(id,count,last) VALUES(?,?,?)", (id,1,now))
+        self.visits_generation += 1
+
+    def visit_counts(self):
+        """(rowid, count, last) for every visited node."""
+        return self._conn.execute("SELECT n.rowid, v.count, v.last FROM visits v JOIN nodes n ON n.id = v.id").fetchall()
+
+    def get_room_state(self, id: str):
+        return self._conn.execute("SELECT * FROM rooms WHERE id=?", (id,)).fetchone()
+
+    def set_room_state(self, id: str, mtime_ns: int, ctime_ns: int, config_fp: str):
+        with self.batch():
+            self._conn.execute(
+                "INSERT INTO rooms(id,mtime_ns,ctime_ns,config_fp,generated) VALUES(?,?,?,?,?) "
+                "ON CONFLICT(id) DO UPDATE SET mtime_ns=excluded.mtime_ns,ctime_ns=excluded.ctime_ns,config_fp=excluded.config_fp,generated=excluded.generated",
+                (id, mtime_ns, ctime_ns, config_fp, time.time())
+            )
+
+    def get_config(self, path: str):
+        """(data, updated) of the room config stored for the directory at `path`, or None."""
+        return self._conn.execute("SELECT c.data, c.updated FROM configs c JOIN nodes n ON n.id = c.id WHERE n.path = ?",
+                                  (path,)).fetchone()
+
+    def set_config(self, path: str, data: str) -> bool:
+        """Store a room config for an indexed directory; False if the path is not in the index."""
+        with self.batch():
+            cur = self._conn.execute(
+                "INSERT INTO configs(id,data,updated) SELECT id, ?, ? FROM nodes WHERE path = ? AND kind = ? "
+                "ON CONFLICT(id) DO UPDATE SET data=excluded.data, updated=excluded.updated",
+                (data, time.time_ns(), path, NodeKind.DIRECTORY.value))
+        return cur.rowcount > 0
+
+    def iter_configs(self, under: Optional[str] = None):
+        """(path, data) of stored configs, optionally limited to `under` and its subtree."""
+        sql = "SELECT n.path, c.data FROM configs c JOIN nodes n ON n.id = c.id"
+        if under is None:
+            return self._conn.execute(sql + " ORDER BY n.path").fetchall()
+        lo, hi = _subtree_range(under)
+        return self._conn.execute(sql + " WHERE n.path = ? OR (n.path >= ? AND n.path < ?) ORDER BY n.path",
+                                  (under, lo, hi)).fetchall()
+
+    def search_paths(self, needle: str, limit: int = 50, mode: str = "substring"):
+        """Ranked path search. mode: "substring" (anywhere in the path), "basename" or "prefix" (of the full path).
+
+        Basename hits rank first, then shallower and shorter paths.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"unknown search mode {mode!r}")
+        if not needle:
+            return []
+        if mode == "prefix":
+            return self._conn.execute("SELECT * FROM nodes WHERE path >= ? AND path < ? ORDER BY path LIMIT ?",
+                                      (needle, needle + "\U0010ffff", limit)).fetchall()
+        pool = max(limit * 4, 200)
+        if self._fts and len(needle) >= 3:
+            # Trigram phrases match case-insensitive substrings straight from the index.
+            phrase = _fts_phrase(needle)
+            rows = self._conn.execute("SELECT n.* FROM names_fts f JOIN nodes n ON n.rowid=f.rowid WHERE names_fts MATCH ? LIMIT ?",
+                                      (phrase, pool)).fetchall()
+            if mode == "substring" and len(rows) < pool:
+                seen = {r["id"] for r in rows}
+                dirs = self._conn.execute("SELECT n.* FROM dirpaths_fts f JOIN nodes n ON n.rowid=f.rowid WHERE dirpaths_fts MATCH ? LIMIT ?",
+                                          (phrase, pool)).fetchall()
+                rows += [r for r in dirs if r["id"] not in seen]
+                if len(rows) < limit and dirs:
+                    # Entries inside a matching directory match through their parent's path.
+                    seen.update(r["id"] for r in dirs)
+                    ids = [r["id"] for r in dirs]
+                    inside = self._conn.execute(f"SELECT * FROM nodes WHERE parent IN ({','.join('?' * len(ids))}) LIMIT ?", (*ids, pool)).fetchall()
+                    rows += [r for r in inside if r["id"] not in seen]
+                if "/" in needle.rstrip("/") and len(rows) < pool:
+                    seen = {r["id"] for r in rows}
+                    rows += [r for r in self._search_across_separator(needle, pool) if r["id"] not in seen]
+        else:
+            rows = self.search_paths_like(needle, limit=pool)
+            if mode == "basename":
+                rows = [r for r in rows if needle.lower() in os.path.basename(r["path"]).lower()]
+        needle_l = needle.lower()
+        return sorted(rows, key=lambda r: _search_rank(r, needle_l))[:limit]
+
+    def _search_across_separator(self, needle: str, limit: int):
+        """Nodes whose path contains a needle that runs from a directory path into their basename
+        ("src/main.p"): neither trigram table holds that text, so search the indexed side and check
+        the whole needle with LIKE."""
+        head, tail = needle.rsplit("/", 1)
+        like = _like_pattern(needle)
+        if len(tail) >= 3:
+            return self._conn.execute("SELECT n.* FROM names_fts f JOIN nodes n ON n.rowid=f.rowid "
+                                      "WHERE names_fts MATCH ? AND n.path LIKE ? ESCAPE '\\' LIMIT ?",
+                                      (_fts_phrase(tail), like, limit)).fetchall()
+        if len(head.strip("/")) >= 3:
+            return self._conn.execute("SELECT n.* FROM dirpaths_fts f JOIN nodes d ON d.rowid=f.rowid JOIN nodes n ON n.parent=d.id "
+                                      "WHERE dirpaths_fts MATCH ? AND n.path LIKE ? ESCAPE '\\' LIMIT ?",
+                                      (_fts_phrase(head.strip("/")), like, limit)).fetchall()
+        return self.search_paths_like(needle, limit=limit)
 
     def search_paths_like(self, needle: str, limit: int = 50):
-        q = f"%{needle}%"
-        return self._conn.execute("SELECT * FROM nodes WHERE path LIKE ? ORDER BY path LIMIT ?", (q, limit)).fetchall()
+        return self._conn.execute("SELECT * FROM nodes WHERE path LIKE ? ESCAPE '\\' ORDER BY path LIMIT ?",
+                                  (_like_pattern(needle), limit)).fetchall()
 
-    def remove_missing_children(self, parent_id: str, existing_paths: set[str]):
-        cur = self._conn.execute("SELECT id,path FROM nodes WHERE parent=?", (parent_id,))
-        to_remove = [r["id"] for r in cur.fetchall() if r["path"] not in existing_paths]
-        with self._conn:
-            for nid in to_remove:
-                self._conn.execute("DELETE FROM transforms WHERE id=?", (nid,))
-                self._conn.execute("DELETE FROM nodes WHERE id=?", (nid,))
+    def remove_missing_children(self, parent_id: str, existing_paths: set[str], kinds: Optional[Iterable[str]] = None):
+        """Delete children of parent_id (with their subtrees) whose path is not in existing_paths, optionally only of the given kinds."""
+        if kinds is None:
+            cur = self._conn.execute("SELECT id,path FROM nodes WHERE parent=?", (parent_id,))
+        else:
+            kinds = tuple(kinds)
+            cur = self._conn.execute(f"SELECT id,path FROM nodes WHERE parent=? AND kind IN ({','.join('?' * len(kinds))})", (parent_id, *kinds))
+        self.delete_nodes([r["id"] for r in cur.fetchall() if r["path"] not in existing_paths])
+
+    def delete_subtree(self, id: str):
+        """Delete a node and everything below it."""
+        self.delete_nodes([id], subtrees=True)
+
+    def delete_nodes(self, ids: Iterable[str], subtrees: bool = True):
+        """Remove nodes (and, by default, everything below them) with their transforms, spaces, room
+        state and aggregates, updating the surviving ancestors' aggregates."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return
+        with self.batch():
+            if subtrees:
+                for r in self._conn.execute(f"SELECT path FROM nodes WHERE id IN ({','.join('?' * len(ids))}) AND kind = ?",
+                                            (*ids, NodeKind.DIRECTORY.value)).fetchall():
+                    ids.extend(d["id"] for d in self._conn.execute(
+                        "SELECT id FROM nodes WHERE path >= ? AND path < ?", _subtree_range(r["path"])))
+                ids = list(dict.fromkeys(ids))
+            old = self._stat_sources(ids)
+            gone = set(ids)
+            deltas: dict = {}
+            for parent, kind, size, files, total, max_depth, _ in old.values():
+                if parent and parent not in gone:
+                    f, b, _ = _contribution(kind, size, files, total, max_depth)
+                    _add_delta(deltas, parent, -1, -f, -b, 0, True)
+            params = [(nid,) for nid in ids]
+            for table in ("transforms", "spaces", "rooms", "dir_stats", "configs", "nodes"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE id=?", params)
+            self._forget_nodes(ids)
+            self._propagate_stats(deltas)
+        for nid in ids:
+            self._transforms.pop(nid); self._spaces.pop(nid); self._stats.pop(nid)
+
+    def crawl_pending(self, root: str):
+        return self._conn.execute("SELECT path,id FROM crawl WHERE root=? AND done=0", (root,)).fetchall()
+
+    def crawl_reset(self, root: str):
+        with self.batch():
+            self._conn.execute("DELETE FROM crawl WHERE root=?", (root,))
+
+    def crawl_mark(self, root: str, scanned: Iterable[str], discovered: Iterable[Tuple[Path, str, Optional[str]]]):
+        """Record crawl progress: directories whose listing is stored, and (path, id, parent) still to scan."""
+        with self.batch():
+            self._conn.executemany("INSERT OR REPLACE INTO crawl(root,path,id,parent,done) VALUES(?,?,?,?,0)", ((root, str(p), nid, parent) for p, nid, parent in discovered))
+            self._conn.executemany("UPDATE crawl SET done=1 WHERE root=? AND path=?", ((root, path) for path in scanned))
 
     def close(self):
         self._conn.close()
@@ -0,0 +1,132 @@
+"""Parallel bulk crawler that fills IndexDB for a whole tree (`python -m roguefs_core index`)."""
+from __future__ import annotations
+import os, queue, threading, time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+from .index import IndexDB, SCANNED_KINDS
+from .node import NodeKind
+from .scanner import iter_children
+from .hashing import node_id_for_path
+
+DEFAULT_WORKERS = int(os.environ.get("ROGUEFS_INDEX_WORKERS", "16"))
+DEFAULT_BATCH = 5000
+FLUSH_SECS = 1.0
+
+@dataclass
+class IndexStats:
+    dirs: int = 0
+    entries: int = 0
+    errors: int = 0
+    started: float = field(default_factory=time.time)
+
+    @property
+    def elapsed(self) -> float:
+        return time.time() - self.started
+
+    @property
+    def rate(self) -> float:
+        return self.entries / max(1e-6, self.elapsed)
+
+def _scan_worker(jobs: queue.Queue, results: queue.Queue, stop: threading.Event):
+    while not stop.is_set():
+        job = jobs.get()
+        if job is None:
+            return
+        dir_path, dir_id = job
+        try:
+            children = list(iter_children(dir_path))
+        except Exception as e:
+            # Every job must be answered, or index_tree waits for it forever; it re-raises non-OSErrors.
+            results.put((dir_path, dir_id, [], e))
+        else:
+            results.put((dir_path, dir_id, children, None))
+
+def _commit(db: IndexDB, root_key: str, nodes, scanned, discovered):
+    # One transaction per batch: a crash loses at most this batch, whose directories stay pending.
+    with db.batch():
+        db.upsert_nodes(nodes)
+        for dir_id, _, child_paths in scanned:
+            if child_paths is not None:
+                db.remove_missing_children(dir_id, child_paths, kinds=SCANNED_KINDS)
+        db.crawl_mark(root_key, [path for _, path, _ in scanned], discovered)
+
+def index_directory(db: IndexDB, dir_path: Path, dir_id: str) -> int:
+    """Scan one directory (not its subdirectories) into the index; returns its entry count."""
+    children = list(iter_children(dir_path))
+    with db.batch():
+        db.upsert_nodes((rec.id, rec.path, rec.kind, dir_id, None, None, rec.size, rec.mtime_ns) for rec in children)
+        db.remove_missing_children(dir_id, {str(rec.path) for rec in children}, kinds=SCANNED_KINDS)
+    return len(children)
+
+def index_tree(db: IndexDB, root: Path, *, workers: int = DEFAULT_WORKERS, batch_size: int = DEFAULT_BATCH,
+               queue_size: int = 256, restart: bool = False,
+               progress: Optional[Callable[[IndexStats], None]] = None) -> IndexStats:
+    """Crawl `root` with a pool of scandir threads feeding a single batched writer.
+
+    Progress lives in the `crawl` table, so an interrupted run picks up the directories
+    that were still pending unless `restart` is set.
+    """
+    root_key = str(root)
+    stats = IndexStats()
+    pending = [] if restart else [(Path(r["path"]), r["id"]) for r in db.crawl_pending(root_key)]
+    if not pending:
+        db.crawl_reset(root_key)
+        root_id = node_id_for_path(root)
+        existing = db.get_node(root_id)
+        parent = existing["parent"] if existing else None
+        theme = existing["theme"] if existing else None
+        with db.batch():
+            db.upsert_nodes([(root_id, root, NodeKind.DIRECTORY, parent, None, theme, None, None)])
+            db.crawl_mark(root_key, [], [(root, root_id, parent)])
+        pending = [(root, root_id)]
+
+    jobs: queue.Queue = queue.Queue()
+    results: queue.Queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    threads = [threading.Thread(target=_scan_worker, args=(jobs, results, stop), daemon=True, name=f"roguefs-scan-{i}")
+               for i in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    outstanding = 0
+    for job in pending:
+        jobs.put(job); outstanding += 1
+
+    nodes: list = []; scanned: list = []; discovered: list = []
+    last_flush = time.time()
+    try:
+        while outstanding:
+            dir_path, dir_id, children, err = results.get()
+            outstanding -= 1
+            if err is not None and not isinstance(err, OSError):
+                raise err       # a bug, not an unreadable directory; the crawl resumes from the last batch
+            stats.dirs += 1
+            if err is not None:
+                stats.errors += 1
+                scanned.append((dir_id, str(dir_path), None))
+            else:
+                for rec in children:
+                    nodes.append((rec.id, rec.path, rec.kind, dir_id, None, None, rec.size, rec.mtime_ns))
+                    if rec.kind == NodeKind.DIRECTORY:
+                        discovered.append((rec.path, rec.id, dir_id))
+                        jobs.put((rec.path, rec.id)); outstanding += 1
+                stats.entries += len(children)
+                scanned.append((dir_id, str(dir_path), {str(rec.path) for rec in children}))
+            now = time.time()
+            if len(nodes) >= batch_size or len(scanned) >= batch_size or now - last_flush >= FLUSH_SECS or not outstanding:
+                _commit(db, root_key, nodes, scanned, discovered)
+                nodes, scanned, discovered = [], [], []
+                last_flush = now
+                if progress:
+                    progress(stats)
+        db.crawl_reset(root_key)
+    finally:
+        stop.set()
+        for _ in threads:
+            jobs.put(None)
+        while any(t.is_alive() for t in threads):
+            try:
+                results.get(timeout=0.05)
+            except queue.Empty:
+                pass
+    return stats
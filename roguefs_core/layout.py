@@ -1,9 +1,17 @@
 
 from __future__ import annotations
-import math, random
-from typing import List, Tuple, Dict, Any
+import math, os, random
+from typing import List, Tuple, Dict, Any, Sequence
 Vec2 = Tuple[float,float]
 
+# Optional NumPy backend for the per-item arithmetic of big rooms; both paths give identical floats.
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+USE_NUMPY = np is not None and os.environ.get("ROGUEOS_LAYOUT_NUMPY", "1") != "0"
+NUMPY_MIN_ITEMS = 256
+
 def phyllotaxis_positions(n: int, radius: float = 8.0) -> List[Vec2]:
     golden_angle = math.pi * (3 - math.sqrt(5)); pts=[]
     for i in range(n):
@@ -11,7 +19,8 @@ def phyllotaxis_positions(n: int, radius: float = 8.0) -> List[Vec2]:
         pts.append((r*math.cos(th), r*math.sin(th)))
     return pts
 
-def grid_blue_noise(n: int, width: float = 36.0, height: float = 16.0, min_dist: float = 2.8, rng: random.Random|None=None) -> List[Vec2]:
+def rejection_blue_noise(n: int, width: float = 36.0, height: float = 16.0, min_dist: float = 2.8, rng: random.Random|None=None) -> List[Vec2]:
+    """Dart throwing against every accepted point (O(n^2) per pass); kept as a baseline for benchmarks."""
     rng = rng or random.Random(); pts=[]; attempts=0; max_attempts=n*40
     while len(pts)<n and attempts<max_attempts:
         attempts+=1; x=(rng.random()-0.5)*width; y=(rng.random()-0.5)*height
@@ -23,15 +32,154 @@ def grid_blue_noise(n: int, width: float = 36.0, height: float = 16.0, min_dist:
             r,c = divmod(i,cols); x=-width/2 + c*cw + cw/2; y=-height/2 + r*ch + ch/2; pts.append((x,y))
     return pts
 
-def bucketed_grid(n: int, width: float = 36.0, height: float = 16.0) -> List[Vec2]:
+# Bridson sampling (with Roberts' evenly spaced candidates on the r-circle) packs about
+# 1/(POISSON_FILL * r^2) points per unit area.
+POISSON_FILL = 1.3
+POISSON_TRIES = 12
+
+def _bridson(width: float, height: float, r: float, rng: random.Random, k: int = POISSON_TRIES,
+             seed: Sequence[Vec2] = ()) -> List[Vec2]:
+    """Maximal Poisson-disc set over [0,width)x[0,height), using a background grid of r/sqrt(2) cells
+    (at most one point each) so every candidate is checked against a 5x5 neighbourhood only.
+    A seed (points at least r apart) is kept and grown from instead of starting at a random point."""
+    cell = r / math.sqrt(2); gw = int(width / cell) + 1; gh = int(height / cell) + 1
+    grid: List[Vec2|None] = [None] * (gw * gh); r2 = r * r; d = r * (1 + 1e-7)
+    pts: List[Vec2] = []; active: List[Vec2] = []
+    rand = rng.random; cos = math.cos; sin = math.sin; tau = 2 * math.pi
+
+    def add(p: Vec2):
+        grid[int(p[1] / cell) * gw + int(p[0] / cell)] = p
+        active.append(p); pts.append(p)
+
+    for p in seed:
+        add(p)
+    if not pts:
+        add((rand() * width, rand() * height))
+    while active:
+        i = int(rand() * len(active)); sx, sy = active[i]; phase = rand()
+        for j in range(k):
+            a = tau * (phase + j / k); x = sx + d * cos(a); y = sy + d * sin(a)
+            if not (0 <= x < width and 0 <= y < height):
+                continue
+            cx = int(x / cell); cy = int(y / cell); x0 = max(0, cx - 2); x1 = min(gw, cx + 3); ok = True
+            for gy in range(max(0, cy - 2), min(gh, cy + 3)):
+                for q in grid[gy * gw + x0:gy * gw + x1]:
+                    if q is not None and (q[0] - x) ** 2 + (q[1] - y) ** 2 < r2:
+                        ok = False; break
+                if not ok:
+                    break
+            if ok:
+                add((x, y)); break
+        else:
+            active[i] = active[-1]; active.pop()
+    return pts
+
+def poisson_disc(n: int, width: float = 36.0, height: float = 16.0, min_dist: float = 2.8, rng: random.Random|None=None) -> List[Vec2]:
+    """n blue-noise points centred on the origin. The spacing is min_dist, shrunk when n would not fit,
+    so the room fills evenly at any count; surplus samples are dropped at random. A short sample is
+    topped up at a slightly smaller spacing rather than drawn again."""
+    if n <= 0:
+        return []
+    rng = rng or random.Random()
+    r = min(min_dist, math.sqrt(width * height / (n * POISSON_FILL)))
+    pts = _bridson(width, height, r, rng)
+    while len(pts) < n:
+        r *= 0.95
+        pts = _bridson(width, height, r, rng, seed=pts)
+    if len(pts) > n:
+        pts = rng.sample(pts, n)
+    return [(x - width / 2, y - height / 2) for x, y in pts]
+
+def grid_blue_noise(n: int, width: float = 36.0, height: float = 16.0, min_dist: float = 2.8, rng: random.Random|None=None) -> List[Vec2]:
+    return poisson_disc(n, width=width, height=height, min_dist=min_dist, rng=rng)
+
+def bucketed_grid_xy(n: int, width: float = 36.0, height: float = 16.0) -> Tuple[Sequence[float], Sequence[float]]:
+    """Row-major grid as separate x and y sequences (NumPy arrays when the backend is enabled)."""
     cols=max(1,int(math.sqrt(n*(width/height)))); rows=(n+cols-1)//cols
-    cw=width/max(1,cols); ch=height/max(1,rows); pts=[]
+    cw=width/max(1,cols); ch=height/max(1,rows)
+    if USE_NUMPY and n >= NUMPY_MIN_ITEMS:
+        r, c = np.divmod(np.arange(n, dtype=np.int64), cols)
+        return -width/2 + c*cw + cw/2, -height/2 + r*ch + ch/2
+    xs=[]; ys=[]
     for i in range(n):
-        r,c = divmod(i,cols); x=-width/2 + c*cw + cw/2; y=-height/2 + r*ch + ch/2; pts.append((x,y))
-    return pts
+        r,c = divmod(i,cols); xs.append(-width/2 + c*cw + cw/2); ys.append(-height/2 + r*ch + ch/2)
+    return xs, ys
+
+def bucketed_grid(n: int, width: float = 36.0, height: float = 16.0) -> List[Vec2]:
+    xs, ys = bucketed_grid_xy(n, width, height)
+    if hasattr(xs, "tolist"):
+        xs = xs.tolist(); ys = ys.tolist()
+    return list(zip(xs, ys))
+
+class OccupancyGrid:
+    """Spatial hash of placed points in square cells of side `cell`."""
+
+    def __init__(self, cell: float, points: Sequence[Vec2] = ()):
+        self.cell = cell
+        self._cells: Dict[Tuple[int, int], List[Vec2]] = {}
+        for p in points:
+            self.add(p)
+
+    def add(self, p: Vec2):
+        self._cells.setdefault((int(p[0] // self.cell), int(p[1] // self.cell)), []).append(p)
+
+    def nearest(self, p: Vec2, reach: int = 2) -> float:
+        """Distance to the closest point within `reach` cells, or math.inf if there is none."""
+        cx = int(p[0] // self.cell); cy = int(p[1] // self.cell); best = math.inf
+        for gy in range(cy - reach, cy + reach + 1):
+            for gx in range(cx - reach, cx + reach + 1):
+                for q in self._cells.get((gx, gy), ()):
+                    best = min(best, (q[0] - p[0]) ** 2 + (q[1] - p[1]) ** 2)
+        return math.sqrt(best)
+
+def place_new(existing: Sequence[Vec2], count: int, n: int, width: float, height: float,
+              rng: random.Random, radius: float|None = None, tries: int = 16) -> List[Vec2]|None:
+    """Positions for `count` new items in a room that will hold n, leaving `existing` where they are.
+
+    Grid rooms fill free grid slots; others use Mitchell's best candidate (of `tries` random points,
+    keep the one farthest from everything placed) inside the rectangle, or the disc of `radius`.
+    Returns None when the room should be laid out from scratch instead.
+    """
+    if choose_layout(n) == "bucket":
+        xs, ys = bucketed_grid_xy(n, width, height)
+        if hasattr(xs, "tolist"):
+            xs = xs.tolist(); ys = ys.tolist()
+        cols = max(1, int(math.sqrt(n * (width / height)))); rows = (n + cols - 1) // cols
+        half = min(width / cols, height / max(1, rows)) / 2
+        grid = OccupancyGrid(half * 2, existing)
+        free = [p for p in zip(xs, ys) if grid.nearest(p, reach=1) >= half]
+        return free[:count] if len(free) >= count else None
+    spacing = math.sqrt(width * height / max(1, n))
+    grid = OccupancyGrid(spacing, existing); out = []
+    for _ in range(count):
+        best = None; best_d = -1.0
+        for _ in range(tries):
+            if radius is not None:
+                r = radius * math.sqrt(rng.random()); a = rng.random() * 2 * math.pi
+                p = (r * math.cos(a), r * math.sin(a))
+            else:
+                p = ((rng.random() - 0.5) * width, (rng.random() - 0.5) * height)
+            d = grid.nearest(p)
+            if d > best_d:
+                best, best_d = p, d
+                if d == math.inf:
+                    break
+        grid.add(best); out.append(best)
+    return out
+
+BLUE_NOISE_MAX = int(os.environ.get("ROGUEOS_BLUE_NOISE_MAX", "5000"))
 
 def choose_layout(n: int):
-    return "phyllo" if n<=12 else ("blue" if n<=200 else "bucket")
+    return "phyllo" if n<=12 else ("blue" if n<=BLUE_NOISE_MAX else "bucket")
+
+def _chamber_bounds_numpy(n: int, cols: int, rows: int, cell_w: float, cell_h: float, pad_x: float, pad_y: float):
+    r, c = np.divmod(np.arange(n, dtype=np.int64), cols)
+    min_x = np.minimum(np.maximum(c * cell_w + pad_x, 0.0), 1.0)
+    max_x = np.maximum(np.minimum((c + 1) * cell_w - pad_x, 1.0), min_x + 1e-3)
+    min_y = np.minimum(np.maximum(r * cell_h + pad_y, 0.0), 1.0)
+    max_y = np.maximum(np.minimum((r + 1) * cell_h - pad_y, 1.0), min_y + 1e-3)
+    return (r.tolist(), min_x.tolist(), max_x.tolist(), min_y.tolist(), max_y.tolist(),
+            ((min_x + max_x) / 2.0).tolist(), ((min_y + max_y) / 2.0).tolist())
 
 def chamber_cells(n: int) -> List[Dict[str, Any]]:
     if n <= 0:
@@ -42,23 +190,13 @@ def chamber_cells(n: int) -> List[Dict[str, Any]]:
     cell_h = 1.0 / rows
     pad_x = cell_w * 0.12
     pad_y = cell_h * 0.12
+    if USE_NUMPY and n >= NUMPY_MIN_ITEMS:
+        bounds = zip(*_chamber_bounds_numpy(n, cols, rows, cell_w, cell_h, pad_x, pad_y))
+    else:
+        bounds = (_chamber_bounds(idx, cols, cell_w, cell_h, pad_x, pad_y) for idx in range(n))
     cells = []
-    for idx in range(n):
-        r, c = divmod(idx, cols)
-        min_x = c * cell_w + pad_x
-        max_x = (c + 1) * cell_w - pad_x
-        min_y = r * cell_h + pad_y
-        max_y = (r + 1) * cell_h - pad_y
-        min_x = min(max(min_x, 0.0), 1.0)
-        max_x = max(min(max_x, 1.0), min_x + 1e-3)
-        min_y = min(max(min_y, 0.0), 1.0)
-        max_y = max(min(max_y, 1.0), min_y + 1e-3)
-        center_x = (min_x + max_x) / 2.0
-        center_y = (min_y + max_y) / 2.0
-        if r == 0:
-            door_side = "south"
-            door = (center_x, max_y)
-        elif r == rows - 1:
+    for r, min_x, max_x, min_y, max_y, center_x, center_y in bounds:
+        if r == rows - 1 and r != 0:
             door_side = "north"
             door = (center_x, min_y)
         else:
@@ -72,3 +210,15 @@ def chamber_cells(n: int) -> List[Dict[str, Any]]:
             "door": door
         })
     return cells
+
+def _chamber_bounds(idx: int, cols: int, cell_w: float, cell_h: float, pad_x: float, pad_y: float):
+    r, c = divmod(idx, cols)
+    min_x = c * cell_w + pad_x
+    max_x = (c + 1) * cell_w - pad_x
+    min_y = r * cell_h + pad_y
+    max_y = (r + 1) * cell_h - pad_y
+    min_x = min(max(min_x, 0.0), 1.0)
+    max_x = max(min(max_x, 1.0), min_x + 1e-3)
+    min_y = min(max(min_y, 0.0), 1.0)
+    max_y = max(min(max_y, 1.0), min_y + 1e-3)
+    return r, min_x, max_x, min_y, max_y, (min_x + max_x) / 2.0, (min_y + max_y) / 2.0
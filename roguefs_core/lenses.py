@@ -5,3 +5,11 @@ from .node import NodeKind
 
 def by_type(db: IndexDB, dir_id: str, typ: str):
     return [r["id"] for r in db.children_of(dir_id) if r["kind"] == typ]
+
+def largest(db: IndexDB, dir_id: str, limit: int = 10):
+    rows = [r for r in db.children_of(dir_id) if r["kind"] == NodeKind.FILE.value and r["size"] is not None]
+    return [r["id"] for r in sorted(rows, key=lambda r: r["size"], reverse=True)[:limit]]
+
+def recently_modified(db: IndexDB, dir_id: str, limit: int = 10):
+    rows = [r for r in db.children_of(dir_id) if r["mtime_ns"] is not None]
+    return [r["id"] for r in sorted(rows, key=lambda r: r["mtime_ns"], reverse=True)[:limit]]
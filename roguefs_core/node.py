@@ -11,6 +11,7 @@ class NodeKind(str, Enum):
     MOUNT = "Mount"
     CONTAINER = "Container"
     NPC = "NPC"
+    WING = "Wing"            # virtual sub-room holding part of an oversized directory
 
 @dataclass(frozen=True)
 class Transform:
@@ -1,20 +1,39 @@
-
 from __future__ import annotations
 import os
 from pathlib import Path
+from typing import NamedTuple
 from .node import NodeKind
-from .hashing import node_id_for_path
+from .hashing import node_id_for_stat
+
+class ScanEntry(NamedTuple):
+    """One directory entry, built from the scandir lstat so nothing is re-statted."""
+    id: str
+    path: Path
+    kind: NodeKind
+    inode: int
+    dev: int
+    size: int
+    mtime_ns: int
+    mode: int
+
+def _entry_record(entry: os.DirEntry) -> ScanEntry:
+    p = Path(entry.path)
+    if entry.is_dir(follow_symlinks=False):
+        kind = NodeKind.DIRECTORY
+    elif entry.is_symlink():
+        kind = NodeKind.SYMLINK
+    else:
+        kind = NodeKind.FILE
+    try:
+        st = entry.stat(follow_symlinks=False)
+    except FileNotFoundError:
+        return ScanEntry(node_id_for_stat(p, None), p, kind, 0, 0, 0, 0, 0)
+    return ScanEntry(node_id_for_stat(p, st), p, kind, st.st_ino, st.st_dev, st.st_size, st.st_mtime_ns, st.st_mode)
 
 def iter_children(path: Path):
     try:
         with os.scandir(path) as it:
             for entry in it:
-                p = Path(entry.path)
-                if entry.is_dir(follow_symlinks=False):
-                    yield (node_id_for_path(p), p, NodeKind.DIRECTORY)
-                elif entry.is_symlink():
-                    yield (node_id_for_path(p), p, NodeKind.SYMLINK)
-                else:
-                    yield (node_id_for_path(p), p, NodeKind.FILE)
+                yield _entry_record(entry)
     except PermissionError:
         return
@@ -0,0 +1,272 @@
+"""Content types sniffed from the first bytes of a file instead of trusted from its name.
+
+`sniff` matches magic numbers (documents, images, media, archives, executables) and otherwise tells
+text from binary data. `classify` brings nodes.ctype up to date for indexed files; ids follow
+inodes, so a file is only read again once its mtime differs from the one its type was sniffed at.
+Big batches are spread over a process pool (`python -m roguefs_core classify`); rooms hand their
+new or changed files to `sniff_later`, which does the same on a background thread. Pools are
+spawned, not forked, so a multithreaded server does not hand its locks to the workers.
+"""
+from __future__ import annotations
+import logging, multiprocessing, os, queue, threading, time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+from .index import IndexDB
+
+SNIFF_BYTES = 512
+CLASSIFY_WORKERS = int(os.environ.get("ROGUEFS_CLASSIFY_WORKERS", str(min(8, os.cpu_count() or 1))))
+CLASSIFY_BATCH = 2000
+POOL_MIN = 256          # smaller batches are read inline: starting the pool would cost more
+ROOM_SNIFF_MAX = 512    # files sniffed inline per room of an in-memory index (no background thread)
+STORE_RETRIES = 3       # attempts to store a background batch before it is left for the next visit
+EMPTY = "empty"
+UNREADABLE = "unreadable"
+MISSING = "missing"
+DATA = "application/octet-stream"
+
+# (offset, magic, type); first match wins.
+MAGIC: List[Tuple[int, bytes, str]] = [
+    (0, b"%PDF-", "application/pdf"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"OggS", "audio/ogg"),
+    (0, b"fLaC", "audio/flac"),
+    (0, b"ID3", "audio/mpeg"),
+    (4, b"ftyp", "video/mp4"),
+    (0, b"\x1a\x45\xdf\xa3", "video/webm"),
+    (0, b"PK\x03\x04", "application/zip"),
+    (0, b"PK\x05\x06", "application/zip"),
+    (0, b"\x1f\x8b", "application/gzip"),
+    (0, b"BZh", "application/x-bzip2"),
+    (0, b"\xfd7zXZ\x00", "application/x-xz"),
+    (0, b"\x28\xb5\x2f\xfd", "application/zstd"),
+    (0, b"7z\xbc\xaf\x27\x1c", "application/x-7z-compressed"),
+    (0, b"Rar!\x1a\x07", "application/vnd.rar"),
+    (257, b"ustar", "application/x-tar"),
+    (0, b"\x7fELF", "application/x-elf"),
+    (0, b"\xcf\xfa\xed\xfe", "application/x-mach-o"),
+    (0, b"\xce\xfa\xed\xfe", "application/x-mach-o"),
+    (0, b"MZ", "application/x-msdownload"),
+    (0, b"SQLite format 3\x00", "application/x-sqlite3"),
+]
+_RIFF = {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}
+_FAMILIES = {
+    "application/pdf": "document",
+    "application/x-elf": "executable", "application/x-mach-o": "executable", "application/x-msdownload": "executable",
+    "application/zip": "archive", "application/gzip": "archive", "application/x-bzip2": "archive",
+    "application/x-xz": "archive", "application/zstd": "archive", "application/x-7z-compressed": "archive",
+    "application/vnd.rar": "archive", "application/x-tar": "archive",
+}
+# Bytes that do not occur in text (everything below 0x20 except \b \t \n \f \r and ESC).
+_BINARY = bytes(b for b in range(0x20) if b not in b"\b\t\n\x0c\r\x1b") + b"\x7f"
+
+def sniff(head: bytes) -> str:
+    """Content type of a file from its first bytes."""
+    if not head:
+        return EMPTY
+    if head.startswith(b"RIFF"):
+        return _RIFF.get(head[8:12], DATA)
+    for off, magic, ctype in MAGIC:
+        if head.startswith(magic, off):
+            return ctype
+    if head.startswith(b"\xef\xbb\xbf"):
+        return "text/utf-8"
+    if head.startswith((b"\xff\xfe", b"\xfe\xff")):
+        return "text/utf-16"
+    if len(head.translate(None, _BINARY)) < len(head):
+        return DATA
+    if head.isascii():
+        return "text/ascii"
+    try:
+        head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the read still counts as UTF-8.
+        return "text/utf-8" if e.reason == "unexpected end of data" else "text/8bit"
+    return "text/utf-8"
+
+def family(ctype: Optional[str]) -> str:
+    """Coarse kind for display: document, image, audio, video, archive, executable, text or data."""
+    if not ctype:
+        return "data"
+    fam = _FAMILIES.get(ctype)
+    if fam:
+        return fam
+    major = ctype.split("/", 1)[0]
+    return major if major in ("image", "audio", "video", "text") else "data"
+
+def sniff_file(path: str) -> Optional[Tuple[str, int, Optional[int]]]:
+    """(content type, mtime_ns, inode) of the file as read, or None if it is gone."""
+    try:
+        f = open(path, "rb")
+    except OSError:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return UNREADABLE, st.st_mtime_ns, st.st_ino
+    with f:
+        st = os.fstat(f.fileno())    # the file actually read, even if path was replaced meanwhile
+        try:
+            head = f.read(SNIFF_BYTES)
+        except OSError:
+            return UNREADABLE, st.st_mtime_ns, st.st_ino
+    return sniff(head), st.st_mtime_ns, st.st_ino
+
+def sniff_rows(rows, sniffer: Callable = map) -> List[Tuple[str, str, Optional[int], Optional[int]]]:
+    """(id, ctype, mtime_ns, inode) for node rows with id/path/mtime_ns; vanished files are marked MISSING."""
+    out = []
+    for row, found in zip(rows, sniffer(sniff_file, [r["path"] for r in rows])):
+        out.append((row["id"], *(found or (MISSING, row["mtime_ns"], None))))
+    return out
+
+LOG = logging.getLogger("roguefs.sniff")
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _pooled(pool: ProcessPoolExecutor) -> Callable:
+    return lambda fn, paths: pool.map(fn, paths, chunksize=64)
+
+def classify(db: IndexDB, root_id: Optional[str] = None, workers: int = CLASSIFY_WORKERS,
+             progress: Optional[Callable[[int], None]] = None) -> int:
+    """Sniff every indexed file under root_id (or everywhere) whose type is unknown or stale; returns the count."""
+    pool = None; done = 0; after = ""
+    try:
+        while True:
+            rows = db.stale_ctypes(root_id, after=after, limit=CLASSIFY_BATCH)
+            if not rows:
+                return done
+            sniffer: Callable = map
+            if workers > 1 and len(rows) >= POOL_MIN:
+                if pool is None:
+                    pool = _pool(workers)
+                sniffer = _pooled(pool)
+            db.set_ctypes(sniff_rows(rows, sniffer))
+            done += len(rows); after = rows[-1]["path"]
+            if progress:
+                progress(done)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+class _Sniffer:
+    """Sniffs queued files on a daemon thread, over a process pool for big batches, and stores the
+    results through the index's registered writer (see sniff_via) or else a connection of its own;
+    `generation` counts the batches stored so far."""
+
+    def __init__(self, path: str, workers: int = CLASSIFY_WORKERS):
+        self.path = path; self.workers = workers
+        self.generation = 0
+        self._db: Optional[IndexDB] = None
+        self._jobs: queue.Queue = queue.Queue()
+        self._queued: set = set()       # ids not stored yet, so a regenerated room does not queue them twice
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True, name="roguefs-sniff").start()
+
+    def submit(self, rows):
+        with self._lock:
+            rows = [r for r in rows if r["id"] not in self._queued]
+            self._queued.update(r["id"] for r in rows)
+        if rows:
+            self._jobs.put(rows)
+
+    def _take(self) -> list:
+        """Everything queued so far, waiting for the first batch."""
+        rows = list(self._jobs.get())
+        while True:
+            try:
+                rows += self._jobs.get_nowait()
+            except queue.Empty:
+                return rows
+
+    def _store(self, results):
+        store = _stores.get(self.path)
+        if store is not None:
+            store(results)
+            return
+        if self._db is None:
+            self._db = IndexDB(self.path)
+        self._db.set_ctypes(results)
+
+    def _store_retrying(self, results) -> bool:
+        for attempt in range(1, STORE_RETRIES + 1):
+            try:
+                self._store(results)
+                return True
+            except Exception:
+                if attempt == STORE_RETRIES:
+                    LOG.warning("Giving up on %d sniffed file(s) for %s; they stay stale until rescanned",
+                                len(results), self.path, exc_info=True)
+                    return False
+                LOG.info("Storing sniffed types failed (attempt %d), retrying", attempt, exc_info=True)
+                time.sleep(0.2 * attempt)
+        return False
+
+    def _run(self):
+        pool = None
+        try:
+            while True:
+                if pool is not None and self._jobs.empty():
+                    pool.shutdown(); pool = None   # idle: give the worker processes back
+                rows = self._take()
+                for i in range(0, len(rows), CLASSIFY_BATCH):
+                    batch = rows[i:i + CLASSIFY_BATCH]
+                    sniffer: Callable = map
+                    try:
+                        if self.workers > 1 and len(batch) >= POOL_MIN:
+                            if pool is None:
+                                pool = _pool(self.workers)
+                            sniffer = _pooled(pool)
+                        if self._store_retrying(sniff_rows(batch, sniffer)):
+                            self.generation += 1
+                    except Exception:
+                        LOG.warning("Sniffing %d file(s) failed", len(batch), exc_info=True)
+                    finally:
+                        with self._lock:
+                            self._queued.difference_update(r["id"] for r in batch)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            if self._db is not None:
+                self._db.close()
+
+_sniffers: Dict[str, _Sniffer] = {}
+_stores: Dict[str, Callable] = {}
+_sniffers_lock = threading.Lock()
+
+def _sniffer(db: IndexDB) -> _Sniffer:
+    with _sniffers_lock:
+        sn = _sniffers.get(db.path)
+        if sn is None:
+            sn = _sniffers[db.path] = _Sniffer(db.path)
+        return sn
+
+def sniff_via(path: str, store: Optional[Callable[[list], None]]) -> None:
+    """Store background results for the index file at path with store(results), e.g. on the thread that
+    owns its only writable connection, instead of a second writer; None restores the default."""
+    with _sniffers_lock:
+        if store is None:
+            _stores.pop(path, None)
+        else:
+            _stores[path] = store
+
+def sniff_later(db: IndexDB, rows) -> None:
+    """Sniff node rows (id/path/mtime_ns) in the background; nodes.ctype is filled in as batches finish
+    (see sniffed_generation). A private in-memory index cannot be shared with another thread, so its
+    rows are sniffed inline instead, at most ROOM_SNIFF_MAX of them."""
+    rows = list(rows)
+    if not rows:
+        return
+    if db.path == ":memory:":
+        db.set_ctypes(sniff_rows(rows[:ROOM_SNIFF_MAX]))
+    else:
+        _sniffer(db).submit(rows)
+
+def sniffed_generation(db: IndexDB) -> int:
+    """Changes whenever background sniffing stored results for db's file (call db.sync() to see them)."""
+    sn = _sniffers.get(db.path)
+    return sn.generation if sn is not None else 0
@@ -0,0 +1,298 @@
+"""Directory watchers that publish coalesced ROOM_CHANGED events on an EventBus.
+
+InotifyWatcher talks to the kernel through ctypes (Linux only). Directories on network
+filesystems, or that inotify refuses to watch, are handed to a PollingWatcher instead.
+Files edited in place leave their directory's mtime alone, so InotifyWatcher also publishes
+ENTRY_CHANGED for them (see worldgen.refresh_entries). Callbacks run on the watcher thread.
+"""
+from __future__ import annotations
+import abc, ctypes, ctypes.util, os, select, struct, sys, threading, time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+from .events import EventBus
+from .config import config_fingerprint
+from .index import IndexDB
+
+ROOM_CHANGED = "room_changed"
+ENTRY_CHANGED = "entry_changed"     # payload: path of a file whose contents or attributes changed
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_MODIFY | IN_ATTRIB
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT_HEADER = struct.Struct("iIII")
+
+NETWORK_FS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "ceph", "glusterfs", "lustre"}
+MAX_WATCHES = int(os.environ.get("ROGUEOS_MAX_WATCHES", "512"))
+
+class _Watcher(abc.ABC):
+    """Shared bookkeeping: bounded LRU of watched dirs and debounced publishing."""
+
+    def __init__(self, bus: EventBus, debounce: float = 0.15, max_delay: float = 1.0, max_watches: int = MAX_WATCHES):
+        self.bus = bus; self.debounce = debounce; self.max_delay = max_delay; self.max_watches = max_watches
+        self._lock = threading.Lock()
+        self._watched: "OrderedDict[str, None]" = OrderedDict()
+        self._pending: Set[str] = set()
+        self._pending_entries: Set[str] = set()
+        self._first_event = 0.0; self._last_event = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name=type(self).__name__)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def watch(self, path: Path) -> bool:
+        """Start watching a directory (idempotent). Returns False if it cannot be watched."""
+        key = str(path)
+        with self._lock:
+            if key in self._watched:
+                self._watched.move_to_end(key)
+                return True
+            if not self._add(key):
+                return False
+            self._watched[key] = None
+            while len(self._watched) > self.max_watches:
+                old, _ = self._watched.popitem(last=False)
+                self._remove(old)
+        return True
+
+    def unwatch(self, path: Path):
+        key = str(path)
+        with self._lock:
+            if key in self._watched:
+                del self._watched[key]
+                self._remove(key)
+
+    def is_watching(self, path: Path) -> bool:
+        with self._lock:
+            return str(path) in self._watched
+
+    def _mark(self, key: str, entry: Optional[str] = None):
+        now = time.monotonic()
+        if not self._pending:
+            self._first_event = now
+        self._pending.add(key); self._last_event = now
+        if entry is not None:
+            self._pending_entries.add(entry)
+
+    def _flush_due(self) -> Optional[float]:
+        """Seconds until pending events should be published (None if nothing pending)."""
+        if not self._pending:
+            return None
+        now = time.monotonic()
+        return max(0.0, min(self._last_event + self.debounce, self._first_event + self.max_delay) - now)
+
+    def _flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, set()
+            entries, self._pending_entries = self._pending_entries, set()
+        # Entries first, so a room regenerated on ROOM_CHANGED already sees them as changed.
+        for entry in sorted(entries):
+            self.bus.emit(ENTRY_CHANGED, Path(entry))
+        for key in sorted(batch):
+            self.bus.emit(ROOM_CHANGED, Path(key))
+
+    @abc.abstractmethod
+    def _add(self, key: str) -> bool:
+        """Start watching key; False if it cannot be watched."""
+
+    @abc.abstractmethod
+    def _remove(self, key: str):
+        """Stop watching key."""
+
+    @abc.abstractmethod
+    def _run(self):
+        """Watcher thread body; returns once _stop is set."""
+
+    def _wake(self):
+        pass
+
+class PollingWatcher(_Watcher):
+    """Fallback that stats each watched directory (and its config) every `interval` seconds. Configs
+    kept in the index are read from db's file, through a read-only connection per thread."""
+
+    def __init__(self, bus: EventBus, interval: float = 2.0, db: Optional[IndexDB] = None, **kw):
+        super().__init__(bus, **kw)
+        self.interval = interval
+        self._state: Dict[str, Tuple] = {}
+        # A private in-memory index cannot be opened again from here.
+        self._db_path = db.path if db is not None and db.path != ":memory:" else None
+        self._local = threading.local()
+
+    def _db(self) -> Optional[IndexDB]:
+        if self._db_path is None:
+            return None
+        db = getattr(self._local, "db", None)
+        if db is None:
+            try:
+                db = self._local.db = IndexDB(self._db_path, readonly=True)
+            except Exception:
+                self._db_path = None
+                return None
+        db.sync()
+        return db
+
+    def _snapshot(self, key: str) -> Tuple:
+        try:
+            st = os.stat(key)
+        except OSError:
+            return ("missing",)
+        return (st.st_mtime_ns, st.st_ctime_ns, config_fingerprint(Path(key), db=self._db()))
+
+    def _add(self, key: str) -> bool:
+        self._state[key] = self._snapshot(key)
+        return True
+
+    def _remove(self, key: str):
+        self._state.pop(key, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                keys = list(self._state)
+            for key in keys:
+                snap = self._snapshot(key)
+                with self._lock:
+                    if key in self._state and self._state[key] != snap:
+                        self._state[key] = snap
+                        self._mark(key)
+            if self._pending:
+                self._flush()
+
+def _load_libc():
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+def _mount_types() -> Dict[str, str]:
+    mounts: Dict[str, str] = {}
+    try:
+        with open("/proc/self/mounts", "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3:
+                    mounts[parts[1].replace("\\040", " ")] = parts[2]
+    except OSError:
+        pass
+    return mounts
+
+class InotifyWatcher(_Watcher):
+    def __init__(self, bus: EventBus, poll_interval: float = 2.0, db: Optional[IndexDB] = None, **kw):
+        super().__init__(bus, **kw)
+        self._libc = _load_libc()
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._wake_r, self._wake_w = os.pipe()
+        self._wds: Dict[int, str] = {}
+        self._by_path: Dict[str, int] = {}
+        self._mounts = _mount_types()
+        self._fallback = PollingWatcher(bus, interval=poll_interval, db=db, debounce=self.debounce, max_delay=self.max_delay,
+                                        max_watches=self.max_watches)
+
+    def _is_network(self, key: str) -> bool:
+        best = ""
+        for mnt in self._mounts:
+            if (key == mnt or key.startswith(mnt.rstrip("/") + "/")) and len(mnt) > len(best):
+                best = mnt
+        return self._mounts.get(best, "") in NETWORK_FS
+
+    def _add(self, key: str) -> bool:
+        if not self._is_network(key):
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(key), WATCH_MASK)
+            if wd >= 0:
+                self._wds[wd] = key; self._by_path[key] = wd
+                return True
+        # Remote changes never reach inotify, and ENOSPC means we ran out of kernel watches.
+        return self._fallback.start().watch(Path(key))
+
+    def _remove(self, key: str):
+        wd = self._by_path.pop(key, None)
+        if wd is None:
+            self._fallback.unwatch(Path(key))
+            return
+        self._wds.pop(wd, None)
+        self._libc.inotify_rm_watch(self._fd, wd)
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"x")
+        except OSError:
+            pass
+
+    def _read_events(self):
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return
+            off = 0
+            with self._lock:
+                while off + _EVENT_HEADER.size <= len(data):
+                    wd, mask, _, length = _EVENT_HEADER.unpack_from(data, off)
+                    name = data[off + _EVENT_HEADER.size:off + _EVENT_HEADER.size + length].rstrip(b"\0")
+                    off += _EVENT_HEADER.size + length
+                    if mask & IN_Q_OVERFLOW:
+                        for key in self._by_path:
+                            self._mark(key)
+                        continue
+                    key = self._wds.get(wd)
+                    if key is None:
+                        continue
+                    if mask & IN_IGNORED:
+                        self._wds.pop(wd, None); self._by_path.pop(key, None); self._watched.pop(key, None)
+                    # An in-place edit only shows up here: the directory's own mtime stays put.
+                    entry = os.path.join(key, os.fsdecode(name)) if name and mask & (IN_MODIFY | IN_ATTRIB) else None
+                    self._mark(key, entry)
+
+    def _run(self):
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        poller.register(self._wake_r, select.POLLIN)
+        try:
+            while not self._stop.is_set():
+                due = self._flush_due()
+                ready = poller.poll(None if due is None else int(due * 1000) + 1)
+                for fd, _ in ready:
+                    if fd == self._fd:
+                        self._read_events()
+                    else:
+                        os.read(self._wake_r, 4096)
+                if self._flush_due() == 0.0:
+                    self._flush()
+        finally:
+            self._fallback.stop()
+            os.close(self._fd); os.close(self._wake_r); os.close(self._wake_w)
+
+def create_watcher(bus: EventBus, poll_interval: float = 2.0, db: Optional[IndexDB] = None) -> _Watcher:
+    """Best watcher for this platform; set ROGUEOS_WATCHER=poll to force polling. Pass the index
+    when room configs are kept in it (ROGUEOS_CONFIG_STORE=index), so polling notices their changes."""
+    if sys.platform.startswith("linux") and os.environ.get("ROGUEOS_WATCHER", "inotify") != "poll":
+        try:
+            return InotifyWatcher(bus, poll_interval=poll_interval, db=db)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(bus, interval=poll_interval, db=db)
@@ -0,0 +1,98 @@
+"""Split oversized directories into "wings": virtual sub-rooms of at most `max_items` entries.
+
+A room's `.rogueos` may carry {"wings": {"max_items": 2000, "by": "name" | "ext" | "mtime"}};
+max_items 0 turns wings off. Name wings cover ranges of name prefixes ("a–c", "ma–mf") so adding
+or removing a few entries rarely moves anything to another wing. Extension and month groups that
+are still too big are split further by name.
+"""
+from __future__ import annotations
+import os, time
+from itertools import groupby
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+WING_MAX_ITEMS = int(os.environ.get("ROGUEOS_WING_MAX_ITEMS", "2000"))
+WING_MODES = ("name", "ext", "mtime")
+_MAX_PREFIX = 32
+
+def wing_settings(cfg: Dict[str, Any]) -> Tuple[int, str]:
+    """(max_items, by) for a room config, falling back to the defaults."""
+    spec = cfg.get("wings") or {}
+    try:
+        max_items = int(spec.get("max_items", WING_MAX_ITEMS))
+    except (TypeError, ValueError):
+        max_items = WING_MAX_ITEMS
+    by = spec.get("by", "name")
+    return max_items, by if by in WING_MODES else "name"
+
+def _name_key(rec) -> str:
+    return rec.path.name.lower()
+
+def _prefix_label(lo: str, hi: str) -> str:
+    return lo if lo == hi else f"{lo}–{hi}"
+
+def _by_name(recs: Sequence, max_items: int, depth: int = 0) -> List[Tuple[str, List]]:
+    """Runs of consecutive name prefixes (one more character per level) of at most max_items each."""
+    out: List[Tuple[str, List]] = []
+    run: List = []; run_lo = run_hi = ""
+
+    def flush():
+        if run:
+            out.append((_prefix_label(run_lo, run_hi), list(run)))
+            run.clear()
+
+    for prefix, group in groupby(recs, key=lambda r: _name_key(r)[:depth + 1]):
+        group = list(group)
+        if len(group) > max_items:
+            flush()
+            if depth + 1 < _MAX_PREFIX and any(len(_name_key(r)) > depth + 1 for r in group):
+                out.extend(_by_name(group, max_items, depth + 1))
+            else:
+                # Too many names share this prefix: fall back to numbered slices.
+                out.extend((f"{prefix} ({i // max_items + 1})", group[i:i + max_items]) for i in range(0, len(group), max_items))
+            continue
+        if run and len(run) + len(group) > max_items:
+            flush()
+        if not run:
+            run_lo = prefix
+        run.extend(group); run_hi = prefix
+    flush()
+    return out
+
+def _by_bucket(recs: Sequence, max_items: int, bucket: Callable[[Any], str]) -> List[Tuple[str, List]]:
+    """Merge neighbouring buckets up to max_items; split buckets that are too big by name."""
+    out: List[Tuple[str, List]] = []
+    run: List = []; run_lo = run_hi = ""
+    groups = [(key, sorted(group, key=_name_key)) for key, group in groupby(sorted(recs, key=bucket), key=bucket)]
+    for key, group in groups:
+        if len(group) > max_items:
+            if run:
+                out.append((_prefix_label(run_lo, run_hi), run)); run = []
+            out.extend((f"{key} {label}", members) for label, members in _by_name(group, max_items))
+            continue
+        if run and len(run) + len(group) > max_items:
+            out.append((_prefix_label(run_lo, run_hi), run)); run = []
+        if not run:
+            run_lo = key
+        run = run + group; run_hi = key
+    if run:
+        out.append((_prefix_label(run_lo, run_hi), run))
+    return out
+
+def _ext(rec) -> str:
+    ext = os.path.splitext(rec.path.name)[1].lower().lstrip(".")
+    return ext or "(none)"
+
+def _month(rec) -> str:
+    if rec.mtime_ns is None:
+        return "(unknown)"
+    return time.strftime("%Y-%m", time.localtime(rec.mtime_ns / 1e9))
+
+def plan_wings(recs: Sequence, max_items: int, by: str = "name") -> List[Tuple[str, List]]:
+    """[(label, members)] for scanned child records, or [] if the room is small enough."""
+    if max_items <= 0 or len(recs) <= max_items:
+        return []
+    if by == "ext":
+        return _by_bucket(recs, max_items, _ext)
+    if by == "mtime":
+        return _by_bucket(recs, max_items, _month)
+    return _by_name(sorted(recs, key=_name_key), max_items)
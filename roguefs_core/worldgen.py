@@ -1,14 +1,16 @@
 
 from __future__ import annotations
-import random, json
+import os, random
 from pathlib import Path
 from typing import List
 from .index import IndexDB
 from .node import NodeKind, Transform, Space
 from .scanner import iter_children
-from .hashing import seed_for_node_id, node_id_for_path, hash_hex
-from .layout import choose_layout, phyllotaxis_positions, grid_blue_noise, bucketed_grid, chamber_cells
-from .config import load_config, save_config, ensure_child_metadata
+from .hashing import seed_for_node_id, node_id_for_stat, hash_hex
+from .layout import choose_layout, phyllotaxis_positions, grid_blue_noise, bucketed_grid_xy, chamber_cells, place_new
+from .wings import plan_wings, wing_settings
+from .sniff import sniff_later
+from .config import load_config, save_config, ensure_child_metadata, config_fingerprint
 
 def _virtual_node_id(dir_id: str, category: str, name: str) -> str:
     key = f"virtual:{dir_id}:{category}:{name}"
@@ -18,54 +20,129 @@ def _virtual_path(dir_path: Path, category: str, name: str) -> Path:
     safe = name.replace(" ", "_")
     return dir_path / f".rogueos::{category}::{safe}"
 
-def _sync_parent_config(dir_path: Path, parent_id: str | None):
+def _sync_parent_config(db: IndexDB, dir_path: Path, parent_id: str | None):
     if parent_id is None:
         return
     parent_path = dir_path.parent
-    cfg = load_config(parent_path)
-    before = json.dumps(cfg, sort_keys=True)
+    cfg = load_config(parent_path, db=db)
     ensure_child_metadata(cfg, dir_path.name, access="stairs")
-    if json.dumps(cfg, sort_keys=True) != before:
-        save_config(parent_path, cfg)
+    save_config(parent_path, cfg, db=db)
 
 def ensure_space_for_dir(db: IndexDB, dir_id: str):
     if db.get_space(dir_id) is None:
         db.set_space(dir_id, origin=(0.0,0.0,0.0), size=(40.0,20.0,8.0))
 
-def _scatter_layout(db: IndexDB, dir_id: str, ids: List[str], width: float, height: float, salt: str):
+# Incremental placement gives way to a full relayout once this many new items per existing one arrive.
+RELAYOUT_GROWTH = 0.5
+
+def _scatter_layout(db: IndexDB, dir_id: str, ids: List[str], width: float, height: float, salt: str,
+                    incremental: bool = False):
+    """Lay out ids. incremental=True keeps every child that already has a transform where it is and
+    places only the new ones, unless the room grew enough to need a different layout."""
     if not ids:
         return
-    seed = seed_for_node_id(dir_id, salt)
-    rng = random.Random(seed)
     n = len(ids)
     layout_kind = choose_layout(n)
-    if layout_kind == "phyllo":
-        pts = phyllotaxis_positions(n, radius=min(width, height)/2.5)
-    elif layout_kind == "blue":
-        pts = grid_blue_noise(n, width=width*0.9, height=height*0.9, min_dist=2.0, rng=rng)
+    if incremental:
+        placed = db.positions_of(ids)
+        old = [placed[cid] for cid in ids if cid in placed]
+        new = sorted(cid for cid in ids if cid not in placed)
+        if not new:
+            return
+        if old and choose_layout(len(old)) == layout_kind and len(new) <= len(old) * RELAYOUT_GROWTH:
+            rng = random.Random(seed_for_node_id(dir_id, f"{salt}:{new[0]}"))
+            radius = min(width, height)/2.5 if layout_kind == "phyllo" else None
+            pts = place_new(old, len(new), n, width*0.9, height*0.9, rng, radius=radius)
+            if pts is not None:
+                db.set_positions(new, [x for x, _ in pts], [y for _, y in pts])
+                return
+    seed = seed_for_node_id(dir_id, salt)
+    rng = random.Random(seed)
+    if layout_kind == "bucket":
+        xs, ys = bucketed_grid_xy(n, width=width*0.9, height=height*0.9)
     else:
-        pts = bucketed_grid(n, width=width*0.9, height=height*0.9)
-    for idx, cid in enumerate(ids):
-        x, y = pts[idx]
-        db.set_transform(cid, Transform(x=x, y=y, z=0.0))
+        if layout_kind == "phyllo":
+            pts = phyllotaxis_positions(n, radius=min(width, height)/2.5)
+        else:
+            pts = grid_blue_noise(n, width=width*0.9, height=height*0.9, min_dist=2.0, rng=rng)
+        xs = [x for x, _ in pts]; ys = [y for _, y in pts]
+    db.set_positions(ids, xs, ys)
 
-def generate_room(db: IndexDB, dir_path: Path, parent_id: str | None):
-    cfg = load_config(dir_path)
+def _stat_dir(dir_path: Path):
+    try:
+        return os.stat(dir_path, follow_symlinks=False)
+    except FileNotFoundError:
+        return None
+
+def _room_is_current(db: IndexDB, dir_id: str, dir_path: Path, parent_id: str | None, st, config_fp: str) -> bool:
+    if st is None:
+        return False
+    state = db.get_room_state(dir_id)
+    if state is None or state["mtime_ns"] != st.st_mtime_ns or state["ctime_ns"] != st.st_ctime_ns or state["config_fp"] != config_fp:
+        return False
+    row = db.get_node(dir_id)
+    return row is not None and row["parent"] == parent_id and row["path"] == str(dir_path)
+
+def generate_room(db: IndexDB, dir_path: Path, parent_id: str | None, force: bool = False) -> bool:
+    """Scan and lay out a directory; returns False without touching anything if it is unchanged."""
+    st = _stat_dir(dir_path)
+    dir_id = node_id_for_stat(dir_path, st)
+    config_fp = config_fingerprint(dir_path, db)
+    if not force and _room_is_current(db, dir_id, dir_path, parent_id, st, config_fp):
+        return False
+    with db.batch():
+        wrote = _rebuild_room(db, dir_id, dir_path, parent_id)
+        if st is not None:
+            if wrote:
+                # Replacing the config file bumped the directory mtime; don't count our own write as a change.
+                st = _stat_dir(dir_path) or st
+            db.set_room_state(dir_id, st.st_mtime_ns, st.st_ctime_ns, config_fingerprint(dir_path, db))
+    return True
+
+def refresh_entries(db: IndexDB, paths) -> int:
+    """Update the rows of files edited in place (watcher.ENTRY_CHANGED), which generate_room skips
+    because their directory's mtime did not move: size and mtime from a fresh lstat, and the content
+    type re-sniffed in the background. Returns the number of rows updated."""
+    rows = []; stale = []
+    for path in paths:
+        row = db.get_node_by_path(path)
+        if row is None or row["kind"] != NodeKind.FILE.value:
+            continue
+        try:
+            st = os.lstat(path)
+        except OSError:
+            continue            # removed: the directory's own event rescans the room
+        if node_id_for_stat(Path(path), st) != row["id"] or (row["size"], row["mtime_ns"]) == (st.st_size, st.st_mtime_ns):
+            continue
+        rows.append((row["id"], Path(row["path"]), NodeKind.FILE, row["parent"], row["seed"], row["theme"], st.st_size, st.st_mtime_ns))
+        stale.append({"id": row["id"], "path": row["path"], "mtime_ns": st.st_mtime_ns})
+    if rows:
+        db.upsert_nodes(rows)
+        sniff_later(db, stale)
+    return len(rows)
+
+def _rebuild_room(db: IndexDB, dir_id: str, dir_path: Path, parent_id: str | None) -> bool:
+    cfg = load_config(dir_path, db=db)
     if parent_id is None:
         cfg["type"] = "level"
     else:
         cfg.setdefault("type", "room")
     presentation = cfg.get("presentation", "hall")
-    _sync_parent_config(dir_path, parent_id)
-    dir_id = node_id_for_path(dir_path)
+    _sync_parent_config(db, dir_path, parent_id)
     db.upsert_node(dir_id, dir_path, NodeKind.DIRECTORY, parent_id, seed=None, theme="room")
     ensure_space_for_dir(db, dir_id)
 
     children = list(iter_children(dir_path))
-    existing_paths = set(str(p) for _,p,_ in children)
-    for _, path, kind in children:
-        if kind == NodeKind.DIRECTORY:
-            ensure_child_metadata(cfg, path.name, access="stairs")
+    existing_paths = set(str(rec.path) for rec in children)
+    for rec in children:
+        if rec.kind == NodeKind.DIRECTORY:
+            ensure_child_metadata(cfg, rec.path.name, access="stairs")
+
+    # Oversized rooms are split into wings; their members are laid out when a wing is entered.
+    max_items, wing_by = wing_settings(cfg)
+    wings = [(_virtual_node_id(dir_id, "wing", label), _virtual_path(dir_path, "wing", label), label, members)
+             for label, members in plan_wings(children, max_items, wing_by)]
+    existing_paths.update(str(vpath) for _, vpath, _, _ in wings)
 
     containers = cfg.get("containers", {})
     npcs = cfg.get("npcs", {})
@@ -75,19 +152,34 @@ def generate_room(db: IndexDB, dir_path: Path, parent_id: str | None):
         if meta.get("present"):
             existing_paths.add(str(_virtual_path(dir_path, "npc", name)))
 
-    db.remove_missing_children(dir_id, existing_paths)
-
     child_ids: List[str] = []
-    sorted_children = sorted(children, key=lambda t: t[1].name.lower())
+    sorted_children = sorted(children, key=lambda rec: rec.path.name.lower())
     dir_children: List[tuple[str, Path]] = []
     other_children: List[tuple[str, Path, NodeKind]] = []
-    for cid, p, kind in sorted_children:
-        db.upsert_node(cid, p, kind, dir_id, seed=None, theme=None)
-        child_ids.append(cid)
-        if kind == NodeKind.DIRECTORY:
-            dir_children.append((cid, p))
-        else:
-            other_children.append((cid, p, kind))
+    # Upsert before pruning so a renamed entry (same inode) moves with its subtree instead of being dropped.
+    db.upsert_nodes((rec.id, rec.path, rec.kind, dir_id, None, None, rec.size, rec.mtime_ns) for rec in sorted_children)
+    db.remove_missing_children(dir_id, existing_paths)
+    # Files that are new or replaced or changed since their type was read are sniffed in the
+    # background; until then they show as plain files.
+    sniffed = {r["id"]: (r["ctype_mtime"], r["ctype_ino"]) for r in db.children_of(dir_id) if r["ctype"] is not None}
+    sniff_later(db, [{"id": rec.id, "path": str(rec.path), "mtime_ns": rec.mtime_ns} for rec in sorted_children
+                     if rec.kind == NodeKind.FILE and sniffed.get(rec.id) != (rec.mtime_ns, rec.inode)])
+    if wings:
+        db.upsert_nodes((wid, vpath, NodeKind.WING, dir_id, label, wing_by, None, None) for wid, vpath, label, _ in wings)
+        for wid, vpath, _, _ in wings:
+            child_ids.append(wid)
+            other_children.append((wid, vpath, NodeKind.WING))
+    else:
+        for cid, p, kind, *_ in sorted_children:
+            child_ids.append(cid)
+            if kind == NodeKind.DIRECTORY:
+                dir_children.append((cid, p))
+            else:
+                other_children.append((cid, p, kind))
+    wing_of = {rec.id: wid for wid, _, _, members in wings for rec in members}
+    scanned = {rec.id for rec in children}
+    db.set_wings((r["id"], wing_of.get(r["id"])) for r in db.children_of(dir_id)
+                 if r["id"] in scanned and r["wing"] != wing_of.get(r["id"]))
 
     # Virtual containers from config
     for name, meta in containers.items():
@@ -115,27 +207,43 @@ def generate_room(db: IndexDB, dir_path: Path, parent_id: str | None):
 
     if presentation == "chambers" and dir_children:
         cells = chamber_cells(len(dir_children))
+        placed = db.positions_of(cid for cid, _ in dir_children)
+        chamber_transforms = []
         for (cid, path), cell in zip(dir_children, cells):
             cx, cy = cell["center"]
             # Map normalized coordinates to world space [-width/2, width/2]
             wx = (cx - 0.5) * width
             wy = (cy - 0.5) * height
-            db.set_transform(cid, Transform(x=wx, y=wy, z=0.0))
+            if placed.get(cid) != (wx, wy):
+                chamber_transforms.append((cid, Transform(x=wx, y=wy, z=0.0)))
             meta = cfg.setdefault("children", {}).setdefault(path.name, {})
             meta.setdefault("door_side", cell["door_side"])
-        _scatter_layout(db, dir_id, [cid for cid, _, _ in other_children], width, height, "layout_v1_others")
+        db.set_transforms(chamber_transforms)
+        _scatter_layout(db, dir_id, [cid for cid, _, _ in other_children], width, height, "layout_v1_others", incremental=True)
     else:
-        _scatter_layout(db, dir_id, child_ids, width, height, "layout_v1")
+        _scatter_layout(db, dir_id, child_ids, width, height, "layout_v1", incremental=True)
 
-    save_config(dir_path, cfg)
+    return save_config(dir_path, cfg, db=db)
+
+def generate_wing(db: IndexDB, wing_id: str):
+    """Place the members of a wing that have no position yet (all of them on first entry)."""
+    with db.batch():
+        ensure_space_for_dir(db, wing_id)
+        space_rec = db.get_space(wing_id)
+        ids = [r["id"] for r in db.room_children(wing_id)]
+        _scatter_layout(db, wing_id, ids, space_rec["sx"], space_rec["sy"], "layout_v1", incremental=True)
 
 def reflow_room(db: IndexDB, dir_id: str, include_pins: bool = False):
+    with db.batch():
+        _reflow_room(db, dir_id, include_pins)
+
+def _reflow_room(db: IndexDB, dir_id: str, include_pins: bool):
     row = db.get_node(dir_id)
     if not row:
         return
-    cfg = load_config(Path(row["path"]))
+    cfg = load_config(Path(row["path"]), readonly=True, db=db)
     presentation = cfg.get("presentation", "hall")
-    children = db.children_of(dir_id)
+    children = db.room_children(dir_id)
     space_rec = db.get_space(dir_id); width=space_rec["sx"]; height=space_rec["sy"]
     if presentation == "chambers":
         candidates = [c for c in children if c["kind"] != NodeKind.DIRECTORY.value]
@@ -1,16 +1,19 @@
 
 from __future__ import annotations
-import curses, os, time
+import curses, os, threading
 from pathlib import Path
 from roguefs_core.index import IndexDB
-from roguefs_core.worldgen import generate_room, reflow_room
+from roguefs_core.worldgen import generate_room, generate_wing, reflow_room, refresh_entries
 from roguefs_core.hashing import node_id_for_path
 from roguefs_core.node import NodeKind
 from roguefs_core.interaction import open_with_default_app, edit_with_editor, rename_path
 from roguefs_core.config import load_config
+from roguefs_core.events import EventBus
+from roguefs_core.watcher import create_watcher, ROOM_CHANGED, ENTRY_CHANGED
+from roguefs_core.sniff import sniffed_generation
 from .renderer import RoomRender
-from .geom import calc_interior_dims, build_items_map
-from .teleport import teleport_via_map
+from .geom import calc_interior_dims, build_items_map, room_zoom, follow
+from .teleport import teleport_via_map, teleport_via_search
 from .library import browse_magic_library
 from .npc import summon_dead_librarian, LIBRARY_NAME
 
@@ -28,6 +31,21 @@ def _prompt_on_status(stdscr, prompt: str) -> str:
         curses.noecho(); curses.curs_set(0)
     return s
 
+WATCH_TICK_MS = 250
+# Keys whose handlers may draw over the room (prompts, overlays, external programs).
+OVERLAY_KEYS = {ord(c) for c in "oerMm/"}
+
+def _wait_key(stdscr, interrupted) -> int:
+    """Block for a key, waking every WATCH_TICK_MS so filesystem events can interrupt (-1)."""
+    stdscr.timeout(WATCH_TICK_MS)
+    try:
+        while True:
+            ch = stdscr.getch()
+            if ch != -1 or interrupted():
+                return ch
+    finally:
+        stdscr.timeout(-1)
+
 def _interior_dims(stdscr):
     """Return interior dimensions (cols, rows, x0, y0) using curses' (y, x) order."""
     h, w = stdscr.getmaxyx()
@@ -38,16 +56,35 @@ def run_ui(root: Path):
     generate_room(db, root, parent_id=None)
     root_id = node_id_for_path(root)
     current_dir_id = root_id
+    db.visit(root_id)
     cursor_idx = 0
     status = ""
+    # Only used as the polling interval when inotify is unavailable.
     ROOM_REFRESH_INTERVAL = float(os.environ.get("ROGUEOS_ROOM_REFRESH_SECS", "10"))
-    room_refresh_at = {}
+    bus = EventBus()
+    changed_paths: set = set()
+    changed_entries: set = set()    # files edited in place, applied when their room is next refreshed
+    changed_lock = threading.Lock()
+
+    def on_room_changed(path: Path):
+        with changed_lock:
+            changed_paths.add(str(path))
+
+    def on_entry_changed(path: Path):
+        with changed_lock:
+            changed_entries.add(str(path))
+
+    bus.on(ROOM_CHANGED, on_room_changed)
+    bus.on(ENTRY_CHANGED, on_entry_changed)
+    watcher = create_watcher(bus, poll_interval=ROOM_REFRESH_INTERVAL, db=db).start()
     items_cache: list = []
     occ_cache: dict = {}
     items_dirty = True
     items_cols = None
     items_rows = None
     current_items_dir = None
+    view_zoom = 1           # the room's grid is view_zoom screens wide and tall
+    view = (0, 0)           # grid cell shown at the top-left of the screen
 
     # Player tile (interior coords)
     stdscr = curses.initscr(); curses.noecho(); curses.cbreak(); stdscr.keypad(True); curses.curs_set(0)
@@ -55,35 +92,71 @@ def run_ui(root: Path):
         cols, rows, x0, y0 = _interior_dims(stdscr)
         player_gx, player_gy = ( (cols-2)//2, (rows-2)//2 )  # center spawn
 
-        room_refresh_at[current_dir_id] = time.time()
-
         def mark_items_dirty():
             nonlocal items_dirty
             items_dirty = True
 
-        def ensure_room(dir_id: str, force: bool = False):
+        wings_laid_out: set = set()
+
+        def ensure_room(dir_id: str, force: bool = False) -> bool:
             nonlocal items_dirty
             row = db.get_node(dir_id)
             if not row:
-                return
-            now = time.time()
-            last = room_refresh_at.get(dir_id, 0.0)
-            if force or (now - last) > ROOM_REFRESH_INTERVAL:
-                generate_room(db, Path(row["path"]), parent_id=row["parent"])
-                room_refresh_at[dir_id] = now
+                return False
+            if row["kind"] == NodeKind.WING.value:
+                # Wings are laid out lazily: on first entry, and again when their directory changes.
+                if (ensure_room(row["parent"], force=force) or dir_id not in wings_laid_out) and db.get_node(dir_id):
+                    generate_wing(db, dir_id)
+                    wings_laid_out.add(dir_id)
+                    items_dirty = True
+                return False
+            path = row["path"]
+            watcher.watch(Path(path))
+            with changed_lock:
+                changed = path in changed_paths
+                changed_paths.discard(path)
+                entries = [p for p in changed_entries if os.path.dirname(p) == path]
+                changed_entries.difference_update(entries)
+            if entries and refresh_entries(db, entries):
                 items_dirty = True
+            if force or changed:
+                if generate_room(db, Path(path), parent_id=row["parent"]):
+                    items_dirty = True
+                    return True
+            return False
+
+        sniffed = sniffed_generation(db)
+
+        def current_room_changed() -> bool:
+            if sniffed_generation(db) != sniffed:
+                return True             # content types arrived from the background sniffer
+            row = db.get_node(current_dir_id)
+            if row is not None and row["kind"] == NodeKind.WING.value:
+                row = db.get_node(row["parent"])
+            with changed_lock:
+                return row is not None and row["path"] in changed_paths
 
         def get_items():
-            nonlocal items_cache, occ_cache, items_dirty, items_cols, items_rows, current_items_dir
+            nonlocal items_cache, occ_cache, items_dirty, items_cols, items_rows, current_items_dir, view_zoom, view, player_gx, player_gy
             ensure_room(current_dir_id)
             cols, rows, _, _ = _interior_dims(stdscr)
             if items_dirty or items_cols != cols or items_rows != rows or current_items_dir != current_dir_id:
-                items_cache, occ_cache = build_items_map(db, current_dir_id, cols, rows)
+                view_zoom = room_zoom(db, current_dir_id, cols, rows)
+                player_gx = min(player_gx, (cols-2)*view_zoom - 1)
+                player_gy = min(player_gy, (rows-2)*view_zoom - 1)
                 items_cols, items_rows = cols, rows
                 current_items_dir = current_dir_id
                 items_dirty = False
+            # Crowded rooms only load the screen around the player (memoized per view).
+            view = follow(view, (player_gx, player_gy), view_zoom, cols, rows)
+            items_cache, occ_cache = build_items_map(db, current_dir_id, cols, rows, view_zoom, view)
             return items_cache, occ_cache
 
+        def room_center():
+            cols, rows, _, _ = _interior_dims(stdscr)
+            zoom = room_zoom(db, current_dir_id, cols, rows)
+            return ((cols-2)*zoom)//2, ((rows-2)*zoom)//2
+
         def recompute_selection():
             nonlocal cursor_idx
             # Snap selection to nearest item by grid distance
@@ -102,32 +175,48 @@ def run_ui(root: Path):
         def step(dx: int, dy: int):
             nonlocal player_gx, player_gy
             cols, rows, _, _ = _interior_dims(stdscr)
-            player_gx = max(0, min(cols-3, player_gx + dx))
-            player_gy = max(0, min(rows-3, player_gy + dy))
+            player_gx = max(0, min((cols-2)*view_zoom - 1, player_gx + dx))
+            player_gy = max(0, min((rows-2)*view_zoom - 1, player_gy + dy))
             recompute_selection()
 
+        player_gx, player_gy = room_center()
         recompute_selection()
+        renderer = None
 
         while True:
             room_row = db.get_node(current_dir_id)
             if room_row is None:
                 status = "Room data missing."
                 break
-            room_path = Path(room_row["path"])
+            # A wing is a virtual room; anything that touches disk uses its real directory.
+            dir_row = db.get_node(room_row["parent"]) if room_row["kind"] == NodeKind.WING.value else room_row
+            if dir_row is None:
+                status = "Room data missing."
+                break
+            room_path = Path(dir_row["path"])
             items, occ = get_items()
-            renderer = RoomRender(db, current_dir_id)
-            renderer.draw(stdscr, cursor_idx, (player_gx, player_gy), status=status, items=items, occ=occ)
+            if renderer is None or renderer.dir_id != current_dir_id:
+                renderer = RoomRender(db, current_dir_id)
+            renderer.draw(stdscr, cursor_idx, (player_gx, player_gy), status=status, items=items, occ=occ, zoom=view_zoom, view=view)
             status = ""
 
             # Input
-            ch = stdscr.getch()
-            if ch in (ord('q'), 27): break
+            ch = _wait_key(stdscr, current_room_changed)
+            if ch in OVERLAY_KEYS:
+                renderer.invalidate()
+            if sniffed_generation(db) != sniffed:
+                sniffed = sniffed_generation(db)
+                db.sync()
+            if ch == -1:  # room changed on disk, or file types came in; redraw
+                renderer.recheck_config()
+                continue
+            elif ch in (ord('q'), 27): break
             elif ch in (ord('w'), curses.KEY_UP, ord('k')): step(0,-1)
             elif ch in (ord('s'), curses.KEY_DOWN, ord('j')): step(0,+1)
             elif ch in (ord('a'), curses.KEY_LEFT, ord('h')): step(-1,0)
             elif ch in (ord('d'), curses.KEY_RIGHT, ord('l')): step(+1,0)
             elif ch in (ord('D'),):
-                message, _ = summon_dead_librarian(room_path)
+                message, _ = summon_dead_librarian(room_path, db=db)
                 ensure_room(current_dir_id, force=True)
                 mark_items_dirty()
                 recompute_selection()
@@ -147,10 +236,10 @@ def run_ui(root: Path):
                     row = db.get_node(target_id)
                     if row["kind"] == NodeKind.FILE.value:
                         open_with_default_app(Path(row["path"]))
-                    elif row["kind"] == NodeKind.DIRECTORY.value:
+                    elif row["kind"] in (NodeKind.DIRECTORY.value, NodeKind.WING.value):
                         status = "Use '>' to descend into directory."
                     elif row["kind"] == NodeKind.CONTAINER.value:
-                        cfg = load_config(room_path)
+                        cfg = load_config(room_path, readonly=True, db=db)
                         container_name = row["seed"] or LIBRARY_NAME
                         container_meta = cfg.get("containers", {}).get(container_name, {})
                         browse_magic_library(stdscr, room_path, container_meta.get("items", []))
@@ -178,13 +267,13 @@ def run_ui(root: Path):
                 target_id = occ.get((player_gx, player_gy))
                 if target_id:
                     row = db.get_node(target_id)
-                    if row["kind"] == NodeKind.DIRECTORY.value:
+                    if row["kind"] in (NodeKind.DIRECTORY.value, NodeKind.WING.value):
                         current_dir_id = row["id"]
                         current_items_dir = None
                         ensure_room(current_dir_id, force=True)
+                        db.visit(current_dir_id)
                         # spawn near center in new room
-                        cols, rows, _, _ = _interior_dims(stdscr)
-                        player_gx, player_gy = ( (cols-2)//2, (rows-2)//2 )
+                        player_gx, player_gy = room_center()
                         cursor_idx = 0
                         recompute_selection()
                     else:
@@ -201,6 +290,7 @@ def run_ui(root: Path):
                         current_dir_id = parent_row["id"]
                         current_items_dir = None
                         ensure_room(current_dir_id, force=True)
+                        db.visit(current_dir_id)
                         cols, rows, _, _ = _interior_dims(stdscr)
                         # place player near the top-left stairs again
                         player_gx, player_gy = (1,1)
@@ -223,7 +313,7 @@ def run_ui(root: Path):
                     try:
                         newp = rename_path(Path(row["path"]), new_name)
                         new_id = node_id_for_path(newp)
-                        db.upsert_node(new_id, newp, NodeKind(row["kind"]), current_dir_id, seed=None, theme=None)
+                        db.upsert_node(new_id, newp, NodeKind(row["kind"]), dir_row["id"], seed=None, theme=None)
                         ensure_room(current_dir_id, force=True)
                         mark_items_dirty()
                         recompute_selection()
@@ -232,15 +322,18 @@ def run_ui(root: Path):
                 else:
                     status = "No item underfoot to rename."
             elif ch in (ord('M'), ord('m'), ord('/')):
-                target_dir = teleport_via_map(stdscr, db, root_id, current_dir_id)
+                if ch == ord('/'):
+                    target_dir = teleport_via_search(stdscr, db)
+                else:
+                    target_dir = teleport_via_map(stdscr, db, root_id, current_dir_id)
                 if target_dir:
                     row = db.get_node(target_dir)
                     if row and row["kind"] == NodeKind.DIRECTORY.value:
                         current_dir_id = row["id"]
                         current_items_dir = None
                         ensure_room(current_dir_id, force=True)
-                        cols, rows, _, _ = _interior_dims(stdscr)
-                        player_gx, player_gy = ( (cols-2)//2, (rows-2)//2 )
+                        db.visit(current_dir_id)
+                        player_gx, player_gy = room_center()
                         cursor_idx = 0
                         recompute_selection()
                         status = "Teleported to directory."
@@ -251,4 +344,5 @@ def run_ui(root: Path):
             else:
                 status = ""
     finally:
+        watcher.stop()
         curses.nocbreak(); stdscr.keypad(False); curses.echo(); curses.endwin()
@@ -1,46 +1,102 @@
 
 from __future__ import annotations
+import math, os, weakref
+from collections import OrderedDict
 from typing import Dict, Tuple, List
 from roguefs_core.index import IndexDB
 from roguefs_core.node import NodeKind
 
+# Rooms holding more than this many items per interior cell are drawn on a grid several screens
+# wide, with a camera that scrolls to follow the player (0 disables the camera).
+CAMERA_FILL = float(os.environ.get("ROGUEOS_CAMERA_FILL", "0.5"))
+
 def calc_interior_dims(term_w: int, term_h: int):
     cols = max(8, term_w - 2)
     rows = max(6, term_h - 4)
     x0 = 1; y0 = 1
     return cols, rows, x0, y0
 
+def _grid_cell(x: float, y: float, W: float, H: float, w: int, h: int) -> Tuple[int,int]:
+    gx = int((x + W/2) / W * w)
+    gy = int((y + H/2) / H * h)
+    return max(0, min(w-1, gx)), max(0, min(h-1, gy))
+
 def world_to_grid(db: IndexDB, dir_id: str, x: float, y: float, cols: int, rows: int) -> Tuple[int,int]:
     space = db.get_space(dir_id)
-    W = max(1e-6, space["sx"]); H = max(1e-6, space["sy"])
-    gx = int((x + W/2) / W * (cols-2))  # interior
-    gy = int((y + H/2) / H * (rows-2))
-    gx = max(0, min(cols-3, gx))
-    gy = max(0, min(rows-3, gy))
-    return gx, gy
+    return _grid_cell(x, y, max(1e-6, space["sx"]), max(1e-6, space["sy"]), cols-2, rows-2)  # interior
 
-def place_no_collision(occ: Dict[Tuple[int,int], str], gx: int, gy: int, cols: int, rows: int) -> Tuple[int,int]:
-    if (gx, gy) not in occ:
+def nearest_free(taken: bytearray, w: int, h: int, gx: int, gy: int) -> Tuple[int,int]:
+    """Closest free cell to (gx, gy) in a w*h occupancy bitmap, walking square rings outwards.
+    Each ring only visits its own border, so no cell is checked twice."""
+    if not taken[gy*w + gx]:
         return gx, gy
-    radius = 1
-    while radius < max(cols, rows):
-        for dx in range(-radius, radius+1):
-            for dy in range(-radius, radius+1):
-                x = gx + dx; y = gy + dy
-                if 0 <= x < (cols-2) and 0 <= y < (rows-2) and (x, y) not in occ:
+    for r in range(1, max(w, h) + 1):
+        x_lo = max(0, gx - r); x_hi = min(w - 1, gx + r)
+        y_lo = max(0, gy - r); y_hi = min(h - 1, gy + r)
+        for x in range(x_lo, x_hi + 1):
+            if x == gx - r or x == gx + r:
+                ys = range(y_lo, y_hi + 1)
+            else:
+                ys = [y for y in (gy - r, gy + r) if 0 <= y < h]
+            for y in ys:
+                if not taken[y*w + x]:
                     return x, y
-        radius += 1
     return gx, gy
 
-def build_items_map(db: IndexDB, dir_id: str, cols: int, rows: int):
-    children = db.children_of(dir_id)
+def room_zoom(db: IndexDB, dir_id: str, cols: int, rows: int) -> int:
+    """How many screens wide and tall the room's grid is: 1 unless it is too crowded for one screen."""
+    if CAMERA_FILL <= 0:
+        return 1
+    return max(1, math.ceil(math.sqrt(db.room_item_count(dir_id) / ((cols-2) * (rows-2) * CAMERA_FILL))))
+
+def follow(origin: Tuple[int,int], player: Tuple[int,int], zoom: int, cols: int, rows: int) -> Tuple[int,int]:
+    """Camera origin (top-left grid cell on screen) after the player moved: unchanged while the player
+    is in view, otherwise re-centred on them, so the view scrolls by whole half-screens."""
+    w, h = cols-2, rows-2
+    ox = max(0, min(w*zoom - w, origin[0])); oy = max(0, min(h*zoom - h, origin[1]))
+    if not ox <= player[0] < ox + w:
+        ox = max(0, min(w*zoom - w, player[0] - w//2))
+    if not oy <= player[1] < oy + h:
+        oy = max(0, min(h*zoom - h, player[1] - h//2))
+    return ox, oy
+
+_MEMO_SIZE = 8
+_memo: "weakref.WeakKeyDictionary[IndexDB, OrderedDict]" = weakref.WeakKeyDictionary()
+
+def build_items_map(db: IndexDB, dir_id: str, cols: int, rows: int, zoom: int = 1, origin: Tuple[int,int] = (0, 0)):
+    """Project a room's children onto the interior grid: ([(id, kind, gx, gy)], {(gx, gy): id}).
+    With zoom > 1 the grid is zoom screens wide and tall, and only the screen whose top-left cell is
+    `origin` is loaded (through the spatial index). Results are memoized per room, size and view until
+    the connection writes or sees nodes or layout change, so callers must not mutate them."""
+    key = (dir_id, db.generation, db.layout_generation, cols, rows, zoom, origin)
+    memo = _memo.setdefault(db, OrderedDict())
+    hit = memo.get(key)
+    if hit is not None:
+        memo.move_to_end(key)
+        return hit
+    w, h = cols-2, rows-2
+    if zoom > 1:
+        space = db.get_space(dir_id)
+        W = max(1e-6, space["sx"]) if space else 1e-6; H = max(1e-6, space["sy"]) if space else 1e-6
+        ox, oy = origin
+        bbox = (ox / (w*zoom) * W - W/2, oy / (h*zoom) * H - H/2, (ox + w) / (w*zoom) * W - W/2, (oy + h) / (h*zoom) * H - H/2)
+        source = ((cid, kind, x, y, W, H) for cid, kind, x, y in db.items_in_rect(dir_id, bbox))
+    else:
+        ox = oy = 0
+        source = db.room_projection(dir_id)
+    taken = bytearray(w * h); free = w * h
     occ: Dict[Tuple[int,int], str] = {}
     items: List[Tuple[str, str, int, int]] = []  # (id, kind, gx, gy) in interior coords
-    for c in children:
-        t = db.get_transform(c["id"])
-        if not t: continue
-        gx, gy = world_to_grid(db, dir_id, t.x, t.y, cols, rows)
-        gx, gy = place_no_collision(occ, gx, gy, cols, rows)
-        occ[(gx, gy)] = c["id"]
-        items.append((c["id"], c["kind"], gx, gy))
+    for cid, kind, x, y, sx, sy in source:
+        gx, gy = _grid_cell(x, y, max(1e-6, sx or 0.0), max(1e-6, sy or 0.0), w*zoom, h*zoom)
+        gx = max(0, min(w-1, gx - ox)); gy = max(0, min(h-1, gy - oy))
+        if free:
+            gx, gy = nearest_free(taken, w, h, gx, gy)
+            if not taken[gy*w + gx]:
+                taken[gy*w + gx] = 1; free -= 1
+        occ[(gx + ox, gy + oy)] = cid
+        items.append((cid, kind, gx + ox, gy + oy))
+    memo[key] = (items, occ)
+    if len(memo) > _MEMO_SIZE:
+        memo.popitem(last=False)
     return items, occ
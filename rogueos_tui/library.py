@@ -1,33 +1,17 @@
 from __future__ import annotations
 import curses
 from pathlib import Path
-from typing import Dict, List
-import textwrap
-import string
+from typing import Dict, List, Tuple
+from .preview import page, last_page_start, prefetch, prefetch_line_count
 
-def _preview_ascii(path: Path, max_lines: int = 12, width: int = 56) -> List[str]:
-    try:
-        with path.open("rb") as f:
-            data = f.read(8192)
-    except Exception:
-        return ["(Unable to read tome.)"]
-    text = "".join(chr(b) for b in data if chr(b) in string.printable)
-    text = text.replace("\r", "")
-    paragraphs = text.split("\n")
-    lines: List[str] = []
-    for para in paragraphs:
-        if not para.strip():
-            lines.append("")
-            continue
-        for chunk in textwrap.wrap(para.strip(), width=width):
-            lines.append(chunk)
-            if len(lines) >= max_lines:
-                break
-        if len(lines) >= max_lines:
-            break
-    if not lines:
-        lines = ["(No decipherable runes.)"]
-    return lines[:max_lines]
+PREFETCH_NEIGHBOURS = 2
+
+def _tome_path(dir_path: Path, entry: Dict[str, str]) -> Path:
+    return dir_path / entry.get("relpath", entry.get("name", ""))
+
+def _page_dims(h: int, w: int) -> Tuple[int, int]:
+    """(rows, width) of the text area in _read_tome."""
+    return max(1, h - 5), max(8, w - 8)
 
 def browse_magic_library(stdscr, dir_path: Path, entries: List[Dict[str, str]]):
     if not entries:
@@ -60,6 +44,9 @@ def browse_magic_library(stdscr, dir_path: Path, entries: List[Dict[str, str]]):
         except curses.error:
             pass
         stdscr.refresh()
+        rows, width = _page_dims(h, w)
+        near = range(index - PREFETCH_NEIGHBOURS, index + PREFETCH_NEIGHBOURS + 1)
+        prefetch((_tome_path(dir_path, entries[i % len(entries)]) for i in sorted(near, key=lambda i: abs(i - index))), rows, width)
         ch = stdscr.getch()
         if ch in (curses.KEY_UP, ord('k'), ord('w')):
             index = (index - 1) % len(entries)
@@ -71,32 +58,55 @@ def browse_magic_library(stdscr, dir_path: Path, entries: List[Dict[str, str]]):
             break
 
 def _read_tome(stdscr, dir_path: Path, entry: Dict[str, str]):
-    stdscr.erase()
-    h, w = stdscr.getmaxyx()
-    stdscr.box()
     rel = entry.get("relpath", entry.get("name", ""))
-    path = dir_path / rel
-    header = f" Tome: {entry.get('name', '?')} "
-    try:
-        stdscr.addnstr(0, max(2, (w-len(header))//2), header, w-4, curses.A_BOLD)
-    except curses.error:
-        pass
-    info_line = f"Location: {rel}"
-    try:
-        stdscr.addnstr(1, 2, info_line, w-4)
-    except curses.error:
-        pass
-    preview = _preview_ascii(path)
-    for i, line in enumerate(preview):
-        if 3 + i >= h - 2:
-            break
+    path = _tome_path(dir_path, entry)
+    prefetch_line_count(path)
+    first = 0; history: List[int] = []
+    while True:
+        stdscr.erase()
+        h, w = stdscr.getmaxyx()
+        rows, width = _page_dims(h, w)
+        stdscr.box()
+        header = f" Tome: {entry.get('name', '?')} "
         try:
-            stdscr.addnstr(3 + i, 4, line, w-8)
+            stdscr.addnstr(0, max(2, (w-len(header))//2), header, w-4, curses.A_BOLD)
         except curses.error:
             pass
-    try:
-        stdscr.addnstr(h-2, 2, "Press any key to return to stacks.", w-4, curses.A_DIM)
-    except curses.error:
-        pass
-    stdscr.refresh()
-    stdscr.getch()
+        info_line = f"Location: {rel}"
+        try:
+            stdscr.addnstr(1, 2, info_line, w-4)
+        except curses.error:
+            pass
+        view = page(path, first, rows, width)
+        if view is None:
+            text = ["(Unable to read tome.)"]
+        elif not any(line.strip() for line in view.lines) and first == 0 and view.next is None:
+            text = ["(No decipherable runes.)"]
+        else:
+            text = view.lines
+        for i, line in enumerate(text[:rows]):
+            try:
+                stdscr.addnstr(3 + i, 4, line, w-8)
+            except curses.error:
+                pass
+        where = f"line {first + 1}  {view.offset * 100 // max(1, view.size)}%  " if view else ""
+        try:
+            stdscr.addnstr(h-2, 2, f"{where}↑/↓ scroll  PgUp/PgDn page  Home/End  q back", w-4, curses.A_DIM)
+        except curses.error:
+            pass
+        stdscr.refresh()
+        ch = stdscr.getch()
+        if view is None or ch in (27, ord('q'), 10, 13, curses.KEY_ENTER):
+            return
+        if ch in (curses.KEY_DOWN, ord('j'), ord('s')) and view.next is not None:
+            first += 1
+        elif ch in (curses.KEY_UP, ord('k'), ord('w')):
+            first = max(0, first - 1)
+        elif ch in (curses.KEY_NPAGE, ord(' ')) and view.next is not None:
+            history.append(first); first = view.next
+        elif ch in (curses.KEY_PPAGE, ord('b')):
+            first = history.pop() if history else max(0, first - rows)
+        elif ch in (curses.KEY_HOME, ord('g')):
+            history.clear(); first = 0
+        elif ch in (curses.KEY_END, ord('G')):
+            history.clear(); first = last_page_start(path, rows, width)
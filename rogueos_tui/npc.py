@@ -1,35 +1,74 @@
 from __future__ import annotations
+import os
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 from roguefs_core.config import load_config, save_config, ensure_container, ensure_npc
+from roguefs_core.index import IndexDB
+from roguefs_core.node import NodeKind
+from roguefs_core.scanner import iter_children
+from roguefs_core.sniff import CLASSIFY_BATCH, sniff_file, sniff_later
 
 NPC_NAME = "dead_librarian"
 LIBRARY_NAME = "Magic Library"
+TOME_TYPES = ("application/pdf",)
 
-def _gather_pdfs(dir_path: Path) -> List[Dict[str, str]]:
+def _linked_tome_size(path: str) -> Optional[int]:
+    """Size of the file a symlink points at, if that file is a tome (sniffing follows the link)."""
+    if (sniff_file(path) or ("",))[0] not in TOME_TYPES:
+        return None
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+def _indexed_tome(db: IndexDB, link: str):
+    """The indexed file row a symlink resolves to, if it was sniffed as a tome."""
+    row = db.get_node_by_path(Path(os.path.realpath(link)))
+    return row if row is not None and row["kind"] == NodeKind.FILE.value and row["ctype"] in TOME_TYPES else None
+
+def _gather_pdfs(dir_path: Path, db: Optional[IndexDB] = None) -> Tuple[List[Dict[str, str]], int]:
+    """PDFs by content, not name, and how many files still wait to be sniffed. With an index this reads
+    the types already stored for the whole subtree and hands stale files to the background sniffer;
+    without one it sniffs this directory. Symlinks to PDFs are shelved too."""
     pdfs: List[Dict[str, str]] = []
-    for entry in sorted(dir_path.iterdir(), key=lambda p: p.name.lower()):
-        if entry.is_file() and entry.suffix.lower() == ".pdf":
-            try:
-                size = entry.stat().st_size
-            except OSError:
-                size = 0
-            pdfs.append({
-                "name": entry.name,
-                "relpath": entry.name,
-                "size": size
-            })
-    return pdfs
+    pending = 0
+    if db is None:
+        for rec in iter_children(dir_path):
+            if rec.kind == NodeKind.SYMLINK:
+                size = _linked_tome_size(str(rec.path))
+            elif rec.kind == NodeKind.FILE and (sniff_file(str(rec.path)) or ("",))[0] in TOME_TYPES:
+                size = rec.size
+            else:
+                continue
+            if size is not None:
+                pdfs.append({"name": rec.path.name, "relpath": rec.path.name, "size": size})
+    elif (room := db.get_node_by_path(dir_path)) is not None:
+        stale = db.stale_ctypes(room["id"], limit=CLASSIFY_BATCH)
+        sniff_later(db, stale)
+        pending = len(stale)
+        found = [(row["path"], row["size"]) for row in db.files_of_ctype(room["id"], TOME_TYPES)]
+        # Only files carry a sniffed type: a link shelves the indexed file it resolves to.
+        found += [(row["path"], tome["size"]) for row in db.descendants_of(room["id"], kinds=[NodeKind.SYMLINK.value])
+                  if (tome := _indexed_tome(db, row["path"])) is not None]
+        for path, size in found:
+            rel = os.path.relpath(path, dir_path)
+            pdfs.append({"name": rel, "relpath": rel, "size": size})
+    pdfs.sort(key=lambda e: e["relpath"].lower())
+    return pdfs, pending
 
-def summon_dead_librarian(dir_path: Path) -> Tuple[str, bool]:
-    cfg = load_config(dir_path)
+def summon_dead_librarian(dir_path: Path, db: Optional[IndexDB] = None) -> Tuple[str, bool]:
+    if not dir_path.is_dir():
+        return ("The Dead Librarian only haunts real directories.", False)
+    cfg = load_config(dir_path, db=db)
     npc_meta = ensure_npc(cfg, NPC_NAME)
     npc_meta["present"] = True
     library_meta = ensure_container(cfg, LIBRARY_NAME)
-    pdfs = _gather_pdfs(dir_path)
+    pdfs, pending = _gather_pdfs(dir_path, db)
     library_meta["items"] = pdfs
     library_meta["type"] = "magic_library"
-    save_config(dir_path, cfg)
+    save_config(dir_path, cfg, db=db)
+    if pending:
+        return (f"Dead Librarian archived {len(pdfs)} book(s); {pending} file(s) still being read, summon again later.", True)
     if not pdfs:
         return ("Dead Librarian found no tomes to shelve.", True)
     return (f"Dead Librarian archived {len(pdfs)} book(s).", True)
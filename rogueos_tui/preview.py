@@ -0,0 +1,263 @@
+"""Paged text previews of tomes (any file) for the Magic Library.
+
+Files are read through mmap, never in full. A Tome finds line starts on demand and remembers one
+every CHUNK bytes, so reaching any line means scanning at most one chunk; rendered pages are kept
+in an LRU keyed by the file's (device, inode, mtime, size), and a worker thread renders the first
+page of the entries next to the selection before they are opened.
+"""
+from __future__ import annotations
+import mmap, os, queue, string, textwrap, threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+PAGE_CACHE = int(os.environ.get("ROGUEOS_PREVIEW_CACHE", "64"))
+OPEN_TOMES = 6           # the prefetch window (selection and two neighbours each side) plus the tome being read
+CHUNK = 1 << 18          # bytes between remembered line starts
+COUNT_STEP = 1 << 24     # bytes counted per lock hold by line_count()
+LINE_CAP = 4096          # longer lines are cut here when shown
+# Everything but printable ASCII (and '\n', which separates lines) is dropped from the text.
+_DROP = bytes(b for b in range(256) if chr(b) not in string.printable or chr(b) in "\r\x0b\x0c")
+
+class Page(NamedTuple):
+    lines: List[str]
+    first: int               # first line shown
+    next: Optional[int]      # first line of the following page, None at the end
+    offset: int              # byte offset of `first`
+    size: int                # file size in bytes
+
+def _file_key(path: Path) -> Tuple[int, int, int, int]:
+    st = os.stat(path)
+    return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size
+
+class Tome:
+    """Line-addressed view of a file through mmap."""
+
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            self.size = os.fstat(f.fileno()).st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else None
+        self._lock = threading.Lock()
+        self._mark_lines = array("Q", [0]); self._mark_offs = array("Q", [0])
+        self._line = 0; self._off = 0      # scan cursor: line `_line` starts at byte `_off`
+        self.total: Optional[int] = None if self.size else 0
+        self.pins = 0                      # callers in the middle of reading (guarded by the module _lock)
+
+    def close(self):
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close(); self._mm = None
+
+    def _check(self):
+        if self._mm is None and self.size:
+            raise ValueError("tome is closed")
+
+    def _step(self, off: int) -> int:
+        """Start of the line after the one starting at off."""
+        nl = self._mm.find(b"\n", off)
+        return self.size if nl < 0 else nl + 1
+
+    def _scan(self, stop: int, budget: int = 1 << 62):
+        """Move the cursor forward to line `stop` (or the end, or `budget` bytes on), a chunk at a time
+        where possible. Scanned pages are handed back to the OS so RSS stays small."""
+        mm = self._mm; start = self._off
+        while self._line < stop and self._off < self.size and self._off - start < budget:
+            end = min(self.size, self._off + CHUNK)
+            nl = mm.rfind(b"\n", self._off, end)
+            if nl < 0:
+                count, nxt = 1, self._step(end)     # one line longer than a chunk, or the unterminated last line
+            else:
+                count, nxt = mm[self._off:nl + 1].count(b"\n"), nl + 1
+            if self._line + count > stop:
+                while self._line < stop and self._off < self.size:
+                    self._off = self._step(self._off); self._line += 1
+                break
+            self._line += count; self._off = nxt
+            if self._off < self.size:
+                self._mark_lines.append(self._line); self._mark_offs.append(self._off)
+        if self._off >= self.size:
+            self.total = self._line
+        lo = start - start % mmap.PAGESIZE
+        if self._off - lo > CHUNK and hasattr(mmap, "MADV_DONTNEED"):
+            mm.madvise(mmap.MADV_DONTNEED, lo, self._off - lo - CHUNK)
+
+    def _offset_of(self, n: int) -> Optional[int]:
+        if n > self._line:
+            self._scan(n)
+        if self.total is not None and n >= self.total:
+            return None
+        if n == self._line:
+            return self._off
+        i = bisect_right(self._mark_lines, n) - 1
+        line, off = self._mark_lines[i], self._mark_offs[i]
+        while line < n:
+            off = self._step(off); line += 1
+        return off
+
+    def line_count(self) -> int:
+        """Number of lines; the first call counts the rest of the file, COUNT_STEP bytes at a time."""
+        while True:
+            with self._lock:
+                self._check()
+                if self.total is not None:
+                    return self.total
+                self._scan(1 << 62, COUNT_STEP)
+
+    def lines(self, first: int, count: int) -> Tuple[Optional[int], List[Tuple[bytes, bool]]]:
+        """(offset of line `first`, [(line bytes, cut at LINE_CAP)] for up to `count` lines)."""
+        with self._lock:
+            self._check()
+            off = self._offset_of(first)
+            if off is None:
+                return None, []
+            out = []; start = off
+            while len(out) < count and off < self.size:
+                nl = self._mm.find(b"\n", off, off + LINE_CAP)
+                if nl >= 0:
+                    out.append((self._mm[off:nl], False)); off = nl + 1
+                else:
+                    end = min(self.size, off + LINE_CAP)
+                    out.append((self._mm[off:end], end < self.size and self._mm[end] != 10))
+                    off = self._step(end) if end < self.size else end
+            return start, out
+
+def _wrap(raw: bytes, cut: bool, width: int) -> List[str]:
+    text = raw.translate(None, _DROP).decode("ascii").expandtabs(4).rstrip()
+    rows = textwrap.wrap(text, width=width) if text.strip() else [""]
+    if cut:
+        rows.append("…")
+    return rows
+
+_tomes: "OrderedDict[tuple, Tome]" = OrderedDict()
+_pages: "OrderedDict[tuple, Page]" = OrderedDict()
+_lock = threading.Lock()
+
+def tome(path: Path) -> Tuple[tuple, Tome]:
+    """(file key, open Tome) for path, reusing the Tome while the file is unchanged. It may be evicted
+    and closed at any time; use `pinned` to read from it."""
+    key = _file_key(path)
+    with _lock:
+        t = _tomes.get(key)
+        if t is not None:
+            _tomes.move_to_end(key)
+            return key, t
+    t = Tome(path)
+    with _lock:
+        if key in _tomes:
+            t.close(); t = _tomes[key]
+        else:
+            _tomes[key] = t
+            while len(_tomes) > OPEN_TOMES:
+                old = _tomes.popitem(last=False)[1]
+                if not old.pins:
+                    old.close()             # a pinned one is closed by its last reader
+    return key, t
+
+@contextmanager
+def pinned(path: Path):
+    """(file key, Tome) for path, kept open until the block ends even if it is evicted meanwhile."""
+    while True:
+        key, t = tome(path)
+        with _lock:
+            if t._mm is not None or not t.size:
+                t.pins += 1
+                break
+        # closed between lookup and pin: look it up again
+    try:
+        yield key, t
+    finally:
+        with _lock:
+            t.pins -= 1
+            if not t.pins and _tomes.get(key) is not t:
+                t.close()
+
+def page(path: Path, first: int, rows: int, width: int) -> Optional[Page]:
+    """Up to `rows` wrapped lines of path from line `first` on; None if it cannot be read."""
+    try:
+        with pinned(path) as (key, t):
+            cache_key = key + (first, rows, width)
+            with _lock:
+                hit = _pages.get(cache_key)
+                if hit is not None:
+                    _pages.move_to_end(cache_key)
+                    return hit
+            off, raw = t.lines(first, rows)
+            lines: List[str] = []; n = first
+            for chunk, cut in raw:
+                wrapped = _wrap(chunk, cut, width)
+                if lines and len(lines) + len(wrapped) > rows:
+                    break
+                lines += wrapped[:rows]; n += 1
+            more = off is not None and t.lines(n, 1)[0] is not None
+    except (OSError, ValueError):
+        return None
+    result = Page(lines, first, n if more else None, off or 0, t.size)
+    with _lock:
+        _pages[cache_key] = result
+        while len(_pages) > PAGE_CACHE:
+            _pages.popitem(last=False)
+    return result
+
+def last_page_start(path: Path, rows: int, width: int) -> int:
+    """First line of the page that ends with the file's last line."""
+    try:
+        with pinned(path) as (_, t):
+            total = t.line_count()
+            n = max(0, total - rows)
+            _, raw = t.lines(n, rows)
+    except (OSError, ValueError):
+        return 0
+    used = 0
+    for chunk, cut in reversed(raw):
+        used += len(_wrap(chunk, cut, width))
+        if used > rows:
+            break
+        total -= 1
+    return total
+
+def count_lines(path: Path) -> Optional[int]:
+    try:
+        with pinned(path) as (_, t):
+            return t.line_count()
+    except (OSError, ValueError):
+        return None
+
+class _Prefetcher:
+    """Runs preview jobs on a daemon thread; a new batch replaces the jobs not started yet."""
+
+    def __init__(self):
+        self._jobs: queue.Queue = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, jobs: Iterable[tuple]):
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        for job in jobs:
+            self._jobs.put(job)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="rogueos-preview")
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            func, *args = self._jobs.get()
+            try:
+                func(*args)
+            except Exception:
+                pass
+
+_prefetcher = _Prefetcher()
+
+def prefetch(paths: Iterable[Path], rows: int, width: int):
+    """Warm the page cache with the first page of each path, in the background."""
+    _prefetcher.submit([(page, p, 0, rows, width) for p in paths])
+
+def prefetch_line_count(path: Path):
+    """Count path's lines in the background, so jumping to its end is instant once done."""
+    _prefetcher.submit([(count_lines, path)])
@@ -1,12 +1,13 @@
 
 from __future__ import annotations
-import curses, math
+import curses, math, time
 from typing import Tuple, Dict, List, Optional
 from pathlib import Path
 from roguefs_core.index import IndexDB
 from roguefs_core.node import NodeKind
-from roguefs_core.config import load_config
+from roguefs_core.config import load_config, config_fingerprint
 from roguefs_core.layout import chamber_cells
+from roguefs_core.sniff import family
 from .geom import calc_interior_dims, build_items_map
 
 TILES = {
@@ -17,27 +18,61 @@ TILES = {
     "door_closed":"+",
     "door_open":"/",
     "file":"*",
+    "document":"?",
+    "image":"%",
+    "media":"~",
+    "archive":"&",
+    "executable":"!",
     "symlink":"=",
     "library":"L",
     "npc":"d",
+    "wing":"]",
+    "edge":":",
     "cursor":"@"
 }
 COLORS = {
     "wall":6,
     "floor":1,
     "file":2,
+    "document":7,
+    "image":3,
+    "media":4,
+    "archive":6,
+    "executable":5,
     "dir":4,
     "door_closed":6,
     "door_open":4,
     "symlink":3,
     "library":2,
     "npc":5,
+    "wing":3,
     "cursor":5,
     "title":7
 }
 
+# The room's config is re-read after recheck_config() (a watcher event), a write, or this long.
+CONFIG_RECHECK_SECS = 2.0
+
+_FILE_TILES = {"document": "document", "image": "image", "audio": "media", "video": "media",
+               "archive": "archive", "executable": "executable"}
+
+def _format_bytes(n: int) -> str:
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if n < 1024 or unit == "TB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+
+def _stats_label(rec) -> str:
+    if rec is None:
+        return ""
+    return (f"{rec['child_count']} items · {rec['file_count']} files · "
+            f"{_format_bytes(rec['total_bytes'])} · depth {rec['max_depth']}")
+
+_colors_ready = False
+
 def _init_colors():
-    if not curses.has_colors(): return
+    global _colors_ready
+    if _colors_ready or not curses.has_colors(): return
     curses.start_color(); curses.use_default_colors()
     curses.init_pair(1, curses.COLOR_WHITE, -1)
     curses.init_pair(2, curses.COLOR_YELLOW, -1)
@@ -46,202 +81,249 @@ def _init_colors():
     curses.init_pair(5, curses.COLOR_MAGENTA, -1)
     curses.init_pair(6, curses.COLOR_BLUE, -1)
     curses.init_pair(7, curses.COLOR_WHITE, -1)
+    _colors_ready = True
+
+HELP = "[WASD/Arrows] Move  [>] Descend  [<] Ascend  [o]Open  [e]Edit  [D]Summon Librarian  [m/M//] Teleport map  [p]Pin  [T]Reflow  [q]Quit"
+
+def _norm_range(nmin: float, nmax: float, size: int) -> Tuple[int, int]:
+    if size <= 0:
+        return (0, 0)
+    nmin = max(0.0, min(1.0, nmin))
+    nmax = max(nmin + 1e-3, min(1.0, nmax))
+    start = int(math.floor(nmin * size))
+    end = int(math.ceil(nmax * size) - 1)
+    start = max(0, min(size - 1, start))
+    end = max(start, min(size - 1, end))
+    return start, end
+
+def _norm_to_idx(norm: float, size: int) -> int:
+    if size <= 0:
+        return 0
+    norm = max(0.0, min(1.0, norm))
+    return max(0, min(size - 1, int(round(norm * (size - 1)))))
+
+def _door_color(meta: dict) -> str:
+    return "door_open" if meta.get("state", "open") == "open" else "door_closed"
 
 class RoomRender:
+    """Retained-mode room view. The room (walls, floor, doors, items) is composed once into a grid of
+    (glyph, attr) cells and painted in full only when the items, config or terminal size change;
+    otherwise a frame repaints just the player's old and new cells, the underfoot label and the status
+    line. Call invalidate() after anything else has drawn over the screen, and recheck_config() when
+    the room's directory changed on disk."""
+
     def __init__(self, db: IndexDB, dir_id: str):
         self.db = db; self.dir_id = dir_id
-        self.children = self.db.children_of(dir_id)
+        self.children = self.db.room_children(dir_id)
+        self._generation = db.generation                # index state self.children was read at
+        self._fingerprint = None; self._fingerprint_at = 0.0
+        self._key = None; self._items = None
+        self._grid: List[List[Tuple[str, int]]] = []   # interior rows x cols, in screen order
+        self._origin = (0, 0)                          # screen position of the grid
+        self._view = (0, 0)                            # camera: room cell shown top-left
+        self._child_meta: Dict[str, dict] = {}
+        self._player: Optional[Tuple[int, int]] = None
+        self._underfoot = None; self._label = None; self._status = None
 
-    def draw(self, stdscr, cursor_idx: int, player_gxy: Tuple[int,int], status: str = "", items: Optional[List[Tuple[str,str,int,int]]] = None, occ: Optional[Dict[Tuple[int,int], str]] = None) -> None:
-        stdscr.erase(); _init_colors()
-        h, w = stdscr.getmaxyx(); stdscr.box()
-        cols, rows, x0, y0 = calc_interior_dims(w, h)
+    def invalidate(self):
+        self._key = None
 
-        # Title
-        row = self.db.get_node(self.dir_id); title = row["path"]
-        try: stdscr.addnstr(0, 2, f" {title} ", w-4, curses.color_pair(COLORS["title"]))
-        except curses.error: pass
+    def recheck_config(self):
+        self._fingerprint = None
 
-        # Walls + floor
-        for x in range(cols):
-            try:
-                stdscr.addstr(y0, x0+x, TILES["wall"], curses.color_pair(COLORS["wall"]) | curses.A_DIM)
-                stdscr.addstr(y0+rows-1, x0+x, TILES["wall"], curses.color_pair(COLORS["wall"]) | curses.A_DIM)
-            except curses.error: pass
-        for y in range(1, rows-1):
-            try:
-                stdscr.addstr(y0+y, x0, TILES["wall"], curses.color_pair(COLORS["wall"]) | curses.A_DIM)
-                stdscr.addstr(y0+y, x0+cols-1, TILES["wall"], curses.color_pair(COLORS["wall"]) | curses.A_DIM)
-                stdscr.addstr(y0+y, x0+1, TILES["floor"]*(cols-2), curses.color_pair(COLORS["floor"]))
-            except curses.error: pass
+    def _config_fingerprint(self, path: Path) -> str:
+        now = time.monotonic()
+        if self._fingerprint is None or now - self._fingerprint_at >= CONFIG_RECHECK_SECS:
+            self._fingerprint = config_fingerprint(path, db=self.db); self._fingerprint_at = now
+        return self._fingerprint
 
-        # Parent stairs '<'
-        has_parent = self.db.parent_of(self.dir_id) is not None
-        if has_parent:
-            try: stdscr.addstr(y0+1, x0+1, TILES["stairs_up"], curses.color_pair(COLORS["dir"]))
-            except curses.error: pass
+    def _compose(self, cols: int, rows: int, items, cfg, zoom: int, view: Tuple[int, int]) -> None:
+        wall = (TILES["wall"], curses.color_pair(COLORS["wall"]) | curses.A_DIM)
+        edge = (TILES["edge"], curses.color_pair(COLORS["wall"]) | curses.A_DIM)  # the room goes on past the screen
+        floor = (TILES["floor"], curses.color_pair(COLORS["floor"]))
+        w, h = cols - 2, rows - 2
+        ox, oy = view
+        left = edge if ox > 0 else wall; right = edge if ox + w < w * zoom else wall
+        grid = ([[edge if oy > 0 else wall] * cols] + [[left] + [floor] * w + [right] for _ in range(h)]
+                + [[edge if oy + h < h * zoom else wall] * cols])
 
-        # Items map (positions in interior coords)
-        if items is None or occ is None:
-            items, occ = build_items_map(self.db, self.dir_id, cols, rows)
+        def put(gy: int, gx: int, glyph: str, attr: int):
+            """Set a room cell given in grid coordinates; cells outside the view are dropped."""
+            if 0 <= gy - oy < h and 0 <= gx - ox < w:
+                grid[gy - oy + 1][gx - ox + 1] = (glyph, attr)
 
-        cfg = load_config(Path(row["path"]))
-        child_meta = cfg.get("children", {})
-        presentation = cfg.get("presentation", "hall")
+        # Parent stairs '<'
+        if self.db.parent_of(self.dir_id) is not None:
+            put(0, 0, TILES["stairs_up"], curses.color_pair(COLORS["dir"]))
 
-        door_overlays: Dict[str, Tuple[int, int, str, str]] = {}
+        self._child_meta = child_meta = cfg.get("children", {})
+        names = {cid: Path(node["path"]).name for cid, node in
+                 ((cid, self.db.get_node(cid)) for cid, kind, _, _ in items if kind == NodeKind.DIRECTORY.value) if node}
 
-        if presentation == "chambers":
-            dir_nodes: List[Tuple[str, Dict[str, str], int, int]] = []
-            for cid, kind, gx, gy in items:
-                if kind != NodeKind.DIRECTORY.value:
-                    continue
-                node = self.db.get_node(cid)
-                if not node:
-                    continue
-                dir_nodes.append((cid, node, gx, gy))
-
-            interior_w = max(1, cols - 2)
-            interior_h = max(1, rows - 2)
-
-            def norm_range(nmin: float, nmax: float, size: int) -> Tuple[int, int]:
-                if size <= 0:
-                    return (0, 0)
-                nmin = max(0.0, min(1.0, nmin))
-                nmax = max(nmin + 1e-3, min(1.0, nmax))
-                start = int(math.floor(nmin * size))
-                end = int(math.ceil(nmax * size) - 1)
-                start = max(0, min(size - 1, start))
-                end = max(start, min(size - 1, end))
-                return start, end
-
-            def norm_to_idx(norm: float, size: int) -> int:
-                if size <= 0:
-                    return 0
-                norm = max(0.0, min(1.0, norm))
-                return max(0, min(size - 1, int(round(norm * (size - 1)))))
-
-            cells = chamber_cells(len(dir_nodes))
-            for (cid, node, gx, gy), cell in zip(dir_nodes, cells):
-                name = Path(node["path"]).name
-                meta = child_meta.get(name, {})
-                door_state = meta.get("state", "open")
-                color_key = "door_open" if door_state == "open" else "door_closed"
-                min_x, min_y = cell["min"]
-                max_x, max_y = cell["max"]
-                left_idx, right_idx = norm_range(min_x, max_x, interior_w)
-                top_idx, bottom_idx = norm_range(min_y, max_y, interior_h)
-                left_abs = x0 + 1 + left_idx
-                right_abs = x0 + 1 + right_idx
-                top_abs = y0 + 1 + top_idx
-                bottom_abs = y0 + 1 + bottom_idx
-                door_norm_x, door_norm_y = cell["door"]
-                door_side = cell["door_side"]
-                door_idx_x = norm_to_idx(door_norm_x, interior_w)
-                door_idx_y = norm_to_idx(door_norm_y, interior_h)
-                door_abs_x = x0 + 1 + door_idx_x
-                door_abs_y = y0 + 1 + door_idx_y
+        if cfg.get("presentation", "hall") == "chambers":
+            interior_w = max(1, w * zoom)
+            interior_h = max(1, h * zoom)
+            dir_ids = [cid for cid, kind, _, _ in items if cid in names]
+            doors = []
+            chamber_wall = (TILES["wall"], curses.color_pair(COLORS["wall"]))
+            for cid, cell in zip(dir_ids, chamber_cells(len(dir_ids))):
+                meta = child_meta.get(names[cid], {})
+                left_idx, right_idx = _norm_range(cell["min"][0], cell["max"][0], interior_w)
+                top_idx, bottom_idx = _norm_range(cell["min"][1], cell["max"][1], interior_h)
+                door = (_norm_to_idx(cell["door"][0], interior_w), _norm_to_idx(cell["door"][1], interior_h))
 
                 # Draw walls, skipping the door location
-                for ax in range(left_abs, right_abs + 1):
-                    if (door_abs_x, door_abs_y) != (ax, top_abs):
-                        try:
-                            stdscr.addstr(top_abs, ax, TILES["wall"], curses.color_pair(COLORS["wall"]))
-                        except curses.error:
-                            pass
-                    if (door_abs_x, door_abs_y) != (ax, bottom_abs):
-                        try:
-                            stdscr.addstr(bottom_abs, ax, TILES["wall"], curses.color_pair(COLORS["wall"]))
-                        except curses.error:
-                            pass
-                for ay in range(top_abs, bottom_abs + 1):
-                    if (door_abs_x, door_abs_y) != (left_abs, ay):
-                        try:
-                            stdscr.addstr(ay, left_abs, TILES["wall"], curses.color_pair(COLORS["wall"]))
-                        except curses.error:
-                            pass
-                    if (door_abs_x, door_abs_y) != (right_abs, ay):
-                        try:
-                            stdscr.addstr(ay, right_abs, TILES["wall"], curses.color_pair(COLORS["wall"]))
-                        except curses.error:
-                            pass
-
-                door_tile = TILES["door_open"] if door_state == "open" else TILES["door_closed"]
-                door_overlays[cid] = (door_abs_x, door_abs_y, door_tile, color_key)
-
-        for _, (dx, dy, ch, color_key) in door_overlays.items():
-            try:
-                stdscr.addstr(dy, dx, ch, curses.color_pair(COLORS[color_key]) | curses.A_BOLD)
-            except curses.error:
-                pass
-
-        # Underfoot label near top-left
-        underfoot_id = occ.get(player_gxy)
-        label = "Underfoot: --"
-        label_color = curses.color_pair(COLORS["floor"])
-        if underfoot_id:
-            node = self.db.get_node(underfoot_id)
-            if node:
-                kind_value = node["kind"]
-                base_name = Path(node["path"]).name or node["path"]
-                display_name = base_name
-                if kind_value == NodeKind.CONTAINER.value and node["seed"]:
-                    display_name = node["seed"]
-                elif kind_value == NodeKind.NPC.value and node["seed"]:
-                    display_name = node["seed"]
-                if kind_value == NodeKind.DIRECTORY.value and not display_name.endswith("/"):
-                    display_name = f"{display_name}/"
-                label = f"Underfoot: {display_name}"
-                if kind_value == NodeKind.DIRECTORY.value:
-                    meta = child_meta.get(base_name, {})
-                    door_state = meta.get("state", "open")
-                    color_key = "door_open" if door_state == "open" else "door_closed"
-                    label_color = curses.color_pair(COLORS[color_key])
-                elif kind_value == NodeKind.SYMLINK.value:
-                    label_color = curses.color_pair(COLORS["symlink"])
-                elif kind_value == NodeKind.CONTAINER.value:
-                    label_color = curses.color_pair(COLORS["library"])
-                elif kind_value == NodeKind.NPC.value:
-                    label_color = curses.color_pair(COLORS["npc"])
-                else:
-                    label_color = curses.color_pair(COLORS["file"])
-        try:
-            stdscr.addnstr(1, 2, label, w-4, label_color | curses.A_BOLD)
-        except curses.error:
-            pass
-
-        # Draw items
-        for idx, c in enumerate(items):
-            cid, kind, gx, gy = c
+                for gx in range(left_idx, right_idx + 1):
+                    for gy in (top_idx, bottom_idx):
+                        if door != (gx, gy):
+                            put(gy, gx, *chamber_wall)
+                for gy in range(top_idx, bottom_idx + 1):
+                    for gx in (left_idx, right_idx):
+                        if door != (gx, gy):
+                            put(gy, gx, *chamber_wall)
+                door_tile = TILES["door_open"] if meta.get("state", "open") == "open" else TILES["door_closed"]
+                doors.append((door, door_tile, _door_color(meta)))
+            for (dx, dy), ch, color_key in doors:
+                put(dy, dx, ch, curses.color_pair(COLORS[color_key]) | curses.A_BOLD)
+
+        # Items; files get a glyph for their sniffed content type
+        ctypes = {r["id"]: r["ctype"] for r in self.children if r["ctype"]}
+        for cid, kind, gx, gy in items:
             glyph = TILES["file"]; color_key = "file"
-            if kind == NodeKind.DIRECTORY.value:
-                node = self.db.get_node(cid)
-                if not node:
+            if kind == NodeKind.FILE.value:
+                color_key = _FILE_TILES.get(family(ctypes.get(cid)), "file"); glyph = TILES[color_key]
+            elif kind == NodeKind.DIRECTORY.value:
+                if cid not in names:
                     continue
-                name = Path(node["path"]).name
-                meta = child_meta.get(name, {})
-                door_state = meta.get("state", "open")
-                glyph = TILES["dir"]
-                color_key = "door_open" if door_state == "open" else "door_closed"
+                glyph = TILES["dir"]; color_key = _door_color(child_meta.get(names[cid], {}))
             elif kind == NodeKind.SYMLINK.value:
                 glyph = TILES["symlink"]; color_key = "symlink"
             elif kind == NodeKind.CONTAINER.value:
                 glyph = TILES["library"]; color_key = "library"
             elif kind == NodeKind.NPC.value:
                 glyph = TILES["npc"]; color_key = "npc"
-            ax, ay = x0+1+gx, y0+1+gy
-            try: stdscr.addstr(ay, ax, glyph, curses.color_pair(COLORS[color_key]))
+            elif kind == NodeKind.WING.value:
+                glyph = TILES["wing"]; color_key = "wing"
+            put(gy, gx, glyph, curses.color_pair(COLORS[color_key]))
+        self._grid = grid; self._view = view
+
+    def _paint_row(self, stdscr, r: int):
+        """Repaint one composed row, one addstr per run of equal attributes."""
+        x0, y0 = self._origin; row = self._grid[r]
+        start = 0
+        for i in range(1, len(row) + 1):
+            if i == len(row) or row[i][1] != row[start][1]:
+                try: stdscr.addstr(y0 + r, x0 + start, "".join(g for g, _ in row[start:i]), row[start][1])
+                except curses.error: pass
+                start = i
+
+    def _paint_cell(self, stdscr, gx: int, gy: int, glyph: Optional[str] = None, attr: int = 0):
+        """Paint a room cell (grid coordinates) from the composed grid, or with glyph/attr if given."""
+        x0, y0 = self._origin
+        lx = gx - self._view[0]; ly = gy - self._view[1]
+        if 0 <= ly + 1 < len(self._grid) - 1 and 0 <= lx + 1 < len(self._grid[0]) - 1:
+            if glyph is None:
+                glyph, attr = self._grid[ly + 1][lx + 1]
+            try: stdscr.addstr(y0 + 1 + ly, x0 + 1 + lx, glyph, attr)
             except curses.error: pass
 
-        # Draw '@' at player tile
-        pgx, pgy = player_gxy
-        pax, pay = x0+1+pgx, y0+1+pgy
-        try: stdscr.addstr(pay, pax, TILES["cursor"], curses.color_pair(COLORS["cursor"])|curses.A_BOLD)
+    def _paint_frame(self, stdscr, w: int, h: int):
+        stdscr.erase(); stdscr.box()
+        # Title
+        row = self.db.get_node(self.dir_id); title = row["path"]
+        if row["kind"] == NodeKind.WING.value:
+            title = f"{Path(row['path']).parent} [{row['seed']}]"
+        try: stdscr.addnstr(0, 2, f" {title} ", w-4, curses.color_pair(COLORS["title"]))
+        except curses.error: pass
+        stats = _stats_label(self.db.get_dir_stats(self.dir_id))
+        if stats and len(title) + len(stats) + 10 < w:
+            try: stdscr.addnstr(0, w - len(stats) - 4, f" {stats} ", len(stats) + 2, curses.color_pair(COLORS["title"]) | curses.A_DIM)
+            except curses.error: pass
+        for r in range(len(self._grid)):
+            self._paint_row(stdscr, r)
+        try: stdscr.addnstr(h-2, 1, HELP, w-2)
         except curses.error: pass
+        self._player = None; self._underfoot = None; self._label = None; self._status = None
+
+    def _underfoot_label(self, underfoot_id: Optional[str]) -> Tuple[str, int]:
+        label = "Underfoot: --"
+        label_color = curses.color_pair(COLORS["floor"])
+        node = self.db.get_node(underfoot_id) if underfoot_id else None
+        if node:
+            kind_value = node["kind"]
+            base_name = Path(node["path"]).name or node["path"]
+            display_name = base_name
+            if kind_value == NodeKind.CONTAINER.value and node["seed"]:
+                display_name = node["seed"]
+            elif kind_value == NodeKind.NPC.value and node["seed"]:
+                display_name = node["seed"]
+            elif kind_value == NodeKind.WING.value:
+                display_name = f"[{node['seed']}]/"
+            if kind_value == NodeKind.DIRECTORY.value and not display_name.endswith("/"):
+                display_name = f"{display_name}/"
+            label = f"Underfoot: {display_name}"
+            if kind_value == NodeKind.DIRECTORY.value:
+                label_color = curses.color_pair(COLORS[_door_color(self._child_meta.get(base_name, {}))])
+            elif kind_value == NodeKind.SYMLINK.value:
+                label_color = curses.color_pair(COLORS["symlink"])
+            elif kind_value == NodeKind.CONTAINER.value:
+                label_color = curses.color_pair(COLORS["library"])
+            elif kind_value == NodeKind.NPC.value:
+                label_color = curses.color_pair(COLORS["npc"])
+            elif kind_value == NodeKind.WING.value:
+                label_color = curses.color_pair(COLORS["wing"])
+            else:
+                label_color = curses.color_pair(COLORS[_FILE_TILES.get(family(node["ctype"]), "file")])
+                if kind_value == NodeKind.FILE.value and node["ctype"]:
+                    label = f"{label}  ({node['ctype']})"
+        return label, label_color | curses.A_BOLD
+
+    def draw(self, stdscr, cursor_idx: int, player_gxy: Tuple[int,int], status: str = "", items: Optional[List[Tuple[str,str,int,int]]] = None, occ: Optional[Dict[Tuple[int,int], str]] = None,
+             zoom: int = 1, view: Tuple[int,int] = (0, 0)) -> None:
+        """Draw the room; items/occ come from build_items_map(..., zoom, view), in the same grid coordinates as player_gxy."""
+        _init_colors()
+        h, w = stdscr.getmaxyx()
+        cols, rows, x0, y0 = calc_interior_dims(w, h)
+
+        # Items map (positions in interior coords)
+        if items is None or occ is None:
+            items, occ = build_items_map(self.db, self.dir_id, cols, rows, zoom, view)
+
+        row = self.db.get_node(self.dir_id)
+        if self.db.generation != self._generation:
+            # Regenerated, or content types came in: the glyphs come from fresh rows.
+            self.children = self.db.room_children(self.dir_id)
+            self._generation = self.db.generation; self._fingerprint = None
+        key = (w, h, zoom, view, self._generation, self._config_fingerprint(Path(row["path"])))
+        if key != self._key or items is not self._items:
+            cfg = load_config(Path(row["path"]), readonly=True, db=self.db)
+            self._compose(cols, rows, items, cfg, zoom, view)
+            self._origin = (x0, y0)
+            self._key = key; self._items = items
+            self._paint_frame(stdscr, w, h)
+
+        # Player: restore the cell it left, then draw '@'
+        if self._player != player_gxy:
+            if self._player is not None:
+                self._paint_cell(stdscr, *self._player)
+            self._paint_cell(stdscr, *player_gxy, TILES["cursor"], curses.color_pair(COLORS["cursor"])|curses.A_BOLD)
+            self._player = player_gxy
+
+        # Underfoot label, drawn over the top wall
+        underfoot_id = occ.get(player_gxy)
+        if underfoot_id != self._underfoot or self._label is None:
+            self._underfoot = underfoot_id
+            label = self._underfoot_label(underfoot_id)
+            if label != self._label:
+                self._paint_row(stdscr, 0)
+                try: stdscr.addnstr(1, 2, label[0], w-4, label[1])
+                except curses.error: pass
+                self._label = label
 
         # HUD
-        try:
-            stdscr.addnstr(h-3, 1, status, w-2)
-            stdscr.addnstr(h-2, 1, "[WASD/Arrows] Move  [>] Descend  [<] Ascend  [o]Open  [e]Edit  [D]Summon Librarian  [m/M//] Teleport map  [p]Pin  [T]Reflow  [q]Quit", w-2)
-        except curses.error: pass
-        stdscr.refresh()
+        if status != self._status:
+            try: stdscr.addnstr(h-3, 1, status.ljust(w-2), w-2)
+            except curses.error: pass
+            self._status = status
+        stdscr.noutrefresh()
+        curses.doupdate()
@@ -1,103 +1,350 @@
 from __future__ import annotations
-import curses
+import curses, queue, threading
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from roguefs_core.index import IndexDB
-from roguefs_core.node import NodeKind
-from roguefs_core.worldgen import generate_room
-
-MAX_DIR_ENTRIES = 2000
-
-def _ensure_children_generated(db: IndexDB, dir_id: str) -> None:
-    row = db.get_node(dir_id)
-    if not row:
-        return
-    generate_room(db, Path(row["path"]), parent_id=row["parent"])
-
-def _collect_directories(db: IndexDB, dir_id: str, acc: List[Tuple[str, int]], depth: int, limit: int) -> None:
-    if len(acc) >= limit:
-        return
-    acc.append((dir_id, depth))
-    _ensure_children_generated(db, dir_id)
-    for child in db.children_of(dir_id):
-        if child["kind"] != NodeKind.DIRECTORY.value:
-            continue
-        if len(acc) >= limit:
-            break
-        _collect_directories(db, child["id"], acc, depth + 1, limit)
-
-def _format_label(db: IndexDB, node_id: str, depth: int, root_id: str) -> str:
-    row = db.get_node(node_id)
-    if not row:
-        return ""
-    indent = "  " * depth
-    if node_id == root_id:
-        return f"{row['path']}/" if not str(row["path"]).endswith("/") else row["path"]
-    name = Path(row["path"]).name or row["path"]
-    label = f"{name}/"
-    return f"{indent}{label}"
-
-def teleport_via_map(stdscr, db: IndexDB, root_id: str, current_dir_id: str, max_entries: int = MAX_DIR_ENTRIES) -> Optional[str]:
-    directories: List[Tuple[str, int]] = []
-    _collect_directories(db, root_id, directories, 0, max_entries)
-    if not directories:
-        return None
-    selected = next((i for i, (nid, _) in enumerate(directories) if nid == current_dir_id), 0)
-    top = 0
-    truncated = len(directories) >= max_entries
-
-    while True:
-        stdscr.erase()
-        h, w = stdscr.getmaxyx()
-        stdscr.box()
-        title = " Teleport Map "
+from roguefs_core.fuzzy import fuzzy_search
+from roguefs_core.indexer import index_directory
+
+SEARCH_RESULTS = 50
+SCAN_POLL_MS = 100
+
+class _Scanner:
+    """Scans directories into the index on a background thread with its own connection, so the map
+    stays responsive; finished() returns the ids scanned since the last call."""
+
+    def __init__(self, db: IndexDB):
+        self._db = db
+        self._jobs: queue.Queue = queue.Queue(); self._done: queue.Queue = queue.Queue()
+        self._thread = None
+        if db.path != ":memory:":
+            self._thread = threading.Thread(target=self._run, daemon=True, name="rogueos-map-scan")
+            self._thread.start()
+
+    def submit(self, dir_id: str, path: str):
+        if self._thread is None:
+            # A private in-memory index cannot be shared with another thread: scan inline.
+            self._scan(self._db, dir_id, path)
+        else:
+            self._jobs.put((dir_id, path))
+
+    def _scan(self, db: IndexDB, dir_id: str, path: str):
         try:
-            stdscr.addnstr(0, max(2, (w - len(title)) // 2), title, w - 4, curses.A_BOLD)
-        except curses.error:
+            index_directory(db, Path(path), dir_id)
+        except OSError:
             pass
+        self._done.put(dir_id)
 
-        visible = max(1, h - 4)
-        if selected < top:
-            top = selected
-        elif selected >= top + visible:
-            top = selected - visible + 1
-
-        row_idx = 0
-        for i in range(top, min(len(directories), top + visible)):
-            node_id, depth = directories[i]
-            label = _format_label(db, node_id, depth, root_id)
-            if not label:
-                continue
-            attr = curses.A_REVERSE if i == selected else curses.A_NORMAL
+    def _run(self):
+        db = IndexDB(self._db.path)
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                self._scan(db, *job)
+        finally:
+            db.close()
+
+    def finished(self) -> List[str]:
+        out = []
+        while True:
             try:
-                stdscr.addnstr(1 + row_idx, 2, label, w - 4, attr)
+                out.append(self._done.get_nowait())
+            except queue.Empty:
+                return out
+
+    def close(self):
+        if self._thread is not None:
+            self._jobs.put(None)
+
+class _DirTree:
+    """Collapsible directory tree read from the index, flattened to the rows currently shown."""
+
+    def __init__(self, db: IndexDB, root_id: str):
+        self.db = db; self.root_id = root_id
+        self.rows: List[Tuple[str, int]] = [(root_id, 0)]   # (dir id, depth), depth-first
+        self._index: Dict[str, int] = {root_id: 0}          # dir id -> position in rows
+        self.expanded: set = set()
+        self.scanning: set = set()
+        self.listed: set = set()       # scanned while the map is open, even if they turned out empty
+        self._names: Dict[str, str] = {}
+
+    def index_of(self, dir_id: str) -> int:
+        return self._index.get(dir_id, -1)
+
+    def _reindex(self, start: int):
+        for j in range(start, len(self.rows)):
+            self._index[self.rows[j][0]] = j
+
+    def known(self, dir_id: str) -> bool:
+        """True if the index already lists this directory's contents (entered, crawled or scanned here)."""
+        if dir_id in self.listed:
+            return True
+        stats = self.db.get_dir_stats(dir_id)
+        return (stats is not None and stats["child_count"] > 0) or self.db.get_room_state(dir_id) is not None
+
+    def expand(self, i: int, scanner: _Scanner):
+        dir_id, depth = self.rows[i]
+        if dir_id in self.expanded:
+            return
+        self.expanded.add(dir_id)
+        if not self.known(dir_id) and dir_id not in self.scanning:
+            row = self.db.get_node(dir_id)
+            if row is not None:
+                self.scanning.add(dir_id)
+                scanner.submit(dir_id, row["path"])
+        children = [(r["id"], depth + 1) for r in self.db.child_dirs(dir_id)]
+        if children:
+            self.rows[i + 1:i + 1] = children
+            self._reindex(i + 1)
+
+    def collapse(self, i: int):
+        dir_id, depth = self.rows[i]
+        self.expanded.discard(dir_id)
+        end = i + 1
+        while end < len(self.rows) and self.rows[end][1] > depth:
+            end += 1
+        if end > i + 1:
+            for nid, _ in self.rows[i + 1:end]:
+                del self._index[nid]
+            del self.rows[i + 1:end]
+            self._reindex(i + 1)
+
+    def scanned(self, dir_id: str, scanner: _Scanner):
+        """Show the children of a directory whose background scan just finished."""
+        self.scanning.discard(dir_id)
+        self.listed.add(dir_id)
+        i = self.index_of(dir_id)
+        if i >= 0 and dir_id in self.expanded:
+            self.collapse(i); self.expand(i, scanner)
+
+    def reveal(self, dir_id: str, scanner: _Scanner) -> int:
+        """Expand every ancestor of dir_id and return its row (or its nearest shown ancestor's, e.g. for a wing)."""
+        found = 0
+        for row in self.db.ancestors_of(dir_id):
+            i = self.index_of(row["id"])
+            if i >= 0:
+                self.expand(i, scanner); found = i
+        i = self.index_of(dir_id)
+        return i if i >= 0 else found
+
+    def label(self, i: int) -> str:
+        dir_id, depth = self.rows[i]
+        name = self._names.get(dir_id)
+        if name is None:
+            row = self.db.get_node(dir_id)
+            path = str(row["path"]) if row else "?"
+            name = self._names[dir_id] = (path if dir_id == self.root_id else Path(path).name or path).rstrip("/") + "/"
+        marker = "▾" if dir_id in self.expanded else "▸"
+        suffix = "  (scanning…)" if dir_id in self.scanning else ""
+        return f"{'  ' * depth}{marker} {name}{suffix}"
+
+class _FlatTree:
+    """Every indexed directory below the root, fully expanded. Rows come from the index's depth-first
+    listing a window at a time, so jumping anywhere in a huge tree is one range query."""
+    WINDOW = 256
+
+    def __init__(self, db: IndexDB, root_id: str):
+        self.db = db; self.root_id = root_id
+        self.first, self.end = db.dir_tree_span(root_id)
+        self._start = 0; self._window: list = []
+        self._depth0 = self._row(0)["depth"] if len(self) else 0
+
+    def __len__(self) -> int:
+        return self.end - self.first
+
+    def _row(self, i: int):
+        if not self._start <= i < self._start + len(self._window):
+            self._start = max(0, i - self.WINDOW // 2)
+            self._window = self.db.dir_tree_slice(self.first + self._start, min(self.WINDOW, len(self) - self._start))
+        return self._window[i - self._start]
+
+    def __getitem__(self, i: int) -> Tuple[str, int]:
+        row = self._row(i)
+        return row["id"], row["depth"] - self._depth0
+
+    @property
+    def rows(self) -> "_FlatTree":
+        return self
+
+    def index_of(self, dir_id: str) -> int:
+        first, end = self.db.dir_tree_span(dir_id)
+        return first - self.first if end > first and self.first <= first < self.end else -1
+
+    def parent_of(self, i: int) -> int:
+        row = self.db.get_node(self[i][0])
+        j = self.index_of(row["parent"]) if row is not None and row["parent"] else -1
+        return j if j >= 0 else i
+
+    def label(self, i: int) -> str:
+        row = self._row(i)
+        name = row["path"] if i == 0 else Path(row["path"]).name or row["path"]
+        return f"{'  ' * (row['depth'] - self._depth0)}{name.rstrip('/')}/"
+
+def teleport_via_map(stdscr, db: IndexDB, root_id: str, current_dir_id: str) -> Optional[str]:
+    """Browse the directory tree as indexed; directories the index has not listed yet are scanned in
+    the background when first expanded. '*' switches to every indexed directory, fully expanded.
+    Returns the chosen directory id."""
+    if db.get_node(root_id) is None:
+        return None
+    scanner = _Scanner(db)
+    tree = _DirTree(db, root_id)
+    try:
+        tree.expand(0, scanner)
+        selected = tree.reveal(current_dir_id, scanner)
+        top = 0
+        view = tree
+        while True:
+            finished = scanner.finished()
+            if finished:
+                keep = view.rows[selected][0]
+                db.sync()
+                for dir_id in finished:
+                    tree.scanned(dir_id, scanner)
+                if view is not tree:
+                    view = _FlatTree(db, root_id)
+                selected = max(0, view.index_of(keep))
+            stdscr.erase()
+            h, w = stdscr.getmaxyx()
+            stdscr.box()
+            title = " Teleport Map " if view is tree else f" Teleport Map: all {len(view):,} indexed directories "
+            try:
+                stdscr.addnstr(0, max(2, (w - len(title)) // 2), title, w - 4, curses.A_BOLD)
+            except curses.error:
+                pass
+
+            visible = max(1, h - 4)
+            if selected < top:
+                top = selected
+            elif selected >= top + visible:
+                top = selected - visible + 1
+            top = max(0, min(top, len(view.rows) - visible))
+
+            for row_idx, i in enumerate(range(top, min(len(view.rows), top + visible))):
+                attr = curses.A_REVERSE if i == selected else curses.A_NORMAL
+                try:
+                    stdscr.addnstr(1 + row_idx, 2, view.label(i), w - 4, attr)
+                except curses.error:
+                    pass
+
+            instruction = "↑/↓ move  →/← expand/collapse  * all dirs  Enter teleport  q/Esc cancel"
+            try:
+                stdscr.addnstr(h - 2, 2, instruction, w - 4)
             except curses.error:
                 pass
-            row_idx += 1
+            stdscr.refresh()
+
+            stdscr.timeout(SCAN_POLL_MS if tree.scanning else -1)
+            ch = stdscr.getch()
+            dir_id, depth = view.rows[selected]
+            if ch == -1:
+                continue
+            elif ch == ord('*'):
+                if view is tree:
+                    flat = _FlatTree(db, root_id)
+                    if len(flat):
+                        view = flat; selected = max(0, view.index_of(dir_id))
+                else:
+                    view = tree; selected = tree.reveal(dir_id, scanner)
+            elif ch in (curses.KEY_UP, ord('k'), ord('w')):
+                selected = (selected - 1) % len(view.rows)
+            elif ch in (curses.KEY_DOWN, ord('j'), ord('s')):
+                selected = (selected + 1) % len(view.rows)
+            elif ch in (curses.KEY_PPAGE,):
+                selected = max(0, selected - visible)
+            elif ch in (curses.KEY_NPAGE,):
+                selected = min(len(view.rows) - 1, selected + visible)
+            elif ch in (curses.KEY_HOME,):
+                selected = 0
+            elif ch in (curses.KEY_END,):
+                selected = len(view.rows) - 1
+            elif ch in (curses.KEY_RIGHT, ord('l'), ord('d'), ord('+')):
+                if view is not tree or dir_id in tree.expanded:
+                    if selected + 1 < len(view.rows) and view.rows[selected + 1][1] > depth:
+                        selected += 1
+                else:
+                    tree.expand(selected, scanner)
+            elif ch in (curses.KEY_LEFT, ord('h'), ord('a'), ord('-')):
+                if view is not tree:
+                    selected = view.parent_of(selected)
+                elif dir_id in tree.expanded:
+                    tree.collapse(selected)
+                else:
+                    while selected > 0 and tree.rows[selected][1] >= depth:
+                        selected -= 1
+            elif ch == ord(' ') and view is tree:
+                if dir_id in tree.expanded:
+                    tree.collapse(selected)
+                else:
+                    tree.expand(selected, scanner)
+            elif ch in (10, 13, curses.KEY_ENTER):
+                return dir_id
+            elif ch in (27, ord('q')):
+                return None
+    finally:
+        stdscr.timeout(-1)
+        scanner.close()
 
-        if truncated:
+def teleport_via_search(stdscr, db: IndexDB) -> Optional[str]:
+    """Incremental fuzzy search over every indexed directory; returns the chosen directory id."""
+    query = ""
+    results: list = []
+    complete = True
+    selected = 0
+    stale = True
+    try:
+        while True:
+            if stale:
+                results, complete = fuzzy_search(db, query, limit=SEARCH_RESULTS, dirs_only=True) if query else ([], True)
+                selected = min(selected, max(0, len(results) - 1))
+                stale = False
+            stdscr.erase()
+            h, w = stdscr.getmaxyx()
+            stdscr.box()
+            title = " Teleport Search "
             try:
-                stdscr.addnstr(h - 3, 2, f"(Showing first {max_entries} directories)", w - 4, curses.A_DIM)
+                stdscr.addnstr(0, max(2, (w - len(title)) // 2), title, w - 4, curses.A_BOLD)
+                stdscr.addnstr(1, 2, f"> {query}", w - 4)
             except curses.error:
                 pass
+            visible = max(1, h - 5)
+            for i, (row, match) in enumerate(results[:visible]):
+                attr = curses.A_REVERSE if i == selected else curses.A_NORMAL
+                path = str(row["path"])[:max(0, w - 4)]
+                hits = set(match.positions)
+                try:
+                    stdscr.addnstr(2 + i, 2, path, w - 4, attr)
+                    for p in hits:
+                        if p < len(path):
+                            stdscr.addnstr(2 + i, 2 + p, path[p], 1, attr | curses.A_BOLD | curses.A_UNDERLINE)
+                except curses.error:
+                    pass
+            footer = "Type to search  ↑/↓ to move  Enter to teleport  Esc to cancel"
+            if not complete:
+                footer = "(searching…)  " + footer
+            try:
+                stdscr.addnstr(h - 2, 2, footer, w - 4, curses.A_DIM if not complete else curses.A_NORMAL)
+            except curses.error:
+                pass
+            stdscr.refresh()
 
-        instruction = "↑/↓ to move  Enter to teleport  q/Esc to cancel"
-        try:
-            stdscr.addnstr(h - 2, 2, instruction, w - 4)
-        except curses.error:
-            pass
-        stdscr.refresh()
-
-        ch = stdscr.getch()
-        if ch in (curses.KEY_UP, ord('k'), ord('w')):
-            selected = (selected - 1) % len(directories)
-        elif ch in (curses.KEY_DOWN, ord('j'), ord('s')):
-            selected = (selected + 1) % len(directories)
-        elif ch in (curses.KEY_PPAGE,):
-            selected = max(0, selected - visible)
-        elif ch in (curses.KEY_NPAGE,):
-            selected = min(len(directories) - 1, selected + visible)
-        elif ch in (10, 13, curses.KEY_ENTER):
-            return directories[selected][0]
-        elif ch in (27, ord('q')):
-            return None
+            # While the scan is unfinished, poll so idle time keeps refining the results.
+            stdscr.timeout(0 if not complete else -1)
+            ch = stdscr.getch()
+            if ch == -1:
+                stale = True
+            elif ch in (curses.KEY_UP,):
+                selected = max(0, selected - 1)
+            elif ch in (curses.KEY_DOWN,):
+                selected = min(max(0, len(results) - 1), selected + 1)
+            elif ch in (10, 13, curses.KEY_ENTER):
+                return results[selected][0]["id"] if results else None
+            elif ch == 27:
+                return None
+            elif ch in (curses.KEY_BACKSPACE, 127, 8):
+                query = query[:-1]; stale = True; selected = 0
+            elif 32 <= ch < 127:
+                query += chr(ch); stale = True; selected = 0
+    finally:
+        stdscr.timeout(-1)
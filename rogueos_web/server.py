@@ -3,75 +3,219 @@ from __future__ import annotations
 import argparse
 import json
 import logging
+import os
+import queue
 import socketserver
 import sys
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from functools import partial
 from http import HTTPStatus
 from http.server import SimpleHTTPRequestHandler
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 from urllib.parse import parse_qs, urlparse
 
+from roguefs_core.events import EventBus
+from roguefs_core.fuzzy import fuzzy_search
 from roguefs_core.hashing import node_id_for_path
-from roguefs_core.index import IndexDB
+from roguefs_core import lenses
+from roguefs_core.index import SEARCH_MODES, IndexDB
 from roguefs_core.node import NodeKind
-from roguefs_core.worldgen import ensure_space_for_dir, generate_room
+from roguefs_core.sniff import sniff_via
+from roguefs_core.watcher import ENTRY_CHANGED, ROOM_CHANGED, create_watcher
+from roguefs_core.worldgen import ensure_space_for_dir, generate_room, generate_wing, refresh_entries
 
 
 LOG = logging.getLogger("rogueos.web")
+WEB_SEARCH_MODES = ("fuzzy",) + SEARCH_MODES
+DEFAULT_WORKERS = int(os.environ.get("ROGUEOS_WEB_WORKERS", "8"))
+# Rooms with more positioned items than this send only the ones nearest the camera (see /api/nearby).
+ROOM_WINDOW = int(os.environ.get("ROGUEOS_WEB_ROOM_WINDOW", "1500"))
+LENS_LIMIT = 5
+
+
+class IndexWriter:
+    """Dedicated thread owning the only writable IndexDB connection; callers queue work onto it."""
+
+    def __init__(self, path: str | None = None):
+        self._jobs: queue.Queue = queue.Queue()
+        ready: Future = Future()
+        self._thread = threading.Thread(target=self._run, args=(path, ready), daemon=True, name="rogueos-writer")
+        self._thread.start()
+        self.path: str = ready.result()
+
+    def _run(self, path: str | None, ready: Future):
+        try:
+            db = IndexDB(path)
+        except BaseException as exc:
+            ready.set_exception(exc)
+            return
+        ready.set_result(db.path)
+        try:
+            while True:
+                job = self._jobs.get()
+                if job is None:
+                    return
+                fn, future = job
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    future.set_result(fn(db))
+                except BaseException as exc:
+                    future.set_exception(exc)
+        finally:
+            db.close()
+
+    def submit(self, fn: Callable[[IndexDB], Any]) -> Future:
+        future: Future = Future()
+        self._jobs.put((fn, future))
+        return future
+
+    def call(self, fn: Callable[[IndexDB], Any]):
+        return self.submit(fn).result()
+
+    def close(self):
+        self._jobs.put(None)
+        self._thread.join(timeout=5)
 
 
 class RogueState:
-    """Small helper that keeps the shared DB connection and exposes helpers for the handler."""
+    """Shared server state: one writer thread plus a read-only WAL connection per request thread."""
 
-    def __init__(self, root: Path):
+    def __init__(self, root: Path, swr: bool = True):
         if not root.exists() or not root.is_dir():
             raise ValueError(f"Root '{root}' must be an existing directory")
         self.root = root.resolve()
-        self.db = IndexDB(check_same_thread=False)
+        self.writer = IndexWriter()
+        # Background content sniffing stores its results on the writer thread too.
+        sniff_via(self.writer.path, lambda results: self.writer.call(lambda db: db.set_ctypes(results)))
+        self._local = threading.local()
+        self._readers: list[IndexDB] = []
+        self._readers_lock = threading.Lock()
         self.root_id = node_id_for_path(self.root)
-        generate_room(self.db, self.root, parent_id=None)
-        ensure_space_for_dir(self.db, self.root_id)
+        # Directories known to be unchanged since their last generation, keyed by path.
+        self._fresh: dict[str, str] = {}
+        self._fresh_lock = threading.Lock()
+        # Stale-while-revalidate: known rooms are served from the index while the writer refreshes them.
+        self.swr = swr
+        self._refreshing: dict[str, Future] = {}
+        self._changes: dict[str, int] = {}
+        self._wings: dict[str, float | None] = {}  # wing id -> room version of its directory when laid out
+        self.bus = EventBus()
+        self.bus.on(ROOM_CHANGED, self._on_room_changed)
+        self.bus.on(ENTRY_CHANGED, self._on_entry_changed)
+        self.watcher = create_watcher(self.bus, db=self.db).start()
+        self.writer.call(self._generate(self.root, None, self.root_id))
+        if self.watcher.watch(self.root):
+            self._fresh[str(self.root)] = self.root_id
+
+    @property
+    def db(self) -> IndexDB:
+        """This thread's read-only connection; call db.sync() to see commits made since the last request."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = IndexDB(self.writer.path, readonly=True, check_same_thread=False)
+            with self._readers_lock:
+                self._readers.append(db)
+        return db
+
+    @staticmethod
+    def _generate(dir_path: Path, parent_id: str | None, node_id: str):
+        def run(db: IndexDB):
+            generate_room(db, dir_path, parent_id=parent_id)
+            ensure_space_for_dir(db, node_id)
+        return run
+
+    def _on_entry_changed(self, path: Path):
+        self.writer.submit(lambda db: refresh_entries(db, [path]))
+
+    def _on_room_changed(self, path: Path):
+        with self._fresh_lock:
+            self._fresh.pop(str(path), None)
+            if str(path) in self._changes:
+                self._changes[str(path)] += 1
 
     def close(self):
-        try:
-            self.db.close()
-        except Exception:
-            LOG.exception("Failed to close IndexDB cleanly")
+        self.watcher.stop()
+        with self._readers_lock:
+            readers, self._readers = self._readers, []
+        for db in readers:
+            try:
+                db.close()
+            except Exception:
+                LOG.exception("Failed to close IndexDB reader cleanly")
+        sniff_via(self.writer.path, None)
+        self.writer.close()
 
     def _display_name(self, row) -> str:
+        if row["kind"] == NodeKind.WING.value:
+            return f"[{row['seed']}]"
         path = Path(row["path"])
         if path.name:
             return path.name
         return str(path)
 
     def _ensure_directory(self, node_id: str):
+        """(row, stale). Unchanged rooms return at once; rooms already in the index are served as they
+        are while a refresh is queued (stale=True); only never-generated rooms wait for the writer."""
         row = self.db.get_node(node_id)
         if not row:
-            return None
+            return None, False
+        if row["kind"] == NodeKind.WING.value:
+            return self._ensure_wing(row), False
         if row["kind"] != NodeKind.DIRECTORY.value:
-            return row
-        dir_path = Path(row["path"])
-        parent_id = row["parent"]
-        generate_room(self.db, dir_path, parent_id=parent_id)
-        ensure_space_for_dir(self.db, node_id)
-        return row
+            return row, False
+        with self._fresh_lock:
+            if self._fresh.get(row["path"]) == node_id:
+                return row, False
+            future = self._refreshing.get(node_id)
+            if future is None:
+                self._changes.setdefault(row["path"], 0)
+                future = self._refreshing[node_id] = self._refresh(row)
+        if self.swr and self.db.get_room_state(node_id) is not None:
+            return row, True
+        future.result()
+        self.db.sync()
+        return self.db.get_node(node_id), False
+
+    def _ensure_wing(self, row):
+        """Lay out a wing's members on first visit, and again after its directory was regenerated."""
+        parent, _ = self._ensure_directory(row["parent"])
+        version = self._room_version(row["parent"])
+        if parent is None or self._wings.get(row["id"], False) == version:
+            return self.db.get_node(row["id"])
+        self.writer.call(lambda db: generate_wing(db, row["id"]))
+        self.db.sync()
+        self._wings[row["id"]] = version
+        return self.db.get_node(row["id"])
+
+    def _refresh(self, row) -> Future:
+        node_id = row["id"]; dir_path = Path(row["path"])
+        changes = self._changes[row["path"]]
+        future = self.writer.submit(self._generate(dir_path, row["parent"], node_id))
+
+        def done(f: Future):
+            watched = f.exception() is None and self.watcher.watch(dir_path)
+            with self._fresh_lock:
+                self._refreshing.pop(node_id, None)
+                # A change reported while generating may not have been picked up; leave it stale.
+                if watched and self._changes.pop(row["path"], changes) == changes:
+                    self._fresh[row["path"]] = node_id
+            if f.exception() is not None:
+                LOG.error("Failed to generate %s: %s", dir_path, f.exception())
+        future.add_done_callback(done)
+        return future
+
+    def _room_version(self, node_id: str) -> float | None:
+        room = self.db.get_room_state(node_id)
+        return room["generated"] if room is not None else None
 
     def _breadcrumbs(self, start_id: str):
-        crumbs = []
-        current = self.db.get_node(start_id)
-        guard = 0
-        while current is not None and guard < 128:
-            crumbs.append({
-                "id": current["id"],
-                "name": self._display_name(current),
-                "path": current["path"],
-            })
-            parent_row = self.db.parent_of(current["id"])
-            current = parent_row
-            guard += 1
-        crumbs.reverse()
-        return crumbs
+        return [
+            {"id": row["id"], "name": self._display_name(row), "path": row["path"]}
+            for row in self.db.ancestors_of(start_id, include_self=True)
+        ]
 
     def _transform_dict(self, node_id: str):
         transform = self.db.get_transform(node_id)
@@ -92,6 +236,13 @@ class RogueState:
             "size": {"x": rec["sx"], "y": rec["sy"], "z": rec["sz"]},
         }
 
+    @staticmethod
+    def _stats_dict(rec) -> dict[str, int]:
+        if rec is None:
+            return {"childCount": 0, "fileCount": 0, "totalBytes": 0, "maxDepth": 0}
+        return {"childCount": rec["child_count"], "fileCount": rec["file_count"],
+                "totalBytes": rec["total_bytes"], "maxDepth": rec["max_depth"]}
+
     def node_payload(self, row) -> dict[str, Any]:
         return {
             "id": row["id"],
@@ -101,21 +252,31 @@ class RogueState:
             "seed": row["seed"],
             "theme": row["theme"],
             "parent": row["parent"],
+            "wing": row["wing"],
+            "size": row["size"],
+            "ctype": row["ctype"],
+            "mtime": row["mtime_ns"] / 1e9 if row["mtime_ns"] is not None else None,
             "transform": self._transform_dict(row["id"]),
             "pinned": self.db.is_pinned(row["id"]),
         }
 
-    def dir_payload(self, node_id: str):
-        row = self._ensure_directory(node_id)
+    def dir_status(self, node_id: str):
+        """Version and staleness of a room, for clients waiting on a background refresh."""
+        row, stale = self._ensure_directory(node_id)
+        if not row:
+            return None
+        return {"id": row["id"], "version": self._room_version(node_id), "stale": stale}
+
+    def dir_payload(self, node_id: str, visit: bool = True):
+        row, stale = self._ensure_directory(node_id)
         if not row:
             return None
         space = self._space_dict(node_id)
-        children = []
-        for child in self.db.children_of(node_id):
-            payload = self.node_payload(child)
-            if child["kind"] == NodeKind.DIRECTORY.value:
-                payload["childCount"] = len(self.db.children_of(child["id"]))
-            children.append(payload)
+        if visit:
+            self.writer.submit(lambda db: db.visit(node_id))
+        total = self.db.room_item_count(node_id)
+        rows = self._nearest_rows(node_id, 0.0, 0.0, ROOM_WINDOW) if total > ROOM_WINDOW else self.db.room_children(node_id)
+        children = self._children_payload(rows)
         return {
             "id": row["id"],
             "name": self._display_name(row),
@@ -123,15 +284,52 @@ class RogueState:
             "kind": row["kind"],
             "parent": row["parent"],
             "space": space,
+            "stale": stale,
+            "version": self._room_version(node_id),
+            "partial": total > ROOM_WINDOW,
+            "total": total,
+            **self._stats_dict(self.db.get_dir_stats(node_id)),
             "breadcrumbs": self._breadcrumbs(node_id),
             "children": children,
         }
 
-    def search_payload(self, needle: str, limit: int = 25):
+    def _nearest_rows(self, node_id: str, x: float, y: float, k: int):
+        return [r for r in (self.db.get_node(n["id"]) for n in self.db.nearest(node_id, x, y, k)) if r]
+
+    def _children_payload(self, rows):
+        stats = self.db.get_dir_stats_many(r["id"] for r in rows if r["kind"] == NodeKind.DIRECTORY.value)
+        children = []
+        for child in rows:
+            payload = self.node_payload(child)
+            if child["kind"] == NodeKind.DIRECTORY.value:
+                payload.update(self._stats_dict(stats.get(child["id"])))
+            children.append(payload)
+        return children
+
+    def lenses_payload(self, node_id: str, limit: int = LENS_LIMIT):
+        """A directory's biggest files and most recently modified entries, from the index."""
+        def rows(ids):
+            return [self.node_payload(r) for r in (self.db.get_node(i) for i in ids) if r]
+        return {"id": node_id, "largest": rows(lenses.largest(self.db, node_id, limit)),
+                "recent": rows(lenses.recently_modified(self.db, node_id, limit))}
+
+    def nearby_payload(self, node_id: str, x: float, y: float, k: int = ROOM_WINDOW):
+        """The k items of a room closest to (x, y), for clients panning over a partial room."""
+        return {"id": node_id, "children": self._children_payload(self._nearest_rows(node_id, x, y, k))}
+
+    def search_payload(self, needle: str, limit: int = 25, mode: str = "fuzzy"):
         results = []
-        for row in self.db.search_paths_like(needle, limit=limit):
+        if mode == "fuzzy":
+            matches, complete = fuzzy_search(self.db, needle, limit=limit)
+            for row, match in matches:
+                payload = self.node_payload(row)
+                payload["score"] = match.score
+                payload["match"] = list(match.positions)
+                results.append(payload)
+            return {"results": results, "complete": complete}
+        for row in self.db.search_paths(needle, limit=limit, mode=mode):
             results.append(self.node_payload(row))
-        return {"results": results}
+        return {"results": results, "complete": True}
 
 
 class RogueRequestHandler(SimpleHTTPRequestHandler):
@@ -151,6 +349,7 @@ class RogueRequestHandler(SimpleHTTPRequestHandler):
         self.wfile.write(data)
 
     def _handle_api(self):
+        self.state.db.sync()
         parsed = urlparse(self.path)
         query = parse_qs(parsed.query)
         if parsed.path == "/api/root":
@@ -167,12 +366,45 @@ class RogueRequestHandler(SimpleHTTPRequestHandler):
             if not node_id:
                 self._write_json({"error": "missing id parameter"}, HTTPStatus.BAD_REQUEST)
                 return
-            payload = self.state.dir_payload(node_id)
+            # revalidate=1: a refetch of the room being viewed, not a new visit.
+            payload = self.state.dir_payload(node_id, visit=query.get("revalidate", ["0"])[0] != "1")
+            if payload is None:
+                self._write_json({"error": "directory not found"}, HTTPStatus.NOT_FOUND)
+                return
+            self._write_json(payload)
+            return
+        if parsed.path == "/api/dir/status":
+            node_id = query.get("id", [None])[0]
+            if not node_id:
+                self._write_json({"error": "missing id parameter"}, HTTPStatus.BAD_REQUEST)
+                return
+            payload = self.state.dir_status(node_id)
             if payload is None:
                 self._write_json({"error": "directory not found"}, HTTPStatus.NOT_FOUND)
                 return
             self._write_json(payload)
             return
+        if parsed.path == "/api/lenses":
+            node_id = query.get("id", [None])[0]
+            row = self.state.db.get_node(node_id) if node_id else None
+            if row is None or row["kind"] != NodeKind.DIRECTORY.value:
+                self._write_json({"error": "directory not found"}, HTTPStatus.NOT_FOUND)
+                return
+            self._write_json(self.state.lenses_payload(node_id))
+            return
+        if parsed.path == "/api/nearby":
+            node_id = query.get("id", [None])[0]
+            try:
+                x = float(query.get("x", ["0"])[0]); y = float(query.get("y", ["0"])[0])
+                k = int(query.get("k", [str(ROOM_WINDOW)])[0])
+            except ValueError:
+                self._write_json({"error": "x, y and k must be numbers"}, HTTPStatus.BAD_REQUEST)
+                return
+            if not node_id or self.state.db.get_node(node_id) is None:
+                self._write_json({"error": "directory not found"}, HTTPStatus.NOT_FOUND)
+                return
+            self._write_json(self.state.nearby_payload(node_id, x, y, max(1, min(k, ROOM_WINDOW))))
+            return
         if parsed.path == "/api/search":
             needle = query.get("q", [""])[0]
             limit = query.get("limit", [None])[0]
@@ -180,7 +412,11 @@ class RogueRequestHandler(SimpleHTTPRequestHandler):
                 limit_val = int(limit) if limit else 25
             except ValueError:
                 limit_val = 25
-            payload = self.state.search_payload(needle, limit=max(1, min(limit_val, 200)))
+            mode = query.get("mode", ["fuzzy"])[0]
+            if mode not in WEB_SEARCH_MODES:
+                self._write_json({"error": f"unknown mode '{mode}'"}, HTTPStatus.BAD_REQUEST)
+                return
+            payload = self.state.search_payload(needle, limit=max(1, min(limit_val, 200)), mode=mode)
             LOG.info("API /api/search q=%s count=%d", needle, len(payload["results"]))
             self._write_json(payload)
             return
@@ -197,21 +433,39 @@ class RogueRequestHandler(SimpleHTTPRequestHandler):
         LOG.info("%s - - %s", self.client_address[0], format % args)
 
 
-def create_server(root: Path, host: str = "127.0.0.1", port: int = 8765, static_dir: Path | None = None):
+class PooledHTTPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """Threading server that hands requests to a fixed pool, so each worker keeps its own DB reader."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, handler, workers: int = DEFAULT_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rogueos-web")
+        super().__init__(server_address, handler)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def create_server(root: Path, host: str = "127.0.0.1", port: int = 8765, static_dir: Path | None = None,
+                  workers: int = DEFAULT_WORKERS, swr: bool = True):
     """Create and configure the HTTP server but do not start it."""
     static_path = static_dir or (Path(__file__).parent / "static")
-    state = RogueState(root)
+    state = RogueState(root, swr=swr)
     handler = partial(RogueRequestHandler, state=state, directory=str(static_path))
-    socketserver.TCPServer.allow_reuse_address = True
     try:
-        httpd = socketserver.TCPServer((host, port), handler)
+        httpd = PooledHTTPServer((host, port), handler, workers=workers)
     except Exception:
         state.close()
         raise
     return httpd, state
 
 
-def shutdown_server(httpd: socketserver.TCPServer, state: RogueState | None):
+def shutdown_server(httpd: socketserver.BaseServer, state: RogueState | None):
     """Gracefully stop server and release state resources."""
     if httpd:
         try:
@@ -226,10 +480,10 @@ def shutdown_server(httpd: socketserver.TCPServer, state: RogueState | None):
         state.close()
 
 
-def serve(root: Path, host: str = "127.0.0.1", port: int = 8765):
+def serve(root: Path, host: str = "127.0.0.1", port: int = 8765, workers: int = DEFAULT_WORKERS, swr: bool = True):
     """Entry point that starts the HTTP server."""
     static_dir = Path(__file__).parent / "static"
-    httpd, state = create_server(root, host=host, port=port, static_dir=static_dir)
+    httpd, state = create_server(root, host=host, port=port, static_dir=static_dir, workers=workers, swr=swr)
     actual_host, actual_port = httpd.server_address
     LOG.info("Serving RogueOS web renderer at http://%s:%d", actual_host, actual_port)
     try:
@@ -245,11 +499,15 @@ def main(argv: list[str] | None = None):
     parser.add_argument("root", type=Path, help="Path to the directory to visualise")
     parser.add_argument("--host", default="127.0.0.1", help="Host to bind (default: 127.0.0.1)")
     parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"Request threads, each with its own DB reader (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--no-swr", dest="swr", action="store_false",
+                        help="Regenerate changed rooms before answering instead of serving them stale")
     args = parser.parse_args(argv)
 
     logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(message)s")
     try:
-        serve(args.root, host=args.host, port=args.port)
+        serve(args.root, host=args.host, port=args.port, workers=args.workers, swr=args.swr)
     except ValueError as exc:
         LOG.error(str(exc))
         return 1
@@ -11,6 +11,7 @@ const PALETTE = {
   link: '#63ffcb',
   container: '#1eff64',
   npc: '#9cfffb',
+  wing: '#7dff5a',
 };
 
 const state = {
@@ -24,6 +25,7 @@ const state = {
   searchCache: [],
   frameLogged: false,
   rootLogged: false,
+  windowCenter: null,
 };
 
 const statusEl = document.querySelector('#status');
@@ -133,6 +135,7 @@ renderer.domElement.addEventListener('pointerdown', onPointerDown);
 window.addEventListener('resize', onResize);
 window.addEventListener('keydown', onKey);
 searchInput.addEventListener('keydown', onSearchKey);
+searchInput.addEventListener('input', onSearchInput);
 
 animate();
 bootstrap();
@@ -158,6 +161,9 @@ async function bootstrap() {
     state.rootId = data.id;
     logDebug('bootstrap:root-loaded', { id: data.id, path: data.path, childCount: data.children?.length ?? 0 });
     await applyDirectory(data);
+    if (data.stale) {
+      revalidateDirectory(data);
+    }
     setStatus('Ready. Select wireframes to explore.');
     logDebug('bootstrap:ready');
   } catch (err) {
@@ -189,7 +195,34 @@ async function loadDirectory(id) {
   const data = await fetchJSON(`/api/dir?id=${encodeURIComponent(id)}`);
   await applyDirectory(data);
   setStatus(`${data.children.length} astral node${data.children.length === 1 ? '' : 's'}.`);
-  logDebug('loadDirectory:done', { id, childCount: data.children.length });
+  logDebug('loadDirectory:done', { id, childCount: data.children.length, stale: data.stale });
+  if (data.stale) {
+    revalidateDirectory(data);
+  }
+}
+
+const REVALIDATE_DELAYS = [150, 300, 600, 1200, 2400, 4800];
+
+// The server answered from its index while it rescans the room; poll its status until the refreshed
+// copy lands, then refetch the room once (revalidate=1 keeps the refetch from counting as a visit).
+async function revalidateDirectory(data) {
+  let version = data.version;
+  for (const delay of REVALIDATE_DELAYS) {
+    await new Promise((resolve) => setTimeout(resolve, delay));
+    if (state.currentDir?.id !== data.id) return;
+    const status = await fetchJSON(`/api/dir/status?id=${encodeURIComponent(data.id)}`);
+    if (state.currentDir?.id !== data.id) return;
+    if (status.version !== version) {
+      const fresh = await fetchJSON(`/api/dir?id=${encodeURIComponent(data.id)}&revalidate=1`);
+      if (state.currentDir?.id !== data.id) return;
+      version = fresh.version;
+      await applyDirectory(fresh);
+      setStatus(`${fresh.children.length} astral node${fresh.children.length === 1 ? '' : 's'}.`);
+      logDebug('revalidate:applied', { id: data.id, version: fresh.version });
+      if (!fresh.stale) return;
+    }
+    if (!status.stale) return;
+  }
 }
 
 async function applyDirectory(data) {
@@ -206,20 +239,66 @@ async function applyDirectory(data) {
     logDebug('applyDirectory:empty');
   }
 
-  data.children.forEach((child, idx) => {
-    const group = createNodeGroup(child, idx);
-    nodesGroup.add(group);
-    state.nodes.set(child.id, group);
-    state.floatingGroups.push(group);
-    const link = createLinkColumn(group);
-    if (link) {
-      group.add(link);
+  data.children.forEach((child, idx) => addNodeGroup(child, idx));
+
+  // Big rooms arrive partial (the items nearest the centre): let the user pan, and fetch more as they do.
+  controls.enablePan = Boolean(data.partial);
+  if (!data.partial) {
+    controls.target.set(0, 0, 0);
+  }
+  state.windowCenter = { x: 0, y: 0 };
+
+  updateBreadcrumbs(data.breadcrumbs ?? []);
+  logDebug('applyDirectory:complete', { id: data.id, totalNodes: nodesGroup.children.length, partial: data.partial });
+}
+
+function addNodeGroup(child, idx) {
+  const group = createNodeGroup(child, idx);
+  nodesGroup.add(group);
+  state.nodes.set(child.id, group);
+  state.floatingGroups.push(group);
+  const link = createLinkColumn(group);
+  if (link) {
+    group.add(link);
+  }
+  logDebug('applyDirectory:node-added', { id: child.id, kind: child.kind, position: group.position });
+}
+
+const WINDOW_REFETCH_DISTANCE = 4;
+
+controls.addEventListener('end', () => {
+  const dir = state.currentDir;
+  if (!dir?.partial || !state.windowCenter) return;
+  const { x, z } = controls.target;
+  if (Math.hypot(x - state.windowCenter.x, z - state.windowCenter.y) < WINDOW_REFETCH_DISTANCE) return;
+  loadWindow(dir.id, x, z);
+});
+
+// Swap in the items nearest (x, y) on the room floor, keeping the ones already on screen.
+async function loadWindow(id, x, y) {
+  state.windowCenter = { x, y };
+  const data = await fetchJSON(`/api/nearby?id=${encodeURIComponent(id)}&x=${x.toFixed(2)}&y=${y.toFixed(2)}`);
+  if (state.currentDir?.id !== id) return;
+  const keep = new Set(data.children.map((child) => child.id));
+  for (const [nodeId, group] of state.nodes) {
+    if (!keep.has(nodeId)) {
+      nodesGroup.remove(group);
+      state.nodes.delete(nodeId);
     }
-    logDebug('applyDirectory:node-added', { id: child.id, kind: child.kind, position: group.position });
+  }
+  state.floatingGroups = state.floatingGroups.filter((group) => keep.has(group.userData.node.id));
+  data.children.forEach((child, idx) => {
+    if (!state.nodes.has(child.id)) addNodeGroup(child, idx);
   });
+  state.currentDir.children = data.children;
+  logDebug('loadWindow:applied', { id, x, y, count: data.children.length });
+}
 
-  updateBreadcrumbs(data.breadcrumbs ?? []);
-  logDebug('applyDirectory:complete', { id: data.id, totalNodes: nodesGroup.children.length });
+// 0..1 from the directory's recursive file count and bytes (log scale: big trees stay on screen).
+function subtreeWeight(node) {
+  const files = Math.log10(1 + (node.fileCount ?? 0)) / 6;
+  const bytes = Math.log10(1 + (node.totalBytes ?? 0)) / 12;
+  return Math.min(1, Math.max(files, bytes));
 }
 
 function createNodeGroup(node, index) {
@@ -230,7 +309,9 @@ function createNodeGroup(node, index) {
 
   const sizeSeed = hashFloat(node.id, 5);
   const width = 1.8 + sizeSeed * 1.2;
-  const height = (node.kind === 'Directory' ? 5.2 : 3.0) + sizeSeed * (node.kind === 'Directory' ? 3.6 : 1.8);
+  const height = node.kind === 'Directory'
+    ? 5.2 + subtreeWeight(node) * 9.0 + sizeSeed * 1.2
+    : 3.0 + sizeSeed * 1.8;
   const geometry = new THREE.BoxGeometry(width, height, width);
   const color = new THREE.Color(kindColor(node.kind));
 
@@ -425,6 +506,7 @@ function kindColor(kind) {
     case 'Symlink': return PALETTE.link;
     case 'Container': return PALETTE.container;
     case 'NPC': return PALETTE.npc;
+    case 'Wing': return PALETTE.wing;
     default: return PALETTE.accent;
   }
 }
@@ -538,7 +620,7 @@ function onPointerDown(event) {
   const node = group.userData.node;
   logDebug('pointer:down:hit', { id: node.id, kind: node.kind });
   setSelected(group);
-  if (node.kind === 'Directory') {
+  if (node.kind === 'Directory' || node.kind === 'Wing') {
     loadDirectory(node.id);
   } else {
     showInfo(node);
@@ -552,6 +634,10 @@ function onKey(event) {
   }
 }
 
+const SEARCH_DEBOUNCE_MS = 60;
+const SEARCH_REFINE_MS = 120;
+let searchTimer = null;
+
 function onSearchKey(event) {
   if (event.key !== 'Enter') {
     return;
@@ -564,17 +650,34 @@ function onSearchKey(event) {
   runSearch(needle);
 }
 
+function onSearchInput(event) {
+  clearTimeout(searchTimer);
+  const needle = event.target.value.trim();
+  if (!needle) {
+    return;
+  }
+  searchTimer = setTimeout(() => runSearch(needle), SEARCH_DEBOUNCE_MS);
+}
+
 async function runSearch(needle) {
   setStatus(`Searching "${needle}"…`);
   try {
     const result = await fetchJSON(`/api/search?q=${encodeURIComponent(needle)}&limit=40`);
-    setStatus(`${result.results.length} matches.`);
-     logDebug('search:results', { needle, count: result.results.length });
+    if (searchInput.value.trim() !== needle) {
+      return; // superseded by a newer keystroke
+    }
+    setStatus(`${result.results.length} matches${result.complete ? '' : ' (refining…)'}.`);
+    logDebug('search:results', { needle, count: result.results.length, complete: result.complete });
     if (!result.results.length) {
       showSearchResults(needle, []);
     } else {
       showSearchResults(needle, result.results);
     }
+    if (!result.complete) {
+      // The server answers within a per-keystroke budget; ask again to let it finish the scan.
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(() => runSearch(needle), SEARCH_REFINE_MS);
+    }
   } catch (err) {
     console.error(err);
     setStatus('Search failed.');
@@ -598,10 +701,10 @@ function showSearchResults(needle, results) {
     results.forEach((row) => {
       const item = document.createElement('div');
       item.className = 'search-item';
-      item.textContent = `${row.kind} — ${row.path}`;
+      item.append(`${row.kind} — `, highlightMatch(row.path, row.match));
       item.addEventListener('click', () => {
         infoPanel.classList.add('hidden');
-        const dirId = row.kind === 'Directory' ? row.id : row.parent;
+        const dirId = row.kind === 'Directory' ? row.id : (row.wing || row.parent);
         if (dirId) {
           loadDirectory(dirId);
         }
@@ -613,8 +716,40 @@ function showSearchResults(needle, results) {
   infoContent.replaceChildren(frag);
 }
 
+function highlightMatch(text, positions) {
+  const frag = document.createDocumentFragment();
+  if (!positions || !positions.length) {
+    frag.append(text);
+    return frag;
+  }
+  const hits = new Set(positions);
+  let run = '';
+  let marked = false;
+  const flush = () => {
+    if (!run) return;
+    if (marked) {
+      const mark = document.createElement('mark');
+      mark.textContent = run;
+      frag.appendChild(mark);
+    } else {
+      frag.append(run);
+    }
+    run = '';
+  };
+  Array.from(text).forEach((ch, i) => {
+    if (hits.has(i) !== marked) {
+      flush();
+      marked = !marked;
+    }
+    run += ch;
+  });
+  flush();
+  return frag;
+}
+
 function showInfo(node) {
   infoPanel.classList.remove('hidden');
+  infoPanel.dataset.nodeId = node.id;
   const frag = document.createDocumentFragment();
   const title = document.createElement('h2');
   title.textContent = node.name;
@@ -629,6 +764,18 @@ function showInfo(node) {
   if (node.theme) {
     addPair(dl, 'Theme', node.theme);
   }
+  if (node.size != null && node.kind !== 'Directory') {
+    addPair(dl, 'Size', formatBytes(node.size));
+  }
+  if (node.kind === 'Directory' && node.childCount != null) {
+    addPair(dl, 'Entries', String(node.childCount));
+    addPair(dl, 'Files (recursive)', String(node.fileCount));
+    addPair(dl, 'Total size', formatBytes(node.totalBytes));
+    addPair(dl, 'Depth', String(node.maxDepth));
+  }
+  if (node.mtime != null) {
+    addPair(dl, 'Modified', new Date(node.mtime * 1000).toLocaleString());
+  }
   addPair(dl, 'Pinned', node.pinned ? 'yes' : 'no');
   if (node.parent && node.parent !== state.currentDir?.id) {
     const jump = document.createElement('div');
@@ -645,6 +792,46 @@ function showInfo(node) {
   }
   frag.appendChild(dl);
   infoContent.replaceChildren(frag);
+  if (node.kind === 'Directory') {
+    showLenses(node);
+  }
+}
+
+// Biggest files and latest changes of a directory, appended to its info panel once they arrive.
+async function showLenses(node) {
+  let data;
+  try {
+    data = await fetchJSON(`/api/lenses?id=${encodeURIComponent(node.id)}`);
+  } catch (err) {
+    logDebug('lenses:error', { id: node.id, error: String(err?.message ?? err) });
+    return;
+  }
+  if (infoPanel.classList.contains('hidden') || infoPanel.dataset.nodeId !== node.id) return;
+  const lists = [
+    ['Largest files', data.largest, (entry) => formatBytes(entry.size)],
+    ['Recently modified', data.recent, (entry) => new Date(entry.mtime * 1000).toLocaleString()],
+  ];
+  for (const [label, entries, detail] of lists) {
+    if (!entries?.length) continue;
+    const dl = document.createElement('dl');
+    for (const entry of entries) {
+      addPair(dl, entry.name, detail(entry));
+    }
+    const heading = document.createElement('h3');
+    heading.textContent = label;
+    infoContent.append(heading, dl);
+  }
+}
+
+function formatBytes(bytes) {
+  const units = ['B', 'KB', 'MB', 'GB', 'TB'];
+  let value = bytes;
+  let unit = 0;
+  while (value >= 1024 && unit < units.length - 1) {
+    value /= 1024;
+    unit += 1;
+  }
+  return `${unit === 0 ? value : value.toFixed(1)} ${units[unit]}`;
 }
 
 function addPair(dl, label, value) {
@@ -695,7 +882,12 @@ function setHovered(group) {
   state.hovered = group ?? null;
   if (group?.userData) {
     group.userData.isHovered = true;
-    setStatus(`${group.userData.node.kind}: ${group.userData.node.name}`);
+    const hoveredNode = group.userData.node;
+    let sizeNote = hoveredNode.size != null && hoveredNode.kind !== 'Directory' ? ` (${formatBytes(hoveredNode.size)})` : '';
+    if (hoveredNode.kind === 'Directory' && hoveredNode.fileCount != null) {
+      sizeNote = ` (${hoveredNode.fileCount} files, ${formatBytes(hoveredNode.totalBytes)})`;
+    }
+    setStatus(`${hoveredNode.kind}: ${hoveredNode.name}${sizeNote}`);
   } else if (state.currentDir) {
     setStatus(`${state.currentDir.children.length} astral node${state.currentDir.children.length === 1 ? '' : 's'}.`);
   }
@@ -3,7 +3,7 @@ from __future__ import annotations
 import argparse
 from pathlib import Path
 
-from rogueos_web.server import serve
+from rogueos_web.server import DEFAULT_WORKERS, serve
 
 
 def main():
@@ -11,13 +11,15 @@ def main():
     parser.add_argument("root", type=Path, help="Directory to explore")
     parser.add_argument("--host", default="127.0.0.1", help="Host to bind (default: 127.0.0.1)")
     parser.add_argument("--port", type=int, default=8765, help="Port to listen on (default: 8765)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help=f"Request threads (default: {DEFAULT_WORKERS})")
+    parser.add_argument("--no-swr", dest="swr", action="store_false", help="Wait for changed rooms to regenerate")
     args = parser.parse_args()
 
     root = args.root.expanduser().resolve()
     if not root.exists() or not root.is_dir():
         raise SystemExit("Root must be an existing directory.")
 
-    serve(root, host=args.host, port=args.port)
+    serve(root, host=args.host, port=args.port, workers=args.workers, swr=args.swr)
 
 
 if __name__ == "__main__":
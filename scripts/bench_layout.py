@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from roguefs_core.hashing import seed_for_node_id  # noqa: E402
+from roguefs_core.layout import poisson_disc, rejection_blue_noise  # noqa: E402
+
+SAMPLERS = {"rejection": rejection_blue_noise, "poisson": poisson_disc}
+
+
+def _nearest_stats(pts: list[tuple[float, float]], cell: float) -> tuple[float, float]:
+    """(min, mean) nearest-neighbour distance, via a coarse grid."""
+    grid: dict[tuple[int, int], list[tuple[float, float]]] = {}
+    for p in pts:
+        grid.setdefault((int(p[0] // cell), int(p[1] // cell)), []).append(p)
+    nearest = []
+    for p in pts:
+        gx, gy = int(p[0] // cell), int(p[1] // cell)
+        best = math.inf
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for q in grid.get((gx + dx, gy + dy), ()):
+                    if q is not p:
+                        best = min(best, math.dist(p, q))
+        nearest.append(best)
+    finite = [d for d in nearest if d != math.inf] or [0.0]
+    return min(finite), sum(finite) / len(finite)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare blue-noise layout samplers")
+    parser.add_argument("--counts", default="50,200,1000,5000,20000", help="Comma-separated item counts")
+    parser.add_argument("--width", type=float, default=36.0 * 0.9)
+    parser.add_argument("--height", type=float, default=16.0 * 0.9)
+    parser.add_argument("--min-dist", type=float, default=2.0)
+    parser.add_argument("--max-rejection", type=int, default=5000, help="Skip the O(n^2) sampler above this count")
+    args = parser.parse_args()
+
+    print(f"{'sampler':<10} {'n':>7} {'seconds':>9} {'min nn':>8} {'mean nn':>8}")
+    for n in (int(c) for c in args.counts.split(",")):
+        for name, sampler in SAMPLERS.items():
+            if name == "rejection" and n > args.max_rejection:
+                print(f"{name:<10} {n:>7} {'skipped':>9}")
+                continue
+            rng = random.Random(seed_for_node_id("bench", f"layout:{n}"))
+            start = time.perf_counter()
+            pts = sampler(n, width=args.width, height=args.height, min_dist=args.min_dist, rng=rng)
+            elapsed = time.perf_counter() - start
+            cell = max(args.min_dist, math.sqrt(args.width * args.height / n) * 2)
+            lo, mean = _nearest_stats(pts, cell)
+            print(f"{name:<10} {n:>7} {elapsed:>9.3f} {lo:>8.3f} {mean:>8.3f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
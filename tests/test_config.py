@@ -0,0 +1,24 @@
+import json, os
+from roguefs_core import config
+from roguefs_core.config import CONFIG_FILENAME, load_config, save_config
+
+def test_save_writes_only_changes_and_load_follows_edits(tmp_path, monkeypatch):
+    cfg = load_config(tmp_path)
+    cfg["presentation"] = "chambers"
+    assert save_config(tmp_path, cfg)
+    path = tmp_path / CONFIG_FILENAME
+    before = os.stat(path)
+    assert not save_config(tmp_path, load_config(tmp_path))          # same content: no write
+    assert os.stat(path).st_mtime_ns == before.st_mtime_ns
+    assert os.listdir(tmp_path) == [CONFIG_FILENAME]                   # no temp file left behind
+
+    parses = []
+    monkeypatch.setattr(config, "_parse", lambda text, parse=config._parse: parses.append(1) or parse(text))
+    assert load_config(tmp_path)["presentation"] == "chambers"
+    assert parses == []                                                # served from the cache
+
+    data = json.loads(path.read_text())
+    data["presentation"] = "hall-of-mirrors"                           # edited by hand: new size
+    path.write_text(json.dumps(data))
+    assert load_config(tmp_path)["presentation"] == "hall-of-mirrors"
+    assert parses == [1]
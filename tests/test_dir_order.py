@@ -0,0 +1,53 @@
+import random
+from pathlib import Path
+import pytest
+from roguefs_core import index
+from roguefs_core.index import IndexDB
+from roguefs_core.node import NodeKind
+
+@pytest.fixture
+def db(monkeypatch):
+    monkeypatch.setattr(index, "DIR_BLOCK", 8)
+    db = IndexDB(":memory:")
+    rng = random.Random(1); names = ["a", "a b", "a-b", "a.b", "b", "ab", "a0", "z"]
+    paths = ["/r"]; rows = [("/r", NodeKind.DIRECTORY, None)]
+    for _ in range(600):
+        parent = rng.choice(paths); p = parent + "/" + rng.choice(names) + str(rng.randrange(5))
+        if p not in paths:
+            paths.append(p); rows.append((p, NodeKind.DIRECTORY, parent))
+            if rng.random() < .3:
+                rows.append((p + "/f.txt", NodeKind.FILE, p))
+    db.upsert_nodes((p, Path(p), kind, parent, "s", None, None, None) for p, kind, parent in rows)
+    yield db
+    db.close()
+
+def _check(db, rng=random.Random(2)):
+    want = sorted((r["path"] for r in db._conn.execute("SELECT path FROM nodes WHERE kind = 'Directory'")), key=lambda p: p.split("/"))
+    assert [r["path"] for r in db.dir_tree_slice(0, 10 ** 6)] == want
+    for start in (0, 7, 8, 100, len(want) - 3):
+        rows = db.dir_tree_slice(start, 5)
+        assert [r["path"] for r in rows] == want[start:start + 5]
+        assert all(r["depth"] == r["path"].count("/") for r in rows)
+    for p in rng.sample(want, 20):
+        first, end = db.dir_tree_span(db.get_node_by_path(p)["id"])
+        assert want[first:end] == [q for q in want if q == p or q.startswith(p + "/")]
+    assert db._conn.execute("SELECT sum(count) FROM dir_blocks").fetchone()[0] == len(want)
+    assert db._conn.execute("SELECT max(count) FROM dir_blocks").fetchone()[0] <= 2 * index.DIR_BLOCK
+
+def test_listing_follows_writes(db):
+    _check(db)
+    assert db._conn.execute("SELECT count(*) FROM dir_blocks").fetchone()[0] > 10
+    db.upsert_nodes([(f"/r/0/{i}", Path(f"/r/0/{i}"), NodeKind.DIRECTORY, "/r", "s", None, None, None) for i in range(40)])
+    _check(db)
+    gone = [r["id"] for r in db.dir_tree_slice(10, 30)]
+    db.delete_nodes(gone)
+    _check(db)
+    moved = db.dir_tree_slice(50, 1)[0]
+    with db.batch():
+        db._conn.execute("UPDATE nodes SET path = '/r/zz' WHERE id = ?", (moved["id"],))
+        db._forget_nodes([moved["id"]])
+    _check(db)
+
+def test_rebuild(db):
+    db.rebuild_dir_order()
+    _check(db)
@@ -0,0 +1,33 @@
+from pathlib import Path
+from roguefs_core.index import IndexDB
+from roguefs_core.node import NodeKind
+
+D, F = NodeKind.DIRECTORY, NodeKind.FILE
+
+def _stats(db):
+    return {r["id"]: tuple(r)[1:] for r in db._conn.execute("SELECT * FROM dir_stats WHERE child_count > 0 ORDER BY id")}
+
+def _assert_matches_rebuild(db):
+    incremental = _stats(db)
+    db.rebuild_dir_stats()
+    assert incremental == _stats(db)
+
+def test_incremental_dir_stats_match_rebuild():
+    db = IndexDB(":memory:")
+    rows = [("r", "/r", D, None, None), ("a", "/r/a", D, "r", None), ("b", "/r/a/b", D, "a", None),
+            ("f1", "/r/a/b/f1", F, "b", 10), ("f2", "/r/a/f2", F, "a", 20), ("c", "/r/c", D, "r", None),
+            ("f3", "/r/c/f3", F, "c", 5)]
+    db.upsert_nodes((i, Path(p), k, parent, None, None, size, None) for i, p, k, parent, size in rows)
+    assert tuple(db.get_dir_stats("r"))[1:] == (2, 3, 35, 3)
+    _assert_matches_rebuild(db)
+
+    db.upsert_node("f2", Path("/r/a/f2"), F, "a", None, size=25)                 # grown in place
+    db.upsert_node("b", Path("/r/c/b"), D, "c", None)                            # moved with its subtree
+    db.upsert_node("f4", Path("/r/c/b/f4"), F, "b", None, size=1)
+    assert tuple(db.get_dir_stats("c"))[1:] == (2, 3, 16, 2)
+    assert tuple(db.get_dir_stats("a"))[1:] == (1, 1, 25, 1)
+    _assert_matches_rebuild(db)
+
+    db.delete_nodes(["b"])
+    assert tuple(db.get_dir_stats("r"))[1:] == (2, 2, 30, 2)
+    _assert_matches_rebuild(db)
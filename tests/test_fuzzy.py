@@ -0,0 +1,57 @@
+from pathlib import Path
+from roguefs_core.fuzzy import FuzzyIndex, fuzzy_search, score_path
+from roguefs_core.index import IndexDB
+from roguefs_core.node import NodeKind
+
+def _paths(n):
+    return [(i + 1, f"/r/d{i % 7}/file_{i}.txt") for i in range(n)]
+
+def test_extend_matches_full_build():
+    rows = _paths(3000)
+    whole = FuzzyIndex(rows)
+    parts = FuzzyIndex(rows[:10])
+    for i in range(10, 3000, 137):
+        parts.extend(rows[i:i + 137])
+    for q in ("d3f12", "file_2999", "r/d/t"):
+        a = whole.search(q, limit=50, budget=10); b = parts.search(q, limit=50, budget=10)
+        assert a.complete and b.complete
+        assert a.matches == b.matches
+
+def test_search_resumes_across_extend():
+    idx = FuzzyIndex(_paths(100))
+    assert [m.rowid for m in idx.search("file_150", budget=10).matches] == []
+    idx.extend([(101, "/r/new/file_150.txt")])
+    assert [m.rowid for m in idx.search("file_150", budget=10).matches] == [101]
+
+class _Visits:
+    def __init__(self, counts):
+        self.counts = counts
+    def visit_counts(self):
+        return self.counts
+
+def test_boosts_rescore_kept_hits():
+    idx = FuzzyIndex([(1, "/a/alpha"), (2, "/b/alpha")])
+    first = idx.search("alpha", budget=10).matches
+    st = idx._states["alpha"]
+    idx.set_visits(_Visits([(2, 64, None)]))
+    assert idx._states["alpha"] is st
+    top = idx.search("alpha", budget=10).matches[0]
+    assert top.rowid == 2 and top.score > max(m.score for m in first)
+
+def test_score_path():
+    assert score_path("/x/readme.md", "rdm") is not None
+    assert score_path("/x/readme.md", "zz") is None
+
+def test_renames_and_deletes_invalidate_shared_index(tmp_path):
+    db = IndexDB(str(tmp_path / "idx.sqlite"))
+    db.upsert_nodes([("r", Path("/r"), NodeKind.DIRECTORY, None, None, None, None, None),
+                     ("d", Path("/r/olddir"), NodeKind.DIRECTORY, "r", None, None, None, None),
+                     ("f", Path("/r/olddir/notes.txt"), NodeKind.FILE, "d", None, None, 1, None),
+                     ("g", Path("/r/gone.txt"), NodeKind.FILE, "r", None, None, 1, None)])
+    names = lambda q: [row["path"] for row, _ in fuzzy_search(db, q, budget=10)[0]]
+    assert names("olddirnotes") == ["/r/olddir/notes.txt"]
+    db.upsert_node("d", Path("/r/newdir"), NodeKind.DIRECTORY, "r", None)
+    db.delete_nodes(["g"])
+    assert names("olddirnotes") == []
+    assert names("newdirnotes") == ["/r/newdir/notes.txt"]
+    assert names("gone") == []
@@ -0,0 +1,22 @@
+import pytest
+from roguefs_core import indexer
+from roguefs_core.index import IndexDB
+
+def test_worker_error_propagates_instead_of_hanging(tmp_path, monkeypatch):
+    for d in ("t/a/b", "t/c"):
+        (tmp_path / d).mkdir(parents=True)
+    db = IndexDB(str(tmp_path / "i.sqlite"))
+    scan = indexer.iter_children
+
+    def broken(path):
+        if path.name == "b":
+            raise ValueError("boom")
+        return scan(path)
+
+    monkeypatch.setattr(indexer, "iter_children", broken)
+    with pytest.raises(ValueError):
+        indexer.index_tree(db, tmp_path / "t", workers=3)
+    monkeypatch.setattr(indexer, "iter_children", scan)
+    indexer.index_tree(db, tmp_path / "t", workers=3)
+    assert db.get_node_by_path(tmp_path / "t" / "a" / "b") is not None
+    db.close()
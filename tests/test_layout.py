@@ -0,0 +1,47 @@
+import os, random
+import pytest
+from roguefs_core import layout
+from roguefs_core.index import IndexDB
+from roguefs_core.worldgen import generate_room
+
+def _positions(db, room):
+    out = {}
+    for r in db.room_children(db.get_node_by_path(room)["id"]):
+        t = db.get_transform(r["id"])
+        out[r["path"]] = (t.x, t.y)
+    return out
+
+def _touch_dir(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def test_new_items_do_not_move_placed_ones(tmp_path):
+    room = tmp_path / "room"
+    room.mkdir()
+    for i in range(40):
+        (room / f"f{i:02}").write_text("x")
+    db = IndexDB(":memory:")
+    generate_room(db, room, None)
+    before = _positions(db, room)
+
+    (room / "new").write_text("x")
+    (room / "f07").unlink()
+    _touch_dir(room)
+    assert generate_room(db, room, None)
+    after = _positions(db, room)
+    assert str(room / "f07") not in after and str(room / "new") in after
+    assert all(after[p] == pos for p, pos in before.items() if p in after)
+    assert after[str(room / "new")] not in before.values()
+
+@pytest.mark.skipif(layout.np is None, reason="NumPy not installed")
+def test_numpy_and_python_backends_agree(monkeypatch):
+    n = layout.NUMPY_MIN_ITEMS + 45
+    monkeypatch.setattr(layout, "BLUE_NOISE_MAX", n - 1)
+    results = []
+    for use in (True, False):
+        monkeypatch.setattr(layout, "USE_NUMPY", use)
+        grid = layout.bucketed_grid(n, 36.0, 16.0)
+        placed = layout.place_new(grid[:n - 20], 20, n, 36.0, 16.0, random.Random(1))
+        results.append((grid, placed, layout.chamber_cells(n)))
+    assert results[0] == results[1]
+    assert results[0][1] == results[0][0][n - 20:]
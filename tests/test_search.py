@@ -0,0 +1,26 @@
+from pathlib import Path
+from roguefs_core.index import IndexDB
+from roguefs_core.node import NodeKind
+
+def _db():
+    db = IndexDB(":memory:")
+    rows = [("/tree", NodeKind.DIRECTORY, None), ("/tree/a", NodeKind.DIRECTORY, "/tree"),
+            ("/tree/a/f12.txt", NodeKind.FILE, "/tree/a"), ("/tree/d", NodeKind.DIRECTORY, "/tree"),
+            ("/tree/d/docs.md", NodeKind.FILE, "/tree/d"), ("/tree/d/x_y.md", NodeKind.FILE, "/tree/d")]
+    db.upsert_nodes((p, Path(p), kind, parent, None, None, None, None) for p, kind, parent in rows)
+    return db
+
+def test_substring_needle_crossing_separator():
+    db = _db()
+    for needle, want in [("a/f12", "/tree/a/f12.txt"), ("/f12.t", "/tree/a/f12.txt"),
+                         ("tree/d/doc", "/tree/d/docs.md"), ("d/x_y", "/tree/d/x_y.md"), ("EE/D/DO", "/tree/d/docs.md")]:
+        assert want in [r["path"] for r in db.search_paths(needle, mode="substring")], needle
+        assert want in [r["path"] for r in db.search_paths_like(needle)], needle
+
+def test_separator_needle_does_not_overmatch():
+    db = _db()
+    assert [r["path"] for r in db.search_paths("d/f12", mode="substring")] == []
+    assert [r["path"] for r in db.search_paths("d/x%y", mode="substring")] == []
+    assert [r["path"] for r in db.search_paths_like("d/x%y")] == []
+    assert [r["path"] for r in db.search_paths_like("x_")] == ["/tree/d/x_y.md"]
+    assert [r["path"] for r in db.search_paths_like("f_2")] == []
@@ -0,0 +1,31 @@
+import os
+from roguefs_core.config import load_config, save_config
+from roguefs_core.index import IndexDB
+from roguefs_core.worldgen import generate_room
+
+def _touch_dir(path):
+    # Bump the directory's mtime by a whole second so coarse timestamps still see a change.
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+def test_generate_room_skips_unchanged_rooms(tmp_path):
+    room = tmp_path / "room"
+    room.mkdir()
+    (room / "a.txt").write_text("a")
+    db = IndexDB(":memory:")
+    assert generate_room(db, room, None)
+    assert not generate_room(db, room, None)
+    assert not generate_room(db, room, None)
+
+    (room / "b.txt").write_text("b")
+    _touch_dir(room)
+    assert generate_room(db, room, None)
+    assert db.get_node_by_path(room / "b.txt") is not None
+    assert not generate_room(db, room, None)
+
+    cfg = load_config(room)
+    cfg["presentation"] = "chambers"
+    assert save_config(room, cfg)
+    assert generate_room(db, room, None)
+    assert not generate_room(db, room, None)
+    assert generate_room(db, room, None, force=True)